@@ -76,7 +76,7 @@ export default function UploadDemo() {
 
     try {
       // Send to backend API
-      const response = await fetch('http://localhost:8000/api/upload-zip', {
+      const response = await fetch('http://localhost:8000/api/upload-zip?wait=true', {
         method: 'POST',
         body: formData,
       });
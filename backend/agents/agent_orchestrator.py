@@ -7,26 +7,43 @@ THIS SHIT IS FIRE! 🔥
 import asyncio
 import json
 import logging
-from typing import Dict, List, Any, Optional, Tuple
+import sys
+from typing import Dict, List, Any, Optional, Tuple, Callable, Iterable, Sequence, Union
 from datetime import datetime
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from enum import Enum
 import numpy as np
 from abc import ABC, abstractmethod
 import hashlib
 import base64
+import importlib
+import importlib.util
+import time
+import weakref
+from collections import deque
+from itertools import chain
+from contextlib import nullcontext
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import os
 from dotenv import load_dotenv
-
-# AI SDK imports
-import openai
-import anthropic
-from transformers import pipeline
-import torch
-import redis
 from pydantic import BaseModel, Field
 
+# AI SDKs (openai, anthropic, torch, redis) are imported on first use by the
+# agent that needs them - importing this module must stay cheap (see
+# check_import_time.py). Heavy modules never appear at module level here.
+HEAVY_MODULES = ("openai", "anthropic", "torch", "transformers", "redis")
+
+def _load(module: str):
+    """Import an optional SDK on first use (sys.modules caches it afterwards)"""
+    return importlib.import_module(module)
+
+# Pipeline metrics live in backend/services - absent when run standalone from agents/
+try:
+    from services.metrics import time_stage, time_agent_call
+    METRICS_AVAILABLE = True
+except ImportError:
+    METRICS_AVAILABLE = False
+
 # Load environment variables
 load_dotenv()
 
@@ -37,6 +54,10 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def _stage_timer(stage: str):
+    """Stage histogram timer, or a no-op when metrics are unavailable"""
+    return time_stage(stage) if METRICS_AVAILABLE else nullcontext()
+
 # 🎯 Data Models
 class AnalysisType(Enum):
     ANOMALY_DETECTION = "anomaly_detection"
@@ -63,14 +84,19 @@ class Finding:
     severity: str  # normal, mild, moderate, severe, critical
     evidence: List[str]
     timestamp: datetime
+    slice_index: Optional[int] = None  # Index into MRIAnalysisRequest.image_data
+    slice_indices: Optional[List[int]] = None  # Slices an aggregated finding was seen on
+    extent: Optional[Dict[str, Any]] = None  # Cross-slice extent of a tracked lesion (see LesionTracker)
 
 class MRIAnalysisRequest(BaseModel):
     """Request model for MRI analysis"""
     study_id: str
-    image_data: List[str]  # Base64 encoded images
+    image_data: List[str]  # Base64 encoded images, best slices first (preprocessor key-slice order)
     metadata: Dict[str, Any]
     user_context: Dict[str, Any]
-    priority: str = "routine"
+    priority: str = "routine"  # routine | urgent | stat
+    agents: Optional[List[str]] = None  # Explicit agent selection (registry ids); None = select by modality/priority
+    slice_metadata: Optional[List[Dict[str, Any]]] = None  # Per-image DICOM geometry, parallel to image_data
 
 class ConsensusResult(BaseModel):
     """Final consensus from all agents"""
@@ -81,6 +107,165 @@ class ConsensusResult(BaseModel):
     agent_agreements: Dict[str, float]
     report: str
     recommendations: List[str]
+    agents_used: List[str] = Field(default_factory=list)
+    fanout: Dict[str, Any] = Field(default_factory=dict)  # Slices analyzed, calls, slices/sec, limits
+    agent_health: Dict[str, Dict[str, Any]] = Field(default_factory=dict)  # Per-agent latency, errors, breaker state
+
+# 📊 Columnar findings
+SEVERITY_LEVELS = ("normal", "mild", "moderate", "severe", "critical")
+
+def _location_xyz(location: Any) -> Optional[Tuple[float, float, float]]:
+    """Numeric (x, y, z) of a location dict - z defaults to 0 - or None when x/y are missing"""
+    if not isinstance(location, dict):
+        return None
+    try:
+        return (float(location["x"]), float(location["y"]), float(location.get("z", 0.0)))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def _column_property(column: str, names: Optional[str] = None, cast: Optional[Callable] = None) -> property:
+    """Row attribute read from a FindingTable column, decoded through a name list when given"""
+    def get(row: "FindingRow"):
+        value = getattr(row.table, column)[row.index]
+        if names is not None:
+            return getattr(row.table, names)[value]
+        return cast(value) if cast is not None else value
+    return property(get)
+
+class FindingRow:
+    """Read-only view of one FindingTable row, with Finding's attribute names"""
+    __slots__ = ("table", "index")
+    
+    def __init__(self, table: "FindingTable", index: int):
+        self.table = table
+        self.index = index
+    
+    finding_id = _column_property("finding_id")
+    agent_id = _column_property("agent_code", names="agents")
+    finding_type = _column_property("type_code", names="types")
+    location = _column_property("location")
+    description = _column_property("description")
+    confidence = _column_property("confidence", cast=float)
+    severity = _column_property("severity_code", names="severities")
+    evidence = _column_property("evidence")
+    timestamp = _column_property("timestamp")
+    slice_index = _column_property("slice_index")
+    slice_indices = _column_property("slice_indices")
+    extent = _column_property("extent")
+    
+    def to_finding(self) -> Finding:
+        return Finding(
+            finding_id=self.finding_id,
+            agent_id=self.agent_id,
+            finding_type=self.finding_type,
+            location=self.location,
+            description=self.description,
+            confidence=self.confidence,
+            severity=self.severity,
+            evidence=self.evidence,
+            timestamp=self.timestamp,
+            slice_index=self.slice_index,
+            slice_indices=self.slice_indices,
+            extent=self.extent
+        )
+
+class FindingTable:
+    """Structure-of-arrays collection of findings for the consensus stage
+    
+    Coordinates (NaN rows where a location has no numeric x/y), confidence and
+    agent/type/severity codes are numpy arrays; agent, type and severity
+    strings are interned once in the agents/types/severities lists. Text,
+    evidence and the original location dicts stay in per-row lists. table[i]
+    is a FindingRow view.
+    """
+    
+    def __init__(self, agents: Iterable[str] = ()):
+        self.agents: List[str] = list(agents)
+        self.types: List[str] = []
+        self.severities: List[str] = list(SEVERITY_LEVELS)
+        self.agent_code = np.empty(0, dtype=np.int32)
+        self.type_code = np.empty(0, dtype=np.int32)
+        self.severity_code = np.empty(0, dtype=np.int16)
+        self.confidence = np.empty(0, dtype=np.float64)
+        self.coords = np.empty((0, 3), dtype=np.float64)
+        self.finding_id: List[str] = []
+        self.location: List[Any] = []
+        self.description: List[str] = []
+        self.evidence: List[List[str]] = []
+        self.timestamp: List[datetime] = []
+        self.slice_index: List[Optional[int]] = []
+        self.slice_indices: List[Optional[List[int]]] = []
+        self.extent: List[Optional[Dict[str, Any]]] = []
+    
+    @classmethod
+    def from_agent_findings(cls, all_findings: Dict[str, List[Finding]]) -> "FindingTable":
+        """Table over every agent's findings - agents without findings still count as agents
+        
+        Rows belong to the all_findings key (the registry name), not to whatever
+        agent_id the agent stamped on its findings.
+        """
+        table = cls(all_findings)
+        table.extend((finding for findings in all_findings.values() for finding in findings),
+                     agent_ids=[agent for agent, findings in all_findings.items() for _ in findings])
+        return table
+    
+    def extend(self, findings: Iterable[Finding], agent_ids: Optional[Sequence[str]] = None):
+        """Append findings; agent_ids overrides each finding's agent_id for its row"""
+        findings = list(findings)
+        if not findings:
+            return
+        if agent_ids is None:
+            agent_ids = [f.agent_id for f in findings]
+        agent_codes = {agent: code for code, agent in enumerate(self.agents)}
+        type_codes = {name: code for code, name in enumerate(self.types)}
+        severity_codes = {name: code for code, name in enumerate(self.severities)}
+        
+        def intern(value: str, codes: Dict[str, int], names: List[str]) -> int:
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(names)
+                names.append(sys.intern(str(value)))
+            return code
+        
+        coords = []
+        for finding in findings:
+            coords.append(_location_xyz(finding.location) or (np.nan, np.nan, np.nan))
+            self.finding_id.append(finding.finding_id)
+            self.location.append(finding.location)
+            self.description.append(finding.description)
+            self.evidence.append(finding.evidence)
+            self.timestamp.append(finding.timestamp)
+            self.slice_index.append(finding.slice_index)
+            self.slice_indices.append(finding.slice_indices)
+            self.extent.append(finding.extent)
+        
+        self.agent_code = np.concatenate([self.agent_code, np.array(
+            [intern(agent_id, agent_codes, self.agents) for agent_id in agent_ids], dtype=np.int32)])
+        self.type_code = np.concatenate([self.type_code, np.array(
+            [intern(f.finding_type, type_codes, self.types) for f in findings], dtype=np.int32)])
+        self.severity_code = np.concatenate([self.severity_code, np.array(
+            [intern(f.severity, severity_codes, self.severities) for f in findings], dtype=np.int16)])
+        self.confidence = np.concatenate([self.confidence, np.array([f.confidence for f in findings], dtype=np.float64)])
+        self.coords = np.concatenate([self.coords, np.array(coords, dtype=np.float64)])
+    
+    @property
+    def located(self) -> np.ndarray:
+        """Mask of rows with numeric coordinates"""
+        return ~np.isnan(self.coords[:, 0])
+    
+    def __len__(self) -> int:
+        return len(self.finding_id)
+    
+    def __getitem__(self, index: int) -> FindingRow:
+        if not -len(self) <= index < len(self):
+            raise IndexError(index)
+        return FindingRow(self, index % len(self))
+    
+    def rows(self, indices: Optional[Sequence[int]] = None) -> List[FindingRow]:
+        return [FindingRow(self, int(i)) for i in (range(len(self)) if indices is None else indices)]
+    
+    def to_findings(self) -> List[Finding]:
+        return [row.to_finding() for row in self.rows()]
 
 # 🤖 Base Agent Class
 class BaseAgent(ABC):
@@ -101,13 +286,102 @@ class BaseAgent(ABC):
         timestamp = datetime.now().isoformat()
         return hashlib.sha256(f"{self.agent_id}-{timestamp}".encode()).hexdigest()[:12]
 
+# 🌐 Shared HTTP transport for provider SDKs
+class AgentHTTPPool:
+    """Keep-alive async HTTP clients shared by every provider client in the process
+    
+    The SDK clients are native async (AsyncOpenAI / AsyncAnthropic), so in-flight
+    calls cost a socket, not an executor thread. SDKs built on the same httpx
+    package share one pooled client (some SDK releases vendor an httpx fork, which
+    then gets its own pool). HTTP/2 is used when the h2 package is installed
+    (AGENT_HTTP2=auto). Clients are bound to the event loop that created them:
+    every loop gets its own and only ever uses (or closes) its own, so a request
+    in flight on another loop is never disturbed. aclose() closes the running
+    loop's clients; those of a loop that closed without it are dropped.
+    """
+    
+    def __init__(self, max_connections: int = 100, max_keepalive_connections: int = 20,
+                 keepalive_expiry: float = 30.0, timeout_seconds: float = 120.0,
+                 http2: Optional[bool] = None):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout_seconds = timeout_seconds
+        self.http2 = importlib.util.find_spec("h2") is not None if http2 is None else http2
+        # event loop -> httpx package name -> AsyncClient (entries go with their loop)
+        self._clients: "weakref.WeakKeyDictionary[Any, Dict[str, Any]]" = weakref.WeakKeyDictionary()
+    
+    @classmethod
+    def from_env(cls) -> "AgentHTTPPool":
+        http2 = os.getenv("AGENT_HTTP2", "auto").lower()
+        return cls(
+            max_connections=int(os.getenv("AGENT_HTTP_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("AGENT_HTTP_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=float(os.getenv("AGENT_HTTP_KEEPALIVE_SECONDS", "30")),
+            timeout_seconds=float(os.getenv("AGENT_HTTP_TIMEOUT_SECONDS", "120")),
+            http2=None if http2 == "auto" else http2 == "true"
+        )
+    
+    @staticmethod
+    def _client_class(sdk: Any = None):
+        """(httpx package, AsyncClient class) an SDK expects for its http_client"""
+        client_class = getattr(sdk, "DefaultAsyncHttpxClient", None)
+        for base in getattr(client_class, "__mro__", ()):
+            if base.__name__ == "AsyncClient":
+                return _load(base.__module__.split(".")[0]), client_class
+        httpx = _load("httpx")
+        return httpx, httpx.AsyncClient
+    
+    def client(self, sdk: Any = None):
+        """The pooled AsyncClient for an SDK module on the running loop"""
+        loop = asyncio.get_running_loop()
+        self._forget_closed_loops()
+        clients = self._clients.setdefault(loop, {})
+        httpx, client_class = self._client_class(sdk)
+        client = clients.get(httpx.__name__)
+        if client is None:
+            client = client_class(
+                http2=self.http2,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_keepalive_connections,
+                                    keepalive_expiry=self.keepalive_expiry),
+                timeout=httpx.Timeout(self.timeout_seconds, connect=10.0)
+            )
+            clients[httpx.__name__] = client
+        return client
+    
+    def _forget_closed_loops(self):
+        """Drop clients whose loop has closed - their transports died with it"""
+        for loop in [loop for loop in list(self._clients) if loop.is_closed()]:
+            logger.warning("Agent HTTP clients outlived their event loop - call aclose() before closing it")
+            del self._clients[loop]
+    
+    async def aclose(self):
+        """Close the running loop's clients (other loops' clients are left to them)"""
+        for client in self._clients.pop(asyncio.get_running_loop(), {}).values():
+            await client.aclose()
+
+SHARED_HTTP_POOL = AgentHTTPPool.from_env()
+
 # 🔥 GPT-4 Vision Agent
 class GPT4VisionAgent(BaseAgent):
     """OpenAI GPT-4 Vision for medical image analysis"""
     
-    def __init__(self):
+    def __init__(self, http_pool: Optional[AgentHTTPPool] = None):
         super().__init__("gpt4v", "GPT-4 Vision Agent")
-        self.client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.http_pool = http_pool or SHARED_HTTP_POOL
+        self._client = None
+        self._http_client = None
+    
+    @property
+    def client(self):
+        """AsyncOpenAI on the shared pool, created (and the SDK imported) on first use"""
+        openai = _load("openai")
+        http_client = self.http_pool.client(openai)
+        if self._client is None or self._http_client is not http_client:
+            self._client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client)
+            self._http_client = http_client
+        return self._client
         
     async def analyze(self, image_data: str, metadata: Dict) -> List[Finding]:
         """Analyze using GPT-4 Vision"""
@@ -133,8 +407,7 @@ class GPT4VisionAgent(BaseAgent):
             
             Return findings as JSON array."""
             
-            response = await asyncio.to_thread(
-                self.client.chat.completions.create,
+            response = await self.client.chat.completions.create(
                 model="gpt-4-vision-preview",
                 messages=[
                     {
@@ -180,9 +453,9 @@ class GPT4VisionAgent(BaseAgent):
             return findings
             
         except Exception as e:
+            # Surface the failure - the orchestrator's deadlines/breakers account for it
             self.logger.error(f"❌ GPT-4V analysis failed: {e}")
-            # Return demo findings on error
-            return self._generate_demo_findings()
+            raise
     
     def _generate_demo_findings(self) -> List[Finding]:
         """Generate demo findings for testing"""
@@ -204,23 +477,37 @@ class GPT4VisionAgent(BaseAgent):
 class ClaudeAgent(BaseAgent):
     """Anthropic Claude for medical analysis"""
     
-    def __init__(self):
+    def __init__(self, http_pool: Optional[AgentHTTPPool] = None):
         super().__init__("claude3", "Claude 3 Medical Agent")
-        api_key = os.getenv("ANTHROPIC_API_KEY")
-        if api_key:
-            self.client = anthropic.Anthropic(api_key=api_key)
-        else:
-            self.client = None
-            self.logger.warning("⚠️  No Anthropic API key found - will use demo mode")
+        self.http_pool = http_pool or SHARED_HTTP_POOL
+        self._api_key = os.getenv("ANTHROPIC_API_KEY")
+        self._client = None
+        self._http_client = None
+        if not self._api_key:
+            self.logger.warning("⚠️  No Anthropic API key found - Claude calls will fail unless DEMO_MODE=true")
+    
+    @property
+    def client(self):
+        """AsyncAnthropic on the shared pool, created (and the SDK imported) on first use; None without a key"""
+        if not self._api_key:
+            return None
+        anthropic = _load("anthropic")
+        http_client = self.http_pool.client(anthropic)
+        if self._client is None or self._http_client is not http_client:
+            self._client = anthropic.AsyncAnthropic(api_key=self._api_key, http_client=http_client)
+            self._http_client = http_client
+        return self._client
         
     async def analyze(self, image_data: str, metadata: Dict) -> List[Finding]:
         """Analyze using Claude 3"""
         self.logger.info("🎭 Claude analyzing MRI...")
         
         try:
-            # For demo mode or no API key
-            if not self.client or os.getenv("DEMO_MODE", "false").lower() == "true":
+            # For demo mode
+            if os.getenv("DEMO_MODE", "false").lower() == "true":
                 return self._generate_demo_findings()
+            if not self.client:
+                raise RuntimeError("ANTHROPIC_API_KEY is not set")
             
             prompt = f"""Analyze this MRI scan as a senior radiologist.
             
@@ -236,8 +523,7 @@ class ClaudeAgent(BaseAgent):
             
             Format: JSON array of findings"""
             
-            response = await asyncio.to_thread(
-                self.client.messages.create,
+            response = await self.client.messages.create(
                 model="claude-3-opus-20240229",
                 max_tokens=4096,
                 temperature=0.1,
@@ -284,8 +570,9 @@ class ClaudeAgent(BaseAgent):
             return findings
             
         except Exception as e:
+            # Surface the failure - the orchestrator's deadlines/breakers account for it
             self.logger.error(f"❌ Claude analysis failed: {e}")
-            return self._generate_demo_findings()
+            raise
     
     def _generate_demo_findings(self) -> List[Finding]:
         """Generate demo findings for testing"""
@@ -309,8 +596,16 @@ class MedicalVisionAgent(BaseAgent):
     
     def __init__(self):
         super().__init__("medvision", "Medical Vision Specialist")
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.logger.info(f"🔬 Medical Vision Agent initialized on {self.device}")
+        self._device = None
+    
+    @property
+    def device(self):
+        """Torch device, resolved (and torch imported) on first use"""
+        if self._device is None:
+            torch = _load("torch")
+            self._device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+            self.logger.info(f"🔬 Medical Vision Agent using {self.device}")
+        return self._device
         
     async def analyze(self, image_data: str, metadata: Dict) -> List[Finding]:
         """Analyze using specialized medical model"""
@@ -334,115 +629,610 @@ class MedicalVisionAgent(BaseAgent):
         self.logger.info(f"✅ Medical Vision found {len(findings)} findings")
         return findings
 
+# 🗂️ Agent Registry
+PRIORITIES = ("routine", "urgent", "stat")
+
+def _demo_mode() -> bool:
+    return os.getenv("DEMO_MODE", "false").lower() == "true"
+
+def _parse_key_values(value: str) -> Dict[str, float]:
+    """Parse "a=1,b=2.5" style settings"""
+    parsed = {}
+    for item in value.split(","):
+        if "=" in item:
+            key, number = item.split("=", 1)
+            parsed[key.strip()] = float(number)
+    return parsed
+
+@dataclass
+class AgentSpec:
+    """Declaration of an agent: how to build it and when it is worth calling"""
+    agent_id: str
+    factory: Callable[[], BaseAgent]
+    provider: str  # openai | anthropic | local - also the rate-limit / pooling domain
+    cost: float = 1.0  # Relative cost per call, used against per-priority budgets
+    modalities: Tuple[str, ...] = ()  # Empty = any modality
+    priorities: Tuple[str, ...] = PRIORITIES
+    requires_env: Tuple[str, ...] = ()  # Env vars (API keys) needed outside DEMO_MODE
+    deadline_seconds: Optional[float] = None  # Per-call deadline (None = orchestrator default)
+    hedge: bool = True  # Allow a hedged second call when the first is slow
+    
+    def is_configured(self) -> bool:
+        return _demo_mode() or all(os.getenv(name) for name in self.requires_env)
+    
+    def supports(self, modality: Optional[str], priority: str) -> bool:
+        if priority not in self.priorities:
+            return False
+        if not self.modalities or not modality:
+            return True
+        return str(modality).upper() in self.modalities
+
+class AgentRegistry:
+    """Declared agents, constructed on first selection and reused afterwards
+    
+    Configuration (AgentRegistry.from_env):
+    - ORCHESTRATOR_AGENTS: comma-separated ids to enable (default: all registered)
+    - ORCHESTRATOR_COST_BUDGETS: per-priority cost caps, e.g. "routine=1.2,urgent=5"
+      (priorities without a cap run every matching agent)
+    """
+    
+    def __init__(self, enabled: Optional[List[str]] = None,
+                 cost_budgets: Optional[Dict[str, float]] = None):
+        self.specs: Dict[str, AgentSpec] = {}
+        self.enabled = set(enabled) if enabled else None
+        self.cost_budgets = cost_budgets or {}
+        self._instances: Dict[str, BaseAgent] = {}
+        self.logger = logging.getLogger(f"{__name__}.AgentRegistry")
+    
+    @classmethod
+    def from_env(cls) -> "AgentRegistry":
+        enabled = [a.strip() for a in os.getenv("ORCHESTRATOR_AGENTS", "").split(",") if a.strip()]
+        budgets = _parse_key_values(os.getenv("ORCHESTRATOR_COST_BUDGETS", ""))
+        registry = cls(enabled=enabled or None, cost_budgets=budgets)
+        for spec in DEFAULT_AGENT_SPECS:
+            registry.register(spec)
+        return registry
+    
+    def register(self, spec: AgentSpec):
+        self.specs[spec.agent_id] = spec
+    
+    def is_enabled(self, agent_id: str) -> bool:
+        return agent_id in self.specs and (self.enabled is None or agent_id in self.enabled)
+    
+    def get(self, agent_id: str) -> BaseAgent:
+        """The agent instance, constructed on first use"""
+        agent = self._instances.get(agent_id)
+        if agent is None:
+            agent = self.specs[agent_id].factory()
+            self._instances[agent_id] = agent
+            self.logger.info(f"🧩 Constructed agent {agent_id}")
+        return agent
+    
+    @property
+    def constructed(self) -> Dict[str, BaseAgent]:
+        return dict(self._instances)
+    
+    def select(self, request: MRIAnalysisRequest) -> List[str]:
+        """Agent ids to run for a request, cheapest first
+        
+        An explicit request.agents list wins (unknown/disabled ids are dropped);
+        otherwise enabled, configured agents matching the study modality and the
+        request priority are taken cheapest first within the priority's budget.
+        """
+        if request.agents:
+            return [agent_id for agent_id in request.agents if self.is_enabled(agent_id)]
+        
+        modality = request.metadata.get("modality")
+        candidates = sorted(
+            (spec for agent_id, spec in self.specs.items()
+             if self.is_enabled(agent_id) and spec.is_configured()
+             and spec.supports(modality, request.priority)),
+            key=lambda spec: spec.cost
+        )
+        budget = self.cost_budgets.get(request.priority)
+        selected, spent = [], 0.0
+        for spec in candidates:
+            if budget is not None and selected and spent + spec.cost > budget:
+                break
+            selected.append(spec.agent_id)
+            spent += spec.cost
+        return selected
+
+DEFAULT_AGENT_SPECS = (
+    AgentSpec("medvision", MedicalVisionAgent, provider="local", cost=0.1, modalities=("MR", "MRI"), hedge=False),
+    AgentSpec("claude", ClaudeAgent, provider="anthropic", cost=1.0, requires_env=("ANTHROPIC_API_KEY",)),
+    AgentSpec("gpt4v", GPT4VisionAgent, provider="openai", cost=1.0, requires_env=("OPENAI_API_KEY",)),
+)
+
 # 🎯 Consensus Engine
 class ConsensusEngine:
-    """Combines findings from multiple agents"""
+    """Combines findings from multiple agents
     
-    def __init__(self):
+    Works on a FindingTable: grouping yields one group id per row, and agreement,
+    mean confidence and the best finding per group are computed over the
+    columns. Dicts of per-agent Finding lists are converted on the way in.
+    """
+    
+    def __init__(self, distance_threshold: float = 0.15):
         self.logger = logging.getLogger(f"{__name__}.ConsensusEngine")
+        # Findings of one type closer than this (in normalized x/y/z) describe the same lesion
+        self.distance_threshold = distance_threshold
+    
+    @staticmethod
+    def _table(all_findings: Union[Dict[str, List[Finding]], FindingTable]) -> FindingTable:
+        if isinstance(all_findings, FindingTable):
+            return all_findings
+        return FindingTable.from_agent_findings(all_findings)
         
     def calculate_consensus(self, 
-                          all_findings: Dict[str, List[Finding]], 
-                          threshold: float = 0.7) -> List[Dict[str, Any]]:
-        """Calculate consensus from multiple agent findings"""
+                          all_findings: Union[Dict[str, List[Finding]], FindingTable], 
+                          threshold: float = 0.7,
+                          agent_count: Optional[int] = None,
+                          group_ids: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """Calculate consensus from multiple agent findings
+        
+        agent_count is the agreement denominator - the agents that answered
+        (defaults to the agents in the table, including ones with no findings).
+        group_ids can be passed when the table was already grouped.
+        """
         self.logger.info("🎯 Calculating consensus...")
+        table = self._table(all_findings)
+        if not len(table):
+            self.logger.info("✅ Consensus reached on 0 findings")
+            return []
         
-        # Group findings by similarity
-        finding_groups = self._group_similar_findings(all_findings)
+        # Group findings by similarity - a group holds at most one finding per agent
+        if group_ids is None:
+            group_ids = self.group(table)
+        agent_count = agent_count or len(table.agents)
+        support = np.bincount(group_ids)
+        agreement = support / agent_count
+        mean_confidence = np.bincount(group_ids, weights=table.confidence) / support
+        
+        # Rows ordered by group, most confident first: each group's slice starts with its best finding
+        order = np.lexsort((-table.confidence, group_ids))
+        starts = np.concatenate(([0], np.cumsum(support)[:-1]))
         
         consensus_findings = []
-        for group in finding_groups:
-            # Calculate agreement score
-            agent_count = len(all_findings)
-            agreement_score = len(group) / agent_count
-            
-            if agreement_score >= threshold:
-                # Merge findings into consensus
-                consensus_finding = self._merge_findings(group)
-                consensus_finding["agreement_score"] = agreement_score
-                consensus_finding["supporting_agents"] = [f.agent_id for f in group]
-                consensus_findings.append(consensus_finding)
+        for group in np.flatnonzero(agreement >= threshold).tolist():
+            members = order[starts[group]:starts[group] + support[group]].tolist()
+            best = table[members[0]]
+            consensus_findings.append({
+                "finding_type": best.finding_type,
+                "location": best.location,
+                "description": best.description,
+                "confidence": float(mean_confidence[group]),
+                "severity": best.severity,
+                "evidence": list(dict.fromkeys(chain.from_iterable(table.evidence[row] for row in members))),
+                "extent": best.extent,
+                "agreement_score": float(agreement[group]),
+                "supporting_agents": [table.agents[code] for code in table.agent_code[members].tolist()]
+            })
         
         self.logger.info(f"✅ Consensus reached on {len(consensus_findings)} findings")
         return consensus_findings
     
-    def _group_similar_findings(self, all_findings: Dict[str, List[Finding]]) -> List[List[Finding]]:
-        """Group similar findings from different agents"""
+    def is_decided(self, partial_findings: Union[Dict[str, List[Finding]], FindingTable], agent_count: int,
+                   threshold: float = 0.7) -> bool:
+        """True when the agents still outstanding cannot change which findings reach consensus
+        
+        Every current group must already pass, or be unable to pass even if all
+        remaining agents joined it, and the remaining agents alone must be too
+        few to carry a new finding over the threshold.
+        """
+        table = self._table(partial_findings)
+        reported = len(partial_findings) if isinstance(partial_findings, dict) else len(table.agents)
+        remaining = agent_count - reported
+        if remaining <= 0:
+            return True
+        if remaining / agent_count >= threshold:
+            return False
+        support = np.bincount(self.group(table))
+        undecided = (support / agent_count < threshold) & ((support + remaining) / agent_count >= threshold)
+        return not undecided.any()
+    
+    def agent_agreements(self, table: FindingTable, group_ids: Optional[np.ndarray] = None) -> Dict[str, float]:
+        """Pairwise agent agreement: shared groups over groups either agent is in
+        
+        Pairs where neither agent reported anything are not rated (omitted).
+        """
+        if group_ids is None:
+            group_ids = self.group(table)
+        membership = np.zeros((len(table.agents), int(group_ids.max()) + 1 if len(group_ids) else 0))
+        membership[table.agent_code, group_ids] = 1.0
+        shared = membership @ membership.T
+        counts = membership.sum(axis=1)
+        either = counts[:, None] + counts[None, :] - shared
+        scores = np.divide(shared, either, out=np.full_like(shared, np.nan), where=either > 0)
+        
+        agreements = {}
+        for i, agent1 in enumerate(table.agents):
+            for j in range(i + 1, len(table.agents)):
+                if not np.isnan(scores[i, j]):
+                    agreements[f"{agent1}_vs_{table.agents[j]}"] = round(float(scores[i, j]), 3)
+        return agreements
+    
+    def group(self, table: FindingTable) -> np.ndarray:
+        """Group id per table row (ids in order of first appearance)
+        
+        Findings are bucketed by type, then each bucket is grouped through a grid
+        hash with cells one distance threshold wide, so a finding is only compared
+        with findings in its own and the 26 neighbouring cells. A group takes at
+        most one finding per agent - the nearest. Findings without usable
+        coordinates match by type alone and join the first group of their type
+        that their agent is not already in.
+        """
+        group_ids = np.full(len(table), -1, dtype=np.int64)
+        located = table.located
+        next_id = 0
+        for type_code in range(len(table.types)):
+            of_type = table.type_code == type_code
+            rows = np.flatnonzero(of_type & located)
+            type_groups = [rows[members].tolist()
+                           for members in self._group_by_distance(table.coords[rows], table.agent_code[rows])]
+            
+            group_agents = [set(table.agent_code[members].tolist()) for members in type_groups]
+            for row in np.flatnonzero(of_type & ~located).tolist():
+                agent = int(table.agent_code[row])
+                for members, agents in zip(type_groups, group_agents):
+                    if agent not in agents:
+                        members.append(row)
+                        agents.add(agent)
+                        break
+                else:
+                    type_groups.append([row])
+                    group_agents.append({agent})
+            
+            for members in type_groups:
+                group_ids[members] = next_id
+                next_id += 1
+        return group_ids
+    
+    def _group_similar_findings(self, all_findings: Union[Dict[str, List[Finding]], FindingTable]) -> List[List[FindingRow]]:
+        """Groups as lists of row views, for callers that want Finding-like objects"""
+        table = self._table(all_findings)
+        if not len(table):
+            return []
+        group_ids = self.group(table)
+        order = np.argsort(group_ids, kind="stable")
+        return [table.rows(members) for members in np.split(order, np.cumsum(np.bincount(group_ids))[:-1])]
+    
+    def _group_by_distance(self, points: np.ndarray, agent_codes: np.ndarray) -> List[np.ndarray]:
+        """Greedy grouping of same-type findings within distance_threshold, via a grid hash
+        
+        Returns indices into points per group, seed first.
+        """
+        if not len(points):
+            return []
+        radius = self.distance_threshold
+        
+        keys = [tuple(key) for key in np.floor(points / radius).astype(int).tolist()]
+        cells: Dict[Tuple[int, int, int], List[int]] = {}
+        for index, key in enumerate(keys):
+            cells.setdefault(key, []).append(index)
+        
+        # Candidate indices per occupied cell: its own members and its 26 neighbours'
+        offsets = [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)]
+        neighbourhoods: Dict[Tuple[int, int, int], np.ndarray] = {}
+        for cx, cy, cz in cells:
+            neighbourhoods[(cx, cy, cz)] = np.array(
+                [other for dx, dy, dz in offsets for other in cells.get((cx + dx, cy + dy, cz + dz), ())]
+            )
+        
+        grouped = np.zeros(len(points), dtype=bool)
         groups = []
-        processed = set()
-        
-        for agent_id, findings in all_findings.items():
-            for finding in findings:
-                if finding.finding_id in processed:
-                    continue
-                    
-                group = [finding]
-                processed.add(finding.finding_id)
-                
-                # Find similar findings from other agents
-                for other_agent_id, other_findings in all_findings.items():
-                    if other_agent_id == agent_id:
-                        continue
-                        
-                    for other_finding in other_findings:
-                        if other_finding.finding_id in processed:
-                            continue
-                            
-                        if self._are_findings_similar(finding, other_finding):
-                            group.append(other_finding)
-                            processed.add(other_finding.finding_id)
-                
-                if group:
-                    groups.append(group)
+        for index in range(len(points)):
+            if grouped[index]:
+                continue
+            grouped[index] = True
+            
+            # Nearest ungrouped finding per other agent within the threshold
+            candidates = neighbourhoods[keys[index]]
+            distance_sq = ((points[candidates] - points[index]) ** 2).sum(axis=1)
+            keep = ~grouped[candidates] & (agent_codes[candidates] != agent_codes[index]) & (distance_sq <= radius * radius)
+            candidates, distance_sq = candidates[keep], distance_sq[keep]
+            order = np.lexsort((candidates, distance_sq))
+            _, first = np.unique(agent_codes[candidates[order]], return_index=True)
+            members = candidates[order][first]
+            
+            grouped[members] = True
+            groups.append(np.concatenate(([index], members)))
         
         return groups
     
+    @staticmethod
+    def _coordinates(finding: Union[Finding, FindingRow]) -> Optional[Tuple[float, float, float]]:
+        """Numeric (x, y, z) of a finding's location - z defaults to 0 - or None when x/y are missing"""
+        return _location_xyz(finding.location)
+    
     def _are_findings_similar(self, f1: Finding, f2: Finding) -> bool:
         """Check if two findings are similar"""
         # Check type similarity
         if f1.finding_type != f2.finding_type:
             return False
         
-        # Check location proximity (simplified)
-        # In production, use proper anatomical distance metrics
-        return True
+        # Check location proximity (normalized coordinates; unlocated findings match on type)
+        p1, p2 = self._coordinates(f1), self._coordinates(f2)
+        if p1 is None or p2 is None:
+            return True
+        return sum((a - b) ** 2 for a, b in zip(p1, p2)) <= self.distance_threshold ** 2
+
+# 🧭 Cross-slice lesion tracking
+class UnionFind:
+    """Disjoint sets over 0..n-1 (union by size, path halving)"""
+    
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+        self.size = [1] * n
+    
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+    
+    def union(self, a: int, b: int):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+    
+    def groups(self) -> List[List[int]]:
+        members: Dict[int, List[int]] = {}
+        for i in range(len(self.parent)):
+            members.setdefault(self.find(i), []).append(i)
+        return list(members.values())
+
+@dataclass(frozen=True)
+class SlicePosition:
+    """Where an analyzed image sits in its series"""
+    series: str
+    position: float  # Along the slice normal (mm), or instance number when geometry is missing
+    spacing: float  # Expected distance between neighbouring slices, same unit as position
+
+def _floats(value: Any) -> Optional[List[float]]:
+    """DICOM multi-value as floats - accepts lists and the preprocessor's "a, b, c" strings"""
+    if isinstance(value, str):
+        value = value.strip("[]").replace("\\", ",").split(",")
+    try:
+        return [float(v) for v in value]
+    except (TypeError, ValueError):
+        return None
+
+class LesionTracker:
+    """Links one agent's per-slice findings of the same lesion into a single 3D finding
+    
+    Two findings are linked when they have the same type, come from different
+    images of the same series, sit on neighbouring slices (at most max_gap
+    slice spacings apart) and lie within in_plane_distance of each other in
+    normalized x/y. Linked components (union-find) become one finding with an
+    extent. Without slice geometry, findings are linked on in-plane proximity
+    alone.
+    """
+    
+    def __init__(self, in_plane_distance: float = 0.1, max_gap: int = 1):
+        self.in_plane_distance = in_plane_distance
+        self.max_gap = max_gap
+        self.logger = logging.getLogger(f"{__name__}.LesionTracker")
+    
+    @staticmethod
+    def slice_positions(slice_metadata: Optional[List[Dict[str, Any]]]) -> Dict[int, SlicePosition]:
+        """SlicePosition per image index from MRIAnalysisRequest.slice_metadata"""
+        positions = {}
+        for index, meta in enumerate(slice_metadata or []):
+            if not meta:
+                continue
+            series = str(meta.get("series_instance_uid") or "unknown")
+            thickness = _floats([meta.get("slice_thickness")])
+            spacing = thickness[0] if thickness and thickness[0] > 0 else None
+            
+            position = None
+            origin = _floats(meta.get("image_position_patient"))
+            orientation = _floats(meta.get("image_orientation_patient"))
+            if origin and orientation and len(origin) == 3 and len(orientation) == 6:
+                position = float(np.dot(origin, np.cross(orientation[:3], orientation[3:])))
+            if position is None:
+                location = _floats([meta.get("slice_location")])
+                position = location[0] if location else None
+            if position is None:
+                instance = _floats([meta.get("instance_number")])
+                if instance:
+                    position, spacing = instance[0], 1.0
+            if position is not None:
+                positions[index] = SlicePosition(series, position, spacing or 1.0)
+        return positions
     
-    def _merge_findings(self, findings: List[Finding]) -> Dict[str, Any]:
-        """Merge multiple similar findings into consensus"""
-        # Average confidence scores
-        avg_confidence = np.mean([f.confidence for f in findings])
+    def track(self, findings: List[Finding], positions: Dict[int, SlicePosition],
+              slice_count: int) -> List[Finding]:
+        """Collapse linked per-slice findings into 3D findings (unlinked ones pass through)"""
+        if slice_count <= 1 or len(findings) < 2:
+            return findings
         
-        # Use highest confidence description
-        best_finding = max(findings, key=lambda f: f.confidence)
+        points = [ConsensusEngine._coordinates(f) for f in findings]
+        buckets: Dict[Tuple[str, Optional[str]], List[int]] = {}
+        for i, finding in enumerate(findings):
+            where = positions.get(finding.slice_index)
+            buckets.setdefault((finding.finding_type, where.series if where else None), []).append(i)
         
-        return {
-            "finding_type": best_finding.finding_type,
-            "location": best_finding.location,
-            "description": best_finding.description,
-            "confidence": avg_confidence,
-            "severity": best_finding.severity,
-            "evidence": list(set(sum([f.evidence for f in findings], [])))
-        }
+        links = UnionFind(len(findings))
+        radius_sq = self.in_plane_distance ** 2
+        for (_, series), members in buckets.items():
+            if series is not None:
+                # Sorted along the normal, only look ahead while still within max_gap slices
+                members.sort(key=lambda i: positions[findings[i].slice_index].position)
+            for n, i in enumerate(members):
+                where = positions.get(findings[i].slice_index)
+                for j in members[n + 1:]:
+                    if where is not None:
+                        gap = positions[findings[j].slice_index].position - where.position
+                        if gap > (self.max_gap + 0.5) * where.spacing:
+                            break
+                    if findings[j].slice_index == findings[i].slice_index:
+                        continue
+                    if points[i] is None or points[j] is None:
+                        continue
+                    if (points[i][0] - points[j][0]) ** 2 + (points[i][1] - points[j][1]) ** 2 <= radius_sq:
+                        links.union(i, j)
+        
+        tracked = [self._combine([findings[i] for i in sorted(group)], positions, slice_count)
+                   for group in links.groups()]
+        self.logger.debug(f"Tracked {len(findings)} per-slice findings into {len(tracked)} lesions")
+        return tracked
+    
+    def _combine(self, group: List[Finding], positions: Dict[int, SlicePosition],
+                 slice_count: int) -> Finding:
+        """One finding for a linked component - the most confident member, with extent"""
+        best = max(group, key=lambda f: f.confidence)
+        seen_on = sorted({f.slice_index for f in group if f.slice_index is not None})
+        evidence = list(dict.fromkeys(e for f in group for e in f.evidence))
+        evidence.append(f"Seen on {len(seen_on)}/{slice_count} analyzed slices")
+        
+        location = best.location
+        extent = {"slice_count": len(seen_on)}
+        points = [p for p in (ConsensusEngine._coordinates(f) for f in group) if p is not None]
+        if points:
+            coordinates = np.array(points)
+            location = dict(zip(("x", "y", "z"), coordinates.mean(axis=0).round(4).tolist()))
+            extent["x"] = [float(coordinates[:, 0].min()), float(coordinates[:, 0].max())]
+            extent["y"] = [float(coordinates[:, 1].min()), float(coordinates[:, 1].max())]
+        placed = [positions[i] for i in seen_on if i in positions]
+        if placed:
+            low = min(p.position for p in placed)
+            high = max(p.position for p in placed)
+            extent.update({
+                "series": placed[0].series,
+                "position_range": [low, high],
+                "length": round(high - low + placed[0].spacing, 2)
+            })
+            if len(seen_on) > 1:
+                evidence.append(f"Tracked across {len(seen_on)} slices ({extent['length']:g} mm)")
+        return replace(best, location=location, evidence=evidence, slice_indices=seen_on, extent=extent)
+
+# 🛡️ Provider resilience
+class AgentCallError(Exception):
+    """An agent call that was not attempted or did not finish (open breaker, deadline, every slice failed)"""
+    
+    def __init__(self, message: str, reason: str):
+        super().__init__(message)
+        self.reason = reason  # circuit_open | deadline | all_failed
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half_open (one trial call) -> closed"""
+    
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+    
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+    
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+    
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+    
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+    
+    def release(self):
+        """A call was cancelled before it had an outcome - free the half-open trial slot"""
+        self._trial_in_flight = False
+
+class LatencyWindow:
+    """Recent successful call latencies, for hedge delays"""
+    
+    def __init__(self, size: int = 200):
+        self.samples = deque(maxlen=size)
+    
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+    
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        return float(np.percentile(np.fromiter(self.samples, dtype=float), p))
 
 # 🚀 Main Orchestrator
 class MRIAgentOrchestrator:
     """Main orchestration system - THIS IS WHERE THE MAGIC HAPPENS! 🔥"""
     
-    def __init__(self):
+    def __init__(self, registry: Optional[AgentRegistry] = None,
+                 max_concurrency: Optional[int] = None,
+                 provider_limits: Optional[Dict[str, int]] = None,
+                 slices_per_agent: Optional[int] = None):
         self.logger = logging.getLogger(f"{__name__}.Orchestrator")
         
-        # Initialize agents
-        self.agents = {
-            "gpt4v": GPT4VisionAgent(),
-            "claude": ClaudeAgent(),
-            "medvision": MedicalVisionAgent()
+        # Agents are declared here and only constructed once a request selects them
+        self.registry = registry or AgentRegistry.from_env()
+        
+        # Slice fan-out: each selected agent analyzes up to slices_per_agent slices
+        # (0 = all), bounded by a global semaphore and a per-provider limit
+        self.max_concurrency = max_concurrency or int(os.getenv("ORCHESTRATOR_MAX_CONCURRENCY", "8"))
+        self.provider_limits = provider_limits or {
+            provider: int(limit) for provider, limit in
+            _parse_key_values(os.getenv("ORCHESTRATOR_PROVIDER_LIMITS", "openai=4,anthropic=4,local=8")).items()
         }
+        if slices_per_agent is None:
+            slices_per_agent = int(os.getenv("ORCHESTRATOR_SLICES_PER_AGENT", "8"))
+        self.slices_per_agent = slices_per_agent
+        self._limiter_loop = None
+        self._global_limit: Optional[asyncio.Semaphore] = None
+        self._provider_limit: Dict[str, asyncio.Semaphore] = {}
+        
+        # Resilience: per-call deadline, hedged second call once a call outlives the
+        # agent's hedge percentile latency (0 = off), and a breaker per agent
+        self.agent_deadline_seconds = float(os.getenv("ORCHESTRATOR_AGENT_DEADLINE_SECONDS", "45"))
+        self.hedge_percentile = float(os.getenv("ORCHESTRATOR_HEDGE_PERCENTILE", "95"))
+        self.hedge_min_samples = int(os.getenv("ORCHESTRATOR_HEDGE_MIN_SAMPLES", "20"))
+        self.breaker_failures = int(os.getenv("ORCHESTRATOR_BREAKER_FAILURES", "5"))
+        self.breaker_reset_seconds = float(os.getenv("ORCHESTRATOR_BREAKER_RESET_SECONDS", "30"))
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latency: Dict[str, LatencyWindow] = {}
+        
+        # Consensus: "incremental" folds in each agent as it completes and, once at
+        # least `quorum` agents are in and the rest cannot change the outcome,
+        # finalizes and cancels the stragglers; "all" waits for every agent
+        self.consensus_mode = os.getenv("ORCHESTRATOR_CONSENSUS_MODE", "incremental").lower()
+        self.consensus_threshold = float(os.getenv("ORCHESTRATOR_CONSENSUS_THRESHOLD", "0.7"))
+        self.quorum = int(os.getenv("ORCHESTRATOR_QUORUM", "2"))
+        
+        # Per-agent cross-slice lesion tracking before consensus
+        self.lesion_tracker = LesionTracker(
+            in_plane_distance=float(os.getenv("ORCHESTRATOR_TRACK_IN_PLANE_DISTANCE", "0.1")),
+            max_gap=int(os.getenv("ORCHESTRATOR_TRACK_MAX_GAP", "1"))
+        )
         
         # Initialize consensus engine
-        self.consensus_engine = ConsensusEngine()
+        self.consensus_engine = ConsensusEngine(
+            distance_threshold=float(os.getenv("ORCHESTRATOR_CONSENSUS_DISTANCE", "0.15"))
+        )
         
         # Initialize Redis for caching
         try:
+            redis = _load("redis")
             self.redis_client = redis.Redis(
                 host=os.getenv("REDIS_HOST", "localhost"),
                 port=int(os.getenv("REDIS_PORT", 6379)),
@@ -454,7 +1244,22 @@ class MRIAgentOrchestrator:
             self.logger.warning("⚠️  Redis not connected - caching disabled")
             self.redis_client = None
         
-        self.logger.info("🚀 MRI Agent Orchestrator initialized with {} agents".format(len(self.agents)))
+        self.logger.info("🚀 MRI Agent Orchestrator initialized with {} registered agents".format(len(self.registry.specs)))
+    
+    @property
+    def agents(self) -> Dict[str, BaseAgent]:
+        """Agents constructed so far"""
+        return self.registry.constructed
+    
+    async def aclose(self):
+        """Close the provider connection pools used by constructed agents"""
+        pools = {id(SHARED_HTTP_POOL): SHARED_HTTP_POOL}
+        for agent in self.agents.values():
+            pool = getattr(agent, "http_pool", None)
+            if pool is not None:
+                pools[id(pool)] = pool
+        for pool in pools.values():
+            await pool.aclose()
     
     async def analyze_mri(self, request: MRIAnalysisRequest) -> ConsensusResult:
         """Orchestrate multi-agent MRI analysis"""
@@ -467,21 +1272,34 @@ class MRIAgentOrchestrator:
             self.logger.info("📦 Returning cached result")
             return cached_result
         
-        # Run agents in parallel
-        all_findings = await self._run_agents_parallel(
-            request.image_data[0] if request.image_data else "",  # For demo, use first image
-            request.metadata
+        # Run the agents selected for this request in parallel
+        agent_ids = self.registry.select(request)
+        self.logger.info(f"🧩 Selected agents: {', '.join(agent_ids) or 'none'} ({request.priority})")
+        all_findings, fanout, agent_health = await self._run_agents_parallel(
+            self._select_slices(request.image_data),
+            request.metadata,
+            agent_ids,
+            self.lesion_tracker.slice_positions(request.slice_metadata)
         )
         
-        # Calculate consensus
-        consensus_findings = self.consensus_engine.calculate_consensus(all_findings)
+        # Calculate consensus over the agents that answered - failed agents (open
+        # breaker, deadline, errors on every slice) and cancelled stragglers are
+        # reported in agent_health/fanout but do not dilute the agreement score
+        with _stage_timer("consensus"):
+            table = FindingTable.from_agent_findings(all_findings)
+            group_ids = self.consensus_engine.group(table)
+            consensus_findings = self.consensus_engine.calculate_consensus(
+                table, self.consensus_threshold, agent_count=len(all_findings), group_ids=group_ids
+            )
+            agent_agreements = self.consensus_engine.agent_agreements(table, group_ids)
         
         # Generate report
-        report = await self._generate_report(
-            consensus_findings, 
-            request.metadata,
-            request.user_context
-        )
+        with _stage_timer("report"):
+            report = await self._generate_report(
+                consensus_findings, 
+                request.metadata,
+                request.user_context
+            )
         
         # Calculate processing time
         processing_time = (datetime.now() - start_time).total_seconds()
@@ -492,9 +1310,12 @@ class MRIAgentOrchestrator:
             consensus_findings=consensus_findings,
             confidence_score=np.mean([f["confidence"] for f in consensus_findings]) if consensus_findings else 0.85,
             processing_time=processing_time,
-            agent_agreements=self._calculate_agent_agreements(all_findings),
+            agent_agreements=agent_agreements,
             report=report,
-            recommendations=self._generate_recommendations(consensus_findings)
+            recommendations=self._generate_recommendations(consensus_findings),
+            agents_used=agent_ids,
+            fanout=fanout,
+            agent_health=agent_health
         )
         
         # Cache result
@@ -503,27 +1324,234 @@ class MRIAgentOrchestrator:
         self.logger.info(f"✅ Analysis complete in {processing_time:.2f}s")
         return result
     
+    def _select_slices(self, image_data: List[str]) -> List[Tuple[Optional[int], str]]:
+        """(index, image) pairs to fan out - image_data arrives best-first, so take the head"""
+        slices = [(i, image) for i, image in enumerate(image_data) if image]
+        if self.slices_per_agent > 0:
+            slices = slices[:self.slices_per_agent]
+        # Without images the agents still run once on the metadata
+        return slices or [(None, "")]
+    
+    def _limiters(self, provider: str) -> Tuple[asyncio.Semaphore, asyncio.Semaphore]:
+        """(global, provider) semaphores for the running loop"""
+        loop = asyncio.get_running_loop()
+        if self._limiter_loop is not loop:
+            self._limiter_loop = loop
+            self._global_limit = asyncio.Semaphore(self.max_concurrency)
+            self._provider_limit = {}
+        if provider not in self._provider_limit:
+            self._provider_limit[provider] = asyncio.Semaphore(
+                self.provider_limits.get(provider, self.max_concurrency))
+        return self._global_limit, self._provider_limit[provider]
+    
+    def _breaker(self, agent_id: str) -> CircuitBreaker:
+        if agent_id not in self._breakers:
+            self._breakers[agent_id] = CircuitBreaker(self.breaker_failures, self.breaker_reset_seconds)
+        return self._breakers[agent_id]
+    
+    def _latency_window(self, agent_id: str) -> LatencyWindow:
+        if agent_id not in self._latency:
+            self._latency[agent_id] = LatencyWindow()
+        return self._latency[agent_id]
+    
+    def _hedge_delay(self, agent_id: str) -> Optional[float]:
+        """Seconds after which a still-running call gets a hedged duplicate (None = no hedging)"""
+        window = self._latency_window(agent_id)
+        if (not self.registry.specs[agent_id].hedge or self.hedge_percentile <= 0
+                or len(window.samples) < self.hedge_min_samples):
+            return None
+        return window.percentile(self.hedge_percentile)
+    
+    async def _attempt(self, agent_id: str, image_data: str, metadata: Dict) -> List[Finding]:
+        """One call inside the provider limit and then the global limit"""
+        start = time.perf_counter()
+        global_limit, provider_limit = self._limiters(self.registry.specs[agent_id].provider)
+        # Provider first, so a throttled provider never holds a global slot while it waits
+        async with provider_limit:
+            async with global_limit:
+                findings = await self._timed_analyze(agent_id, image_data, metadata)
+        # Queue wait included - that is what the hedge timer measures too
+        self._latency_window(agent_id).record(time.perf_counter() - start)
+        return findings
+    
+    async def _first_success(self, agent_id: str, image_data: str, metadata: Dict,
+                             stats: Dict[str, Any]) -> List[Finding]:
+        """Primary call plus, once it outlives the hedge delay, one duplicate - first success wins"""
+        tasks = {asyncio.create_task(self._attempt(agent_id, image_data, metadata))}
+        try:
+            hedge_delay = self._hedge_delay(agent_id)
+            if hedge_delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+                if not done:
+                    stats["hedged"] += 1
+                    tasks.add(asyncio.create_task(self._attempt(agent_id, image_data, metadata)))
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    async def _analyze_slice(self, agent_id: str, slice_index: Optional[int],
+                             image_data: str, metadata: Dict, stats: Dict[str, Any]) -> List[Finding]:
+        """One agent on one slice: breaker check, then a (possibly hedged) call under the agent's deadline"""
+        breaker = self._breaker(agent_id)
+        if not breaker.allow():
+            stats["short_circuited"] += 1
+            raise AgentCallError(f"{agent_id} circuit open", "circuit_open")
+        
+        deadline = self.registry.specs[agent_id].deadline_seconds or self.agent_deadline_seconds
+        start = time.perf_counter()
+        try:
+            findings = await asyncio.wait_for(
+                self._first_success(agent_id, image_data, {**metadata, "slice_index": slice_index}, stats),
+                deadline
+            )
+        except asyncio.TimeoutError:
+            breaker.record_failure()
+            stats["timed_out"] += 1
+            raise AgentCallError(f"{agent_id} missed its {deadline:g}s deadline", "deadline")
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception:
+            breaker.record_failure()
+            stats["failed"] += 1
+            raise
+        
+        breaker.record_success()
+        stats["succeeded"] += 1
+        stats["latencies"].append(time.perf_counter() - start)
+        return [replace(finding, slice_index=slice_index) for finding in findings]
+    
+    def _agent_health(self, agent_id: str, stats: Dict[str, Any]) -> Dict[str, Any]:
+        """JSON-safe per-agent outcome for ConsensusResult.agent_health"""
+        latencies = stats["latencies"]
+        return {
+            "calls": stats["calls"],
+            "succeeded": stats["succeeded"],
+            "failed": stats["failed"],
+            "timed_out": stats["timed_out"],
+            "short_circuited": stats["short_circuited"],
+            "hedged": stats["hedged"],
+            "latency_p50_ms": round(float(np.median(latencies)) * 1000, 1) if latencies else None,
+            "latency_max_ms": round(max(latencies) * 1000, 1) if latencies else None,
+            "deadline_seconds": self.registry.specs[agent_id].deadline_seconds or self.agent_deadline_seconds,
+            "circuit": self._breaker(agent_id).state,
+            "last_error": stats["last_error"],
+            "cancelled": stats["cancelled"]
+        }
+    
     async def _run_agents_parallel(self, 
-                                  image_data: str, 
-                                  metadata: Dict) -> Dict[str, List[Finding]]:
-        """Run all agents in parallel"""
-        self.logger.info("🏃‍♂️ Running agents in parallel...")
+                                  slices: List[Tuple[Optional[int], str]], 
+                                  metadata: Dict,
+                                  agent_ids: List[str],
+                                  positions: Optional[Dict[int, SlicePosition]] = None) -> Tuple[Dict[str, List[Finding]], Dict[str, Any], Dict[str, Dict[str, Any]]]:
+        """Run the selected agents over the selected slices in parallel
         
-        tasks = []
-        for agent_id, agent in self.agents.items():
-            task = asyncio.create_task(agent.analyze(image_data, metadata))
-            tasks.append((agent_id, task))
+        Each agent's per-slice findings are linked into 3D lesions (LesionTracker)
+        as soon as that agent finishes. Returns study-level findings per agent
+        that had at least one successful call, fan-out stats (calls, failures,
+        wall time and slice analyses per second) and per-agent health.
+        """
+        self.logger.info(f"🏃‍♂️ Running {len(agent_ids)} agents over {len(slices)} slices in parallel...")
+        start = time.perf_counter()
+        
+        stats = {
+            agent_id: {"calls": len(slices), "succeeded": 0, "failed": 0, "timed_out": 0,
+                       "short_circuited": 0, "hedged": 0, "latencies": [], "last_error": None,
+                       "cancelled": False}
+            for agent_id in agent_ids
+        }
+        agent_tasks = {
+            asyncio.create_task(self._run_agent(agent_id, slices, metadata, stats[agent_id], positions or {})): agent_id
+            for agent_id in agent_ids
+        }
         
+        # Fold agents in as they complete; stop early once the outcome is settled.
+        # Agents without a single successful call do not vote and do not count
+        # towards the quorum or the agreement denominator.
         all_findings = {}
-        for agent_id, task in tasks:
-            try:
-                findings = await task
-                all_findings[agent_id] = findings
-            except Exception as e:
-                self.logger.error(f"Agent {agent_id} failed: {e}")
-                all_findings[agent_id] = []
+        failed_agents = []
+        pending = set(agent_tasks)
+        decided_early = False
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        failed_agents.append(agent_tasks[task])
+                        self.logger.warning(f"⚠️  Agent {agent_tasks[task]} left out of consensus: {task.exception()}")
+                    else:
+                        all_findings[agent_tasks[task]] = task.result()
+                voters = len(all_findings) + len(pending)
+                if (pending and self.consensus_mode == "incremental" and len(all_findings) >= self.quorum
+                        and self.consensus_engine.is_decided(all_findings, voters, self.consensus_threshold)):
+                    decided_early = True
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+                stats[agent_tasks[task]]["cancelled"] = True
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        if decided_early:
+            self.logger.info(f"⚡ Consensus settled by {len(all_findings)}/{len(agent_ids)} agents - "
+                             f"cancelled {', '.join(agent_tasks[t] for t in pending)}")
         
-        return all_findings
+        elapsed = time.perf_counter() - start
+        failed_calls = sum(s["failed"] + s["timed_out"] + s["short_circuited"] for s in stats.values())
+        calls = len(agent_ids) * len(slices)
+        fanout = {
+            "slices_analyzed": len(slices),
+            "agent_calls": calls,
+            "failed_calls": failed_calls,
+            "wall_seconds": round(elapsed, 3),
+            "slices_per_second": round(calls / elapsed, 2) if elapsed > 0 else None,
+            "max_concurrency": self.max_concurrency,
+            "provider_limits": dict(self.provider_limits),
+            "slices_per_agent": self.slices_per_agent,
+            "consensus_mode": self.consensus_mode,
+            "agents_completed": len(all_findings),
+            "agents_failed": failed_agents,
+            "agents_cancelled": [agent_tasks[task] for task in pending]
+        }
+        agent_health = {agent_id: self._agent_health(agent_id, stats[agent_id]) for agent_id in agent_ids}
+        for agent_id in agent_ids:
+            agent_health[agent_id]["in_consensus"] = agent_id in all_findings
+        return all_findings, fanout, agent_health
+    
+    async def _run_agent(self, agent_id: str, slices: List[Tuple[Optional[int], str]],
+                         metadata: Dict, stats: Dict[str, Any],
+                         positions: Dict[int, SlicePosition]) -> List[Finding]:
+        """All of one agent's slice calls, tracked across slices into study-level findings"""
+        per_slice = []
+        results = await asyncio.gather(
+            *[self._analyze_slice(agent_id, slice_index, image, metadata, stats) for slice_index, image in slices],
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                if getattr(result, "reason", None) != "circuit_open":
+                    self.logger.error(f"Agent {agent_id} failed on a slice: {result}")
+                stats["last_error"] = str(result)
+            else:
+                per_slice.extend(result)
+        if stats["succeeded"] == 0:
+            raise AgentCallError(f"{agent_id} had no successful calls ({stats['last_error']})", "all_failed")
+        with _stage_timer("lesion_tracking"):
+            return self.lesion_tracker.track(per_slice, positions, len(slices))
+    
+    async def _timed_analyze(self, agent_id: str, image_data: str, metadata: Dict) -> List[Finding]:
+        """Construct (first time) and run an agent, observed in the per-agent call histogram"""
+        agent = self.registry.get(agent_id)
+        with time_agent_call(agent_id) if METRICS_AVAILABLE else nullcontext():
+            return await agent.analyze(image_data, metadata)
     
     async def _generate_report(self, 
                              findings: List[Dict], 
@@ -550,12 +1578,16 @@ FINDINGS:
             for i, finding in enumerate(findings, 1):
                 report += f"\n{i}. {finding['description']}"
                 report += f"\n   - Location: {finding.get('location', 'As described')}"
+                extent = finding.get('extent') or {}
+                if extent.get('length') and extent['slice_count'] > 1:
+                    report += f"\n   - Extent: {extent['slice_count']} slices, {extent['length']:g} mm"
                 report += f"\n   - Severity: {finding['severity']}"
                 report += f"\n   - Confidence: {finding['confidence']:.2%}"
                 report += f"\n   - Supporting evidence: {', '.join(finding['evidence'])}\n"
         else:
             report += "\nNo significant abnormalities identified.\n"
         
+        confidence_text = f"{np.mean([f['confidence'] for f in findings]):.2%}" if findings else "N/A"
         report += f"""
 IMPRESSION:
 {self._generate_impression(findings)}
@@ -565,7 +1597,7 @@ RECOMMENDATIONS:
 
 Report generated by ReadMyMRI AI Consensus System
 Processing time: {metadata.get('processing_time', 'N/A')} seconds
-Confidence score: {np.mean([f['confidence'] for f in findings]):.2%} if findings else 'N/A'}
+Confidence score: {confidence_text}
 """
         
         return report
@@ -593,19 +1625,6 @@ Confidence score: {np.mean([f['confidence'] for f in findings]):.2%} if findings
         
         return "\n".join(formatted)
     
-    def _calculate_agent_agreements(self, all_findings: Dict[str, List[Finding]]) -> Dict[str, float]:
-        """Calculate agreement scores between agents"""
-        agreements = {}
-        agent_ids = list(all_findings.keys())
-        
-        for i, agent1 in enumerate(agent_ids):
-            for agent2 in agent_ids[i+1:]:
-                key = f"{agent1}_vs_{agent2}"
-                # Simplified agreement calculation
-                agreements[key] = 0.85  # Placeholder
-        
-        return agreements
-    
     def _generate_recommendations(self, findings: List[Dict]) -> List[str]:
         """Generate clinical recommendations"""
         recommendations = []
@@ -5,7 +5,7 @@ Connects the frontend to our FIRE agent orchestration! 🔥
 
 from fastapi import FastAPI, HTTPException, UploadFile, File, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 import asyncio
@@ -15,14 +15,21 @@ import zipfile
 import shutil
 from datetime import datetime
 import base64
+import sys
 import logging
-import uvicorn
 
 # Set demo mode by default
 os.environ["DEMO_MODE"] = "true"
 
-# Import our modules
+# Add the backend dir to the path so shared services (metrics) import
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+sys.path.append(backend_dir)  # For services imports
+sys.path.append(current_dir)  # For agent imports
+
+# Import our modules (agent_orchestrator records its metrics into this registry)
 from agent_orchestrator import MRIAgentOrchestrator, MRIAnalysisRequest
+from services.metrics import REGISTRY, CONTENT_TYPE as METRICS_CONTENT_TYPE
 # from readmymri_preprocessor import HIPAACompliantDICOMProcessor
 
 # Configure logging
@@ -68,6 +75,10 @@ class AnalysisResponse(BaseModel):
     report_preview: str
     recommendations: List[str]
 
+@app.on_event("shutdown")
+async def close_agent_connections():
+    await agent_orchestrator.aclose()
+
 # 🌐 API Endpoints
 @app.get("/")
 async def root():
@@ -226,6 +237,11 @@ async def get_full_report(study_id: str):
         "generated_at": datetime.now().isoformat()
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Orchestrator stage, lesion-tracking and agent-call latencies in Prometheus text format"""
+    return Response(content=REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
 @app.get("/api/agents/health")
 async def agent_health_check():
     """Check health of all AI agents"""
@@ -269,10 +285,13 @@ if __name__ == "__main__":
     - GET  /api/analysis/{study_id} - Get analysis results
     - GET  /api/report/{study_id} - Get full report
     - GET  /api/agents/health - Check agent status
+    - GET  /metrics - Prometheus metrics
     
     SAK PASE! Let's make the world say NAP BOULE!
     """)
     
+    import uvicorn
+    
     uvicorn.run(
         app,
         host="0.0.0.0",
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Agent client concurrency benchmark
+
+Runs N concurrent Claude analysis calls against a local stub of the Messages
+API (fixed latency per call) in two ways:
+
+- threaded: the old pattern - sync anthropic.Anthropic inside asyncio.to_thread,
+  capped by the default executor size
+- async: ClaudeAgent's client - AsyncAnthropic over the shared AgentHTTPPool
+
+Both sides send the same minimal request, so the numbers compare the client
+layer only (the agent's prompt building and parsing are not on the clock).
+
+Run from backend/agents (needs the anthropic SDK, no API key):
+
+    python benchmark_agent_clients.py --latency 0.25 --concurrency 8 32 128
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+STUB_FINDINGS = [{
+    "type": "white_matter_lesion",
+    "location": {"x": 0.6, "y": 0.4, "z": 0.5},
+    "description": "Stub finding",
+    "confidence": 0.8,
+    "severity": "mild",
+    "evidence": ["stub"]
+}]
+
+STUB_BODY = json.dumps({
+    "id": "msg_stub",
+    "type": "message",
+    "role": "assistant",
+    "model": "stub",
+    "content": [{"type": "text", "text": json.dumps(STUB_FINDINGS)}],
+    "stop_reason": "end_turn",
+    "stop_sequence": None,
+    "usage": {"input_tokens": 1, "output_tokens": 1}
+}).encode()
+
+async def serve_stub(latency: float):
+    """Minimal keep-alive HTTP/1.1 server answering every request after `latency` seconds"""
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                if length:
+                    await reader.readexactly(length)
+                await asyncio.sleep(latency)
+                writer.write(b"HTTP/1.1 200 OK\r\ncontent-type: application/json\r\n"
+                             b"content-length: " + str(len(STUB_BODY)).encode() + b"\r\n\r\n" + STUB_BODY)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+    
+    return await asyncio.start_server(handle, "127.0.0.1", 0, backlog=1024)
+
+async def run_threaded(base_url: str, concurrency: int) -> float:
+    import anthropic
+    client = anthropic.Anthropic(api_key="benchmark", base_url=base_url)
+    
+    def call():
+        return client.messages.create(model="stub", max_tokens=16,
+                                      messages=[{"role": "user", "content": "benchmark"}])
+    
+    start = time.perf_counter()
+    await asyncio.gather(*[asyncio.to_thread(call) for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    client.close()
+    return elapsed
+
+async def run_async(concurrency: int) -> float:
+    from agent_orchestrator import ClaudeAgent, AgentHTTPPool
+    pool = AgentHTTPPool.from_env()
+    agent = ClaudeAgent(http_pool=pool)
+    
+    def call():
+        return agent.client.messages.create(model="stub", max_tokens=16,
+                                            messages=[{"role": "user", "content": "benchmark"}])
+    
+    start = time.perf_counter()
+    await asyncio.gather(*[call() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    await pool.aclose()
+    return elapsed
+
+async def main_async(latency: float, levels) -> int:
+    server = await serve_stub(latency)
+    port = server.sockets[0].getsockname()[1]
+    base_url = f"http://127.0.0.1:{port}"
+    os.environ.update({"ANTHROPIC_API_KEY": "benchmark", "ANTHROPIC_BASE_URL": base_url, "DEMO_MODE": "false"})
+    
+    executor_size = min(32, (os.cpu_count() or 1) + 4)
+    print(f"Stub latency {latency:.3f}s, default executor {executor_size} threads")
+    print(f"{'calls':>6} {'threaded s':>11} {'calls/s':>8} {'async s':>9} {'calls/s':>8}")
+    async with server:
+        for concurrency in levels:
+            threaded = await run_threaded(base_url, concurrency)
+            native = await run_async(concurrency)
+            print(f"{concurrency:>6} {threaded:>11.2f} {concurrency / threaded:>8.1f} "
+                  f"{native:>9.2f} {concurrency / native:>8.1f}")
+    return 0
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.25)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8, 32, 128])
+    args = parser.parse_args()
+    return asyncio.run(main_async(args.latency, args.concurrency))
+
+if __name__ == "__main__":
+    sys.exit(main())
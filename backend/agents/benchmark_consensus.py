@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Consensus grouping benchmark
+
+Generates synthetic multi-slice agent output - lesions scattered through a
+normalized volume, each reported by most agents with some positional jitter,
+plus unmatched noise findings - and times ConsensusEngine grouping:
+
+- all_pairs: the previous nested loop over every pair of findings (with the
+  same nearest-per-agent rule, so the groups can be compared)
+- grid: ConsensusEngine._group_similar_findings (type buckets + grid hash)
+- consensus: the full consensus stage - FindingTable build, grouping,
+  calculate_consensus and agent_agreements
+
+all_pairs is quadratic, so it only runs up to --all-pairs-max findings; where
+both run, the groups are checked to be identical. Run from backend/agents:
+
+    python benchmark_consensus.py --findings 1000 10000 50000
+"""
+
+import sys
+import time
+import random
+import argparse
+from datetime import datetime
+from typing import Dict, List
+
+from agent_orchestrator import ConsensusEngine, Finding, FindingTable
+
+FINDING_TYPES = ["white_matter_lesion", "microhemorrhage", "lacunar_infarct", "enhancing_lesion"]
+
+def synthetic_findings(count: int, agents: int, jitter: float, seed: int = 7) -> Dict[str, List[Finding]]:
+    """About count findings: lesions seen by each agent with probability 0.8, plus 10% noise"""
+    rng = random.Random(seed)
+    all_findings = {f"agent_{a}": [] for a in range(agents)}
+    serial = 0
+    
+    def add(agent_id: str, finding_type: str, x: float, y: float, z: float):
+        nonlocal serial
+        serial += 1
+        all_findings[agent_id].append(Finding(
+            finding_id=f"{agent_id}_{serial}",
+            agent_id=agent_id,
+            finding_type=finding_type,
+            location={"x": x, "y": y, "z": z},
+            description="synthetic",
+            confidence=rng.uniform(0.5, 0.95),
+            severity="mild",
+            evidence=["synthetic"],
+            timestamp=datetime.now()
+        ))
+    
+    lesions = int(count * 0.9 / (agents * 0.8))
+    for _ in range(lesions):
+        finding_type = rng.choice(FINDING_TYPES)
+        center = [rng.random() for _ in range(3)]
+        for agent_id in all_findings:
+            if rng.random() < 0.8:
+                add(agent_id, finding_type, *(c + rng.gauss(0, jitter) for c in center))
+    for _ in range(count - serial):
+        add(rng.choice(list(all_findings)), rng.choice(FINDING_TYPES), rng.random(), rng.random(), rng.random())
+    return all_findings
+
+def group_all_pairs(engine: ConsensusEngine, all_findings: Dict[str, List[Finding]]) -> List[List[Finding]]:
+    """Reference grouping: every seed compared with every other finding"""
+    findings = [finding for agent_findings in all_findings.values() for finding in agent_findings]
+    by_type_order = {}
+    for finding in findings:
+        by_type_order.setdefault(finding.finding_type, []).append(finding)
+    
+    groups = []
+    for typed in by_type_order.values():
+        grouped = set()
+        for finding in typed:
+            if finding.finding_id in grouped:
+                continue
+            grouped.add(finding.finding_id)
+            nearest = {}
+            for other in typed:
+                if other.finding_id in grouped or other.agent_id == finding.agent_id:
+                    continue
+                if engine._are_findings_similar(finding, other):
+                    p1, p2 = engine._coordinates(finding), engine._coordinates(other)
+                    distance_sq = sum((a - b) ** 2 for a, b in zip(p1, p2))
+                    if distance_sq < nearest.get(other.agent_id, (float("inf"),))[0]:
+                        nearest[other.agent_id] = (distance_sq, other)
+            group = [finding] + [other for _, other in nearest.values()]
+            grouped.update(other.finding_id for other in group)
+            groups.append(group)
+    return groups
+
+def signature(groups: List[List[Finding]]):
+    return sorted(tuple(sorted(f.finding_id for f in group)) for group in groups)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--findings", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--agents", type=int, default=3)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--distance", type=float, default=0.15)
+    parser.add_argument("--all-pairs-max", type=int, default=4000)
+    args = parser.parse_args()
+    
+    engine = ConsensusEngine(distance_threshold=args.distance)
+    print(f"{args.agents} agents, jitter {args.jitter}, distance threshold {args.distance}")
+    print(f"{'findings':>9} {'groups':>7} {'grid s':>8} {'consensus s':>12} {'all_pairs s':>12} {'same groups':>12}")
+    failed = False
+    for count in args.findings:
+        all_findings = synthetic_findings(count, args.agents, args.jitter)
+        start = time.perf_counter()
+        groups = engine._group_similar_findings(all_findings)
+        grid_seconds = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        table = FindingTable.from_agent_findings(all_findings)
+        group_ids = engine.group(table)
+        engine.calculate_consensus(table, 0.6, group_ids=group_ids)
+        engine.agent_agreements(table, group_ids)
+        consensus_seconds = time.perf_counter() - start
+        
+        if count <= args.all_pairs_max:
+            start = time.perf_counter()
+            reference = group_all_pairs(engine, all_findings)
+            pairs_seconds = f"{time.perf_counter() - start:.3f}"
+            same = signature(groups) == signature(reference)
+            failed = failed or not same
+            same = "yes" if same else "NO"
+        else:
+            pairs_seconds, same = "skipped", "-"
+        print(f"{count:>9} {len(groups):>7} {grid_seconds:>8.3f} {consensus_seconds:>12.3f} {pairs_seconds:>12} {same:>12}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
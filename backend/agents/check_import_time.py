@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Import-time budget check for the agent orchestrator
+
+Imports agent_orchestrator in a fresh interpreter, fails if the import takes
+longer than the budget or drags in any of its heavy SDKs (those load on first
+use by the agent that needs them). Run from backend/agents:
+
+    python check_import_time.py            # budget from IMPORT_BUDGET_SECONDS (default 1.0)
+    python check_import_time.py --budget 0.5 --module api_server
+
+The test suite runs the same check for agent_orchestrator (tests/test_import_time.py).
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+AGENTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Runs in the child: time the import and report which heavy modules got loaded
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+module = __import__({module!r})
+elapsed = time.perf_counter() - start
+heavy = getattr(sys.modules.get('agent_orchestrator'), 'HEAVY_MODULES', ())
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in heavy if m in sys.modules]}}))
+"""
+
+def measure(module: str) -> dict:
+    """Import module in a clean interpreter and return {"seconds", "loaded"}"""
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    completed = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module)],
+        cwd=AGENTS_DIR, env=env, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{completed.stderr.strip()}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="agent_orchestrator")
+    parser.add_argument("--budget", type=float, default=float(os.getenv("IMPORT_BUDGET_SECONDS", "1.0")))
+    args = parser.parse_args()
+    
+    try:
+        result = measure(args.module)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return 1
+    print(f"import {args.module}: {result['seconds']:.3f}s (budget {args.budget:.3f}s)")
+    
+    failures = []
+    if result["seconds"] > args.budget:
+        failures.append(f"import took {result['seconds']:.3f}s, over the {args.budget:.3f}s budget")
+    if result["loaded"]:
+        failures.append(f"heavy modules imported eagerly: {', '.join(result['loaded'])}")
+    
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ Import budget OK")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
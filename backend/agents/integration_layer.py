@@ -34,6 +34,10 @@ from agent_orchestrator import MRIAgentOrchestrator, MRIAnalysisRequest
 
 logger = logging.getLogger(__name__)
 
+# Per-instance DICOM fields the orchestrator needs to place each image in its series
+SLICE_GEOMETRY_FIELDS = ('series_instance_uid', 'image_position_patient', 'image_orientation_patient',
+                         'slice_location', 'slice_thickness', 'instance_number')
+
 class ReadMyMRIIntegration:
     """Integration layer between preprocessor and agent orchestrator"""
     
@@ -96,6 +100,7 @@ class ReadMyMRIIntegration:
             analysis_request = MRIAnalysisRequest(
                 study_id=processed_data['study_id'],
                 image_data=agent_ready_data['image_data'],
+                slice_metadata=agent_ready_data['slice_metadata'],
                 metadata=agent_ready_data['metadata'],
                 user_context=user_context,
                 priority=user_context.get('priority', 'routine')
@@ -210,18 +215,23 @@ class ReadMyMRIIntegration:
             if primary_metadata.get(param) != 'Unknown':
                 consolidated_metadata[param] = primary_metadata[param]
         
-        # Prepare image data for agents
+        # Prepare image data for agents (with per-image geometry for cross-slice tracking)
         agent_image_data = []
+        slice_metadata = []
         
         # Handle different data formats
         if isinstance(image_data_list, list):
             for item in image_data_list:
                 if isinstance(item, dict) and item.get('image_data'):
                     agent_image_data.append(item['image_data'])
+                    item_metadata = item.get('metadata') or {}
+                    slice_metadata.append({key: item_metadata[key] for key in SLICE_GEOMETRY_FIELDS
+                                           if item_metadata.get(key) not in (None, 'Unknown')})
                     logger.info(f"✅ Added image from {item.get('anonymized_id', 'Unknown')}")
                 elif isinstance(item, str):
                     # Direct base64 string
                     agent_image_data.append(item)
+                    slice_metadata.append({})
                     logger.info("✅ Added image (direct base64)")
         
         # If metadata is unreliable but we have images, that's OK
@@ -230,6 +240,7 @@ class ReadMyMRIIntegration:
         
         return {
             'image_data': agent_image_data,
+            'slice_metadata': slice_metadata,
             'metadata': consolidated_metadata,
             'metadata_quality': processed_data.get('protocol_info', {}).get('metadata_quality', 'Unknown')
         }
@@ -1,12 +1,11 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import anthropic
+from fastapi.responses import JSONResponse, Response
 import os
 from dotenv import load_dotenv
 import json
 import time
-from typing import Optional, List
+from typing import Optional, List, Union, Tuple
 import traceback
 import pydicom
 import numpy as np
@@ -17,14 +16,42 @@ import tempfile
 from pathlib import Path
 import zipfile
 import shutil
+import asyncio
+import re
+import uuid
 
 # ADD ORCHESTRATION IMPORTS
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from preprocessor.readmymri_preprocessorv4 import ReadMyMRIPreprocessor
+from services.llm_client import AsyncLLMClient, LLMTimeoutError
+from services.job_queue import JobQueue, JobFailedError, QueueFullError
+from services.capabilities import CapabilityRegistry, import_probe
+from services.metrics import REGISTRY, CONTENT_TYPE as METRICS_CONTENT_TYPE, time_stage, time_agent_call
+from preprocessor.readmymri_preprocessorv4 import ReadMyMRIPreprocessor, WindowLevelRenderer, StudyWorkspace, SliceStore, PreviewPyramid
+
+# Streaming multipart parser (falls back to Starlette's form parser if missing)
+try:
+    from streaming_form_data import StreamingFormDataParser
+    from streaming_form_data.targets import FileTarget, ValueTarget
+    STREAMING_FORM_DATA_AVAILABLE = True
+except ImportError:
+    STREAMING_FORM_DATA_AVAILABLE = False
+    print("⚠️ streaming-form-data not available - using buffered form parsing")
 
 load_dotenv()
 
+# Upload limits - the cap is enforced while the body is still arriving
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(1024 * 1024 * 1024)))  # 1GB
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))  # 1MB
+MULTIPART_OVERHEAD_BYTES = 64 * 1024  # Boundaries, part headers and small form fields
+
+# Study workspaces - slices are served from here after the upload response has gone out
+STUDY_DIR = os.getenv("READMYMRI_STUDY_DIR", os.path.join(tempfile.gettempdir(), "readmymri_studies"))
+STUDY_TTL_SECONDS = int(os.getenv("READMYMRI_STUDY_TTL_SECONDS", "3600"))
+SLICE_CACHE_MAX_AGE = int(os.getenv("SLICE_CACHE_MAX_AGE", "3600"))
+STUDY_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+SLICE_MEDIA_TYPES = {"png": "image/png", "webp": "image/webp"}
+
 app = FastAPI(title="ReadMyMRI AI Backend", version="2.0.0")
 
 # CORS for frontend
@@ -36,24 +63,233 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize Claude
+# Initialize Claude (async, pooled - model calls never block the event loop)
 try:
-    claude_client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-    print("✅ Claude client initialized successfully")
+    claude_client = AsyncLLMClient.from_env()
+    if claude_client.available:
+        print(f"✅ Claude client initialized successfully "
+              f"(max {claude_client.max_concurrency} concurrent calls, {claude_client.timeout_seconds:.0f}s timeout)")
+    else:
+        print("❌ Claude client not configured (ANTHROPIC_API_KEY missing)")
+        claude_client = None
 except Exception as e:
     print(f"❌ Failed to initialize Claude client: {e}")
     claude_client = None
 
-def extract_dicom_metadata(dicom_file_content: bytes) -> dict:
-    """Extract comprehensive metadata from DICOM file"""
+# Bounded pool for upload processing (queue depth capped -> 429 + Retry-After)
+upload_jobs = JobQueue.from_env()
+
+# Gauges are sampled at scrape time - nothing to update on the hot path
+REGISTRY.gauge("readmymri_upload_queue_depth", "Uploads waiting for a worker").set_function(
+    lambda: upload_jobs.depth)
+REGISTRY.gauge("readmymri_upload_jobs_in_flight", "Uploads currently being processed").set_function(
+    lambda: upload_jobs.in_flight)
+REGISTRY.gauge("readmymri_llm_calls_in_flight", "LLM calls currently awaiting a reply").set_function(
+    lambda: claude_client.in_flight if claude_client is not None else 0)
+REGISTRY.gauge("readmymri_cache_hit_ratio", "Hits / lookups since start", ("cache",)).set_function(
+    lambda: claude_client.cache.hit_ratio if claude_client is not None and claude_client.cache else 0.0,
+    cache="llm_response")
+
+# Optional components are probed once, off the event loop - health endpoints only read the cache
+capabilities = CapabilityRegistry()
+capabilities.register("integration_layer", import_probe("agents.integration_layer", "ReadMyMRIIntegration"))
+capabilities.register("ai_agents", import_probe("agents.agent_orchestrator", "MRIAgentOrchestrator"))
+
+@app.on_event("startup")
+async def probe_capabilities():
+    capabilities.start_background_probe()
+
+@app.on_event("shutdown")
+async def close_llm_client():
+    if claude_client is not None:
+        await claude_client.aclose()
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds MAX_UPLOAD_BYTES"""
+    pass
+
+
+class UploadRejectedError(Exception):
+    """Raised when an upload is malformed or not a ZIP file"""
+    pass
+
+
+open_studies = {}  # study_id -> StudyWorkspace
+
+def study_dir(study_id: str) -> Optional[str]:
+    """Workspace directory for a study id (None for ids that are not ours)"""
+    if not STUDY_ID_PATTERN.match(study_id):
+        return None
+    return os.path.join(STUDY_DIR, study_id)
+
+def open_study(study_id: str) -> Optional[StudyWorkspace]:
+    """Load (and keep) the workspace of a processed study"""
+    workspace = open_studies.get(study_id)
+    if workspace is None:
+        path = study_dir(study_id)
+        if path is None or not os.path.exists(os.path.join(path, StudyWorkspace.MANIFEST)):
+            return None
+        workspace = open_studies[study_id] = StudyWorkspace(path)
+    return workspace
+
+def purge_expired_studies():
+    """Remove study workspaces older than STUDY_TTL_SECONDS"""
+    if not os.path.isdir(STUDY_DIR):
+        return
+    cutoff = time.time() - STUDY_TTL_SECONDS
+    for study_id in os.listdir(STUDY_DIR):
+        path = os.path.join(STUDY_DIR, study_id)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                open_studies.pop(study_id, None)
+                shutil.rmtree(path)
+        except OSError:
+            pass
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match check (weak comparison, as for GET)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in candidates or f'"{etag}"' in candidates
+
+def study_references(study_id: str, preprocessor_data: dict) -> dict:
+    """URLs for a processed study - the images themselves are fetched separately"""
+    base_url = f"/api/studies/{study_id}"
+    series = []
+    for entry in preprocessor_data.get('series', []):
+        series_url = f"{base_url}/series/{entry['series_key']}"
+        series.append({
+            "series_key": entry['series_key'],
+            "series_description": entry.get('series_description'),
+            "modality": entry.get('modality'),
+            "slice_count": entry.get('slice_count', 0),
+            "slice_numbers": entry.get('slice_numbers', []),
+            "slice_url_template": f"{series_url}/slices/{{n}}"
+        })
+    
+    previews = []
+    for item in preprocessor_data.get('image_data', []):
+        if not item.get('etags'):
+            continue
+        url = f"{base_url}/series/{item['series_key']}/slices/{item['slice_number']}"
+        previews.append({
+            "anonymized_id": item.get('anonymized_id'),
+            "series_key": item['series_key'],
+            "slice_number": item['slice_number'],
+            "tiers": {tier: {"url": f"{url}?tier={tier}", "etag": etag} for tier, etag in item['etags'].items()}
+        })
+    return {"id": study_id, "url": base_url, "series": series, "previews": previews}
+
+def format_byte_size(num_bytes: int) -> str:
+    """Human readable size used in health responses (e.g. '1GB', '512MB')"""
+    for unit, factor in (("GB", 1024 ** 3), ("MB", 1024 ** 2), ("KB", 1024)):
+        if num_bytes >= factor and num_bytes % factor == 0:
+            return f"{num_bytes // factor}{unit}"
+    return f"{num_bytes}B"
+
+
+async def stream_upload_to_disk(request: Request, dest_path: str) -> dict:
+    """
+    Stream a multipart ZIP upload straight to disk.
+
+    The request body is consumed chunk by chunk from the ASGI receive channel, so
+    memory use is bounded by the chunk size no matter how large the study is, and
+    MAX_UPLOAD_BYTES is enforced before the rest of an oversized body is read.
+    """
+    start = time.perf_counter()
+    body_limit = MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES
+
+    # Reject early when the client announces an oversized body
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > body_limit:
+        raise UploadTooLargeError(
+            f"Upload of {int(content_length)} bytes exceeds the {format_byte_size(MAX_UPLOAD_BYTES)} limit"
+        )
+
+    bytes_received = 0
+    filename = None
+    clinical_context = None
+
+    if STREAMING_FORM_DATA_AVAILABLE:
+        parser = StreamingFormDataParser(headers=request.headers)
+        file_target = FileTarget(dest_path)
+        context_target = ValueTarget()
+        parser.register("file", file_target)
+        parser.register("clinical_context", context_target)
+
+        try:
+            async for chunk in request.stream():
+                bytes_received += len(chunk)
+                if bytes_received > body_limit:
+                    raise UploadTooLargeError(
+                        f"Upload exceeds the {format_byte_size(MAX_UPLOAD_BYTES)} limit"
+                    )
+                parser.data_received(chunk)
+
+                # Fail fast on non-ZIP uploads once the part headers have been parsed
+                if filename is None and file_target.multipart_filename:
+                    filename = file_target.multipart_filename
+                    if not filename.lower().endswith('.zip'):
+                        raise UploadRejectedError("Please upload a ZIP file")
+        finally:
+            # The parser only closes the file at the end of its part - close it
+            # here too, so a body cut short never leaves it open for the cleanup
+            file_target.finish()
+
+        if context_target.value:
+            clinical_context = context_target.value.decode("utf-8", errors="replace")
+    else:
+        # Starlette spools file parts to disk; copy them across in fixed-size chunks
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or not hasattr(upload, "read"):
+            raise UploadRejectedError("No file part named 'file' in upload")
+        filename = upload.filename
+        if not filename or not filename.lower().endswith('.zip'):
+            raise UploadRejectedError("Please upload a ZIP file")
+
+        with open(dest_path, 'wb') as f:
+            while chunk := await upload.read(UPLOAD_CHUNK_BYTES):
+                bytes_received += len(chunk)
+                if bytes_received > MAX_UPLOAD_BYTES:
+                    raise UploadTooLargeError(
+                        f"Upload exceeds the {format_byte_size(MAX_UPLOAD_BYTES)} limit"
+                    )
+                f.write(chunk)
+
+        context_value = form.get("clinical_context")
+        if isinstance(context_value, str):
+            clinical_context = context_value
+
+    if filename is None or not os.path.exists(dest_path):
+        raise UploadRejectedError("No file part named 'file' in upload")
+
+    file_bytes = os.path.getsize(dest_path)
+    if file_bytes > MAX_UPLOAD_BYTES:
+        raise UploadTooLargeError(
+            f"Upload exceeds the {format_byte_size(MAX_UPLOAD_BYTES)} limit"
+        )
+
+    elapsed = max(time.perf_counter() - start, 1e-6)
+    return {
+        "filename": filename,
+        "file_bytes": file_bytes,
+        "bytes_received": bytes_received,
+        "receive_time_seconds": round(elapsed, 3),
+        "bytes_per_second": round(bytes_received / elapsed),
+        "clinical_context": clinical_context,
+    }
+
+def parse_dicom(dicom_file_content: Union[bytes, memoryview]) -> pydicom.Dataset:
+    """Parse DICOM bytes in memory (no temp file); pixel data is decoded lazily"""
+    return pydicom.dcmread(io.BytesIO(dicom_file_content), force=True)
+
+def extract_dicom_metadata(dicom: Union[bytes, pydicom.Dataset]) -> dict:
+    """Extract comprehensive metadata from DICOM bytes or an already parsed dataset"""
     try:
-        # Save to temporary file for pydicom processing
-        with tempfile.NamedTemporaryFile(suffix='.dcm', delete=False) as temp_file:
-            temp_file.write(dicom_file_content)
-            temp_file_path = temp_file.name
-        
-        # Read DICOM file
-        ds = pydicom.dcmread(temp_file_path, force=True)
+        ds = dicom if isinstance(dicom, pydicom.Dataset) else parse_dicom(dicom)
         
         # Extract key metadata
         metadata = {
@@ -100,9 +336,6 @@ def extract_dicom_metadata(dicom_file_content: bytes) -> dict:
             "sequence_variant": getattr(ds, 'SequenceVariant', 'Unknown'),
         }
         
-        # Clean up temporary file
-        os.unlink(temp_file_path)
-        
         # Convert any non-serializable values to strings
         for key, value in metadata.items():
             if hasattr(value, '__iter__') and not isinstance(value, str):
@@ -124,46 +357,66 @@ def extract_dicom_metadata(dicom_file_content: bytes) -> dict:
             "file_type": "Invalid DICOM"
         }
 
-def generate_dicom_preview(dicom_file_content: bytes) -> Optional[str]:
-    """Generate a preview image from DICOM file"""
+# Shared so LUTs are reused across previews
+preview_renderer = WindowLevelRenderer()
+
+def generate_dicom_preview(dicom: Union[bytes, pydicom.Dataset]) -> Optional[str]:
+    """Generate a preview image from DICOM bytes or an already parsed dataset"""
     try:
-        with tempfile.NamedTemporaryFile(suffix='.dcm', delete=False) as temp_file:
-            temp_file.write(dicom_file_content)
-            temp_file_path = temp_file.name
-        
-        ds = pydicom.dcmread(temp_file_path, force=True)
+        ds = dicom if isinstance(dicom, pydicom.Dataset) else parse_dicom(dicom)
         
         if hasattr(ds, 'pixel_array'):
-            # Get pixel data
-            pixel_array = ds.pixel_array
+            # Window to 0-255 with the header's rescale/window (auto window if absent)
+            pixel_array = preview_renderer.render_dataset(ds)
             
-            # Normalize to 0-255
-            pixel_array = pixel_array.astype(np.float64)
-            pixel_array = (pixel_array - pixel_array.min()) / (pixel_array.max() - pixel_array.min()) * 255
-            pixel_array = pixel_array.astype(np.uint8)
-            
-            # Create PIL Image
+            # Area-filtered downsample to the preview tier (max 512px) before encoding
+            pixel_array = PreviewPyramid.downsample(pixel_array, PreviewPyramid.TIERS["preview"])
             image = Image.fromarray(pixel_array)
             
-            # Resize for preview (max 512x512)
-            image.thumbnail((512, 512), Image.Resampling.LANCZOS)
-            
             # Convert to base64
             buffer = io.BytesIO()
             image.save(buffer, format='PNG')
             img_str = base64.b64encode(buffer.getvalue()).decode()
             
-            os.unlink(temp_file_path)
             return img_str
         
-        os.unlink(temp_file_path)
         return None
         
     except Exception as e:
         print(f"❌ Error generating DICOM preview: {e}")
         return None
 
-def analyze_dicom_with_ai(metadata: dict, symptoms: str, age: Optional[int] = None, sex: Optional[str] = None) -> dict:
+def extract_dicom_files(zip_path: str, dest_dir: str) -> Tuple[List[str], Optional[bytes]]:
+    """Unpack a ZIP for basic processing: (DICOM paths, bytes of the first one)"""
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        zip_ref.extractall(dest_dir)
+    
+    extracted_files = []
+    for root, dirs, files in os.walk(dest_dir):
+        for name in files:
+            if name.lower().endswith(('.dcm', '.dicom')):
+                extracted_files.append(os.path.join(root, name))
+    if not extracted_files:
+        return extracted_files, None
+    with open(extracted_files[0], 'rb') as f:
+        return extracted_files, f.read()
+
+def parse_and_render_dicom(dicom_file_content: bytes) -> Tuple[dict, Optional[str]]:
+    """One in-memory parse shared by metadata extraction and preview rendering"""
+    try:
+        with time_stage("dicom_parse"):
+            ds = parse_dicom(dicom_file_content)
+    except Exception as e:
+        print(f"❌ Error parsing DICOM file: {e}")
+        return {"error": f"Failed to parse DICOM file: {str(e)}", "file_type": "Invalid DICOM"}, None
+    
+    metadata = extract_dicom_metadata(ds)
+    if "error" in metadata:
+        return metadata, None
+    with time_stage("pixel_render"):
+        return metadata, generate_dicom_preview(ds)
+
+async def analyze_dicom_with_ai(metadata: dict, symptoms: str, age: Optional[int] = None, sex: Optional[str] = None) -> dict:
     """Enhanced AI analysis using DICOM metadata and clinical symptoms"""
     
     # Build comprehensive analysis prompt
@@ -246,16 +499,8 @@ def analyze_dicom_with_ai(metadata: dict, symptoms: str, age: Optional[int] = No
         return create_fallback_dicom_analysis(metadata, symptoms)
 
     try:
-        response = claude_client.messages.create(
-            model="claude-3-5-sonnet-20241022",
-            max_tokens=3000,
-            messages=[{
-                "role": "user", 
-                "content": analysis_prompt
-            }]
-        )
-        
-        ai_text = response.content[0].text
+        with time_agent_call("claude_analysis"):
+            ai_text = await claude_client.complete(analysis_prompt, max_tokens=3000)
         
         # Extract JSON from response
         try:
@@ -271,6 +516,9 @@ def analyze_dicom_with_ai(metadata: dict, symptoms: str, age: Optional[int] = No
             print(f"⚠️ JSON parsing failed: {json_error}")
             return create_fallback_dicom_analysis(metadata, symptoms)
             
+    except LLMTimeoutError as e:
+        print(f"⏱️ Claude API timeout: {e}")
+        return create_fallback_dicom_analysis(metadata, symptoms)
     except Exception as e:
         print(f"❌ Claude API error: {e}")
         return create_fallback_dicom_analysis(metadata, symptoms)
@@ -352,55 +600,40 @@ async def api_health_check():
     API health check endpoint (Bruno tests compatibility).
     Provides comprehensive backend status with /api prefix.
     """
-    # Check integration layer availability
-    try:
-        from agents.integration_layer import IntegrationLayer
-        integration_ready = True
-    except:
-        integration_ready = False
-    
-    # Check AI agents availability  
-    try:
-        from agents.agent_orchestrator import AgentOrchestrator
-        ai_available = True
-    except:
-        ai_available = False
+    integration_ready = capabilities.is_available("integration_layer")
     
     return {
         "status": "✅ HEALTHY",
         "service": "ReadMyMRI Streaming Upload Service",
         "streaming_enabled": True,
-        "max_upload_size": "1GB",
+        "max_upload_size": format_byte_size(MAX_UPLOAD_BYTES),
         "integration_ready": integration_ready,
         "ai_agents_available": claude_client is not None,
+        "upload_queue": upload_jobs.stats(),
+        "capabilities": capabilities.status(),
         "protocol_mismatch_handling": True,
         "version": "3.0.0"
     }
 
 
+def capability_label(name: str) -> str:
+    capability = capabilities.get(name)
+    if capability is None:
+        return "⏳ Checking"
+    return "✅ Ready" if capability.available else "❌ Not available"
+
+
 @app.get("/api/demo-status")
 async def demo_status():
     """
     Comprehensive system status check (Bruno tests compatibility).
     Shows all component health and capabilities.
     """
-    # Check if integration layer is available
-    try:
-        from agents.integration_layer import IntegrationLayer
-        integration_status = "✅ Ready"
-        integration_available = True
-    except Exception as e:
-        integration_status = "❌ Not available"
-        integration_available = False
-    
-    # Check if AI agents are available
-    try:
-        from agents.agent_orchestrator import AgentOrchestrator
-        ai_status = "✅ Ready"
-        ai_agents_available = True
-    except Exception as e:
-        ai_status = "❌ Not available"
-        ai_agents_available = False
+    # Probed once at startup - see capabilities above
+    integration_available = capabilities.is_available("integration_layer")
+    integration_status = capability_label("integration_layer")
+    ai_agents_available = capabilities.is_available("ai_agents")
+    ai_status = capability_label("ai_agents")
     
     # Check Claude client
     claude_status = "✅ Ready" if claude_client is not None else "❌ Not configured"
@@ -425,8 +658,8 @@ async def demo_status():
         "system_info": {
             "version": "3.0.0",
             "protocol_mismatch_resistant": True,
-            "streaming_technology": "streaming-form-data",
-            "max_file_size": "1GB",
+            "streaming_technology": "streaming-form-data" if STREAMING_FORM_DATA_AVAILABLE else "starlette-multipart",
+            "max_file_size": format_byte_size(MAX_UPLOAD_BYTES),
             "dicom_support": True
         },
         "demo_confidence": demo_confidence,
@@ -439,53 +672,147 @@ async def demo_status():
     }
 
 
+def error_response(status_code: int, message: str, headers: Optional[dict] = None) -> JSONResponse:
+    """Error in the upload API's {"status", "message", "data"} shape"""
+    return JSONResponse(
+        status_code=status_code,
+        headers=headers,
+        content={
+            "status": "error",
+            "message": message,
+            "data": None
+        }
+    )
+
+def queue_full_response(retry_after: int) -> JSONResponse:
+    return error_response(
+        429,
+        f"Server is busy processing other studies - retry in {retry_after}s",
+        headers={"Retry-After": str(retry_after)}
+    )
+
+def job_references(job) -> dict:
+    return {
+        "job_id": job.job_id,
+        "status_url": f"/api/jobs/{job.job_id}",
+        "result_url": f"/api/jobs/{job.job_id}/result"
+    }
+
+def job_result_response(job) -> JSONResponse:
+    """Final payload of a job, or its status while it is still pending"""
+    if job.state in ("queued", "running"):
+        return JSONResponse(status_code=202, content={
+            "status": job.state,
+            "message": "Job is still in progress",
+            **job_references(job),
+            "data": None
+        })
+    if job.state == "failed":
+        if job.result is not None:
+            return JSONResponse(status_code=500, content=job.result)
+        return error_response(500, job.error or "Processing failed")
+    return JSONResponse(content=job.result)
+
+
+@app.on_event("startup")
+async def start_upload_jobs():
+    upload_jobs.start()
+
+
+@app.on_event("shutdown")
+async def stop_upload_jobs():
+    await upload_jobs.stop()
+
+
 @app.post("/api/upload-zip")
-async def upload_zip(
-    file: UploadFile = File(...),
-    clinical_context: Optional[str] = Form(None)
-):
+async def upload_zip(request: Request, wait: bool = False):
     """
     Handle ZIP file uploads with FULL ORCHESTRATION AND AGENTS!
+
+    Expects multipart/form-data with a `file` part (the ZIP) and an optional
+    `clinical_context` JSON field. The body is streamed to disk as it arrives,
+    then processing is queued: the response is 202 with a job id (poll
+    /api/jobs/{id}), or the final result when called with ?wait=true.
+    A saturated queue answers 429 with Retry-After before the body is read.
     """
+    # Backpressure - don't accept a body we have no capacity to process
+    if upload_jobs.is_full:
+        return queue_full_response(upload_jobs.retry_after())
+    
     start_time = time.time()
-    temp_dir = None
     
+    # Create temporary directory
+    temp_dir = tempfile.mkdtemp(prefix="readmymri_")
+    zip_path = os.path.join(temp_dir, "upload.zip")
+    
+    # Stream uploaded file to disk with a fixed memory budget
     try:
-        print(f"🔥 ORCHESTRATION STARTING: {file.filename}")
-        print(f"📊 File size: {file.size} bytes")
-        
-        # Parse clinical context
-        context = {}
-        if clinical_context:
-            try:
-                context = json.loads(clinical_context)
-            except:
-                context = {"raw": clinical_context}
-        
-        # Validate file type
-        if not file.filename.lower().endswith('.zip'):
-            return JSONResponse(
-                status_code=400,
-                content={
-                    "status": "error",
-                    "message": "Please upload a ZIP file",
-                    "data": None
-                }
-            )
-        
-        # Create temporary directory
-        temp_dir = tempfile.mkdtemp(prefix="readmymri_")
-        zip_path = os.path.join(temp_dir, "upload.zip")
-        
-        # Save uploaded file
-        with open(zip_path, 'wb') as f:
-            content = await file.read()
-            f.write(content)
-        
+        with time_stage("upload_receive"):
+            upload_info = await stream_upload_to_disk(request, zip_path)
+    except UploadTooLargeError as e:
+        await asyncio.to_thread(shutil.rmtree, temp_dir, ignore_errors=True)
+        return error_response(413, str(e))
+    except UploadRejectedError as e:
+        await asyncio.to_thread(shutil.rmtree, temp_dir, ignore_errors=True)
+        return error_response(400, str(e))
+    except Exception as e:
+        print(f"❌ Upload failed: {e}")
+        await asyncio.to_thread(shutil.rmtree, temp_dir, ignore_errors=True)
+        return error_response(500, f"Upload was not received: {str(e)}")
+    
+    filename = upload_info["filename"]
+    print(f"📥 UPLOAD RECEIVED: {filename}")
+    print(f"📊 File size: {upload_info['file_bytes']} bytes "
+          f"({upload_info['bytes_per_second'] / (1024*1024):.1f} MB/s)")
+    
+    # Parse clinical context
+    context = {}
+    clinical_context = upload_info["clinical_context"]
+    if clinical_context:
+        try:
+            context = json.loads(clinical_context)
+        except:
+            context = {"raw": clinical_context}
+    
+    try:
+        job = upload_jobs.submit(process_upload_job, temp_dir, zip_path, upload_info, context, start_time,
+                                 filename=filename)
+    except QueueFullError as e:
+        await asyncio.to_thread(shutil.rmtree, temp_dir, ignore_errors=True)
+        return queue_full_response(e.retry_after)
+    
+    print(f"🗂️ Queued job {job.job_id} (queue depth {upload_jobs.depth}, in flight {upload_jobs.in_flight})")
+    
+    if wait:
+        await job.done.wait()
+        return job_result_response(job)
+    
+    return JSONResponse(status_code=202, content={
+        "status": "queued",
+        "message": "Upload received - processing queued",
+        **job_references(job),
+        "queue_position": upload_jobs.position(job),
+        "data": None
+    })
+
+
+async def process_upload_job(temp_dir: str, zip_path: str, upload_info: dict,
+                             context: dict, start_time: float) -> dict:
+    """Run the preprocessor and AI analysis for one queued upload"""
+    filename = upload_info["filename"]
+    workspace_dir = None
+    
+    try:
+        print(f"🔥 ORCHESTRATION STARTING: {filename}")
         print("🤖 INITIALIZING READMYMRI PREPROCESSOR...")
         
+        # Slices are written to a study workspace and served by reference
+        await asyncio.to_thread(purge_expired_studies)
+        study_id = uuid.uuid4().hex
+        workspace_dir = study_dir(study_id)
+        
         # USE THE FULL PREPROCESSOR WITH ALL AGENTS!
-        processor = ReadMyMRIPreprocessor()
+        processor = ReadMyMRIPreprocessor(workspace_dir=workspace_dir, inline_images=False)
         
         # Process with full orchestration
         print("🚀 LAUNCHING MULTI-AGENT ORCHESTRATION...")
@@ -507,7 +834,7 @@ async def upload_zip(
                 symptoms = context.get('clinical_question', 'Routine MRI analysis')
                 metadata = preprocessor_data['metadata']
                 
-                ai_analysis = analyze_dicom_with_ai(
+                ai_analysis = await analyze_dicom_with_ai(
                     metadata, 
                     symptoms,
                     context.get('patient_age'),
@@ -527,100 +854,182 @@ async def upload_zip(
                 "ai_analysis": preprocessor_data.get('ai_analysis', {}),
                 "agents_used": preprocessor_data.get('agents_used', []),
                 "orchestration_id": preprocessor_data.get('orchestration_id', ''),
+                "study": study_references(study_id, preprocessor_data),
                 "upload_stats": {
-                    "filename": file.filename,
-                    "size_mb": round(file.size / (1024*1024), 2),
+                    "filename": filename,
+                    "size_mb": round(upload_info["file_bytes"] / (1024*1024), 2),
                     "upload_time_seconds": round(time.time() - start_time, 2),
+                    "receive_time_seconds": upload_info["receive_time_seconds"],
+                    "bytes_per_second": upload_info["bytes_per_second"],
                     "streaming": True,
-                    "technology": "streaming-form-data",
+                    "technology": "streaming-form-data" if STREAMING_FORM_DATA_AVAILABLE else "starlette-multipart",
                     "orchestration": "multi-agent",
                     "agents_invoked": preprocessor_data.get('agents_used', [])
                 }
             }
             
-            return JSONResponse(content=response_data)
+            return response_data
             
         else:
             # Handle error case
             print(f"❌ ORCHESTRATION FAILED: {result.get('message')}")
-            return JSONResponse(
-                status_code=500,
-                content={
-                    "status": "error",
-                    "message": result.get('message', 'Processing failed'),
-                    "data": None
-                }
-            )
+            await asyncio.to_thread(shutil.rmtree, workspace_dir, ignore_errors=True)
+            raise JobFailedError(result.get('message', 'Processing failed'), {
+                "status": "error",
+                "message": result.get('message', 'Processing failed'),
+                "data": None
+            })
         
+    except JobFailedError:
+        raise
+    
     except Exception as e:
         print(f"❌ ORCHESTRATION ERROR: {e}")
         print(f"Stack trace: {traceback.format_exc()}")
+        if workspace_dir:
+            await asyncio.to_thread(shutil.rmtree, workspace_dir, ignore_errors=True)
         
         # Try basic processing as fallback
         try:
             print("⚠️ FALLING BACK TO BASIC PROCESSING...")
             
-            # Extract ZIP file for basic processing
-            extracted_files = []
+            if not zip_path or not os.path.exists(zip_path):
+                raise Exception("Upload was not received")
             
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                zip_ref.extractall(temp_dir)
-                
-                # Find all DICOM files in the ZIP
-                for root, dirs, files in os.walk(temp_dir):
-                    for filename in files:
-                        if filename.lower().endswith(('.dcm', '.dicom')):
-                            filepath = os.path.join(root, filename)
-                            extracted_files.append(filepath)
+            # Extract the ZIP and read the first DICOM file off the event loop
+            extracted_files, dicom_content = await asyncio.to_thread(extract_dicom_files, zip_path, temp_dir)
             
             if extracted_files:
-                # Process first DICOM file
-                with open(extracted_files[0], 'rb') as f:
-                    dicom_content = f.read()
-                
-                metadata = extract_dicom_metadata(dicom_content)
-                preview = generate_dicom_preview(dicom_content)
+                metadata, preview = await asyncio.to_thread(parse_and_render_dicom, dicom_content)
                 
-                return JSONResponse(
-                    content={
-                        "status": "partial_success",
-                        "message": f"Basic processing completed for {len(extracted_files)} files",
-                        "files_processed": len(extracted_files),
-                        "metadata": metadata,
-                        "dicom_data": {"preview_image": preview},
-                        "ai_analysis": {},
-                        "agents_used": ["basic_processor"],
-                        "upload_stats": {
-                            "filename": file.filename,
-                            "error": str(e),
-                            "fallback_mode": True
-                        }
+                return {
+                    "status": "partial_success",
+                    "message": f"Basic processing completed for {len(extracted_files)} files",
+                    "files_processed": len(extracted_files),
+                    "metadata": metadata,
+                    "dicom_data": {"preview_image": preview},
+                    "ai_analysis": {},
+                    "agents_used": ["basic_processor"],
+                    "upload_stats": {
+                        "filename": filename,
+                        "error": str(e),
+                        "fallback_mode": True
                     }
-                )
+                }
             else:
                 raise Exception("No DICOM files found in ZIP")
                 
         except Exception as fallback_error:
-            return JSONResponse(
-                status_code=500,
-                content={
-                    "status": "error",
-                    "message": f"Complete system failure: {str(e)}",
-                    "fallback_error": str(fallback_error),
-                    "data": None
-                }
-            )
+            raise JobFailedError(f"Complete system failure: {str(e)}", {
+                "status": "error",
+                "message": f"Complete system failure: {str(e)}",
+                "fallback_error": str(fallback_error),
+                "data": None
+            })
     
     finally:
         # Clean up
         if temp_dir and os.path.exists(temp_dir):
             try:
-                shutil.rmtree(temp_dir)
+                await asyncio.to_thread(shutil.rmtree, temp_dir)
                 print("🧹 Cleaned up orchestration workspace")
             except:
                 pass
 
 
+@app.get("/api/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """State of a queued upload job"""
+    job = upload_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return {**job.to_status(upload_jobs.position(job)), **job_references(job)}
+
+
+@app.get("/api/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """Result of a finished upload job (202 while it is still pending)"""
+    job = upload_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job_result_response(job)
+
+
+@app.get("/api/studies/{study_id}")
+async def get_study(study_id: str):
+    """Series and slice references for a processed study"""
+    workspace = open_study(study_id)
+    if workspace is None:
+        raise HTTPException(status_code=404, detail="Study not found or expired")
+    
+    base_url = f"/api/studies/{study_id}"
+    return {
+        "id": study_id,
+        "series": [
+            {
+                "series_key": entry['key'],
+                "series_description": entry.get('series_description'),
+                "modality": entry.get('modality'),
+                "slice_count": entry['slice_count'],
+                "slice_numbers": entry.get('slice_numbers', list(range(entry['slice_count']))),
+                "slice_url_template": f"{base_url}/series/{entry['key']}/slices/{{n}}",
+                "previews": [
+                    {
+                        "slice_number": item['number'],
+                        "tiers": {
+                            tier: {"url": f"{base_url}/series/{entry['key']}/slices/{item['number']}?tier={tier}",
+                                   "etag": etag}
+                            for tier, etag in item['etags'].items()
+                        }
+                    }
+                    for item in entry.get('slices', [])
+                ]
+            }
+            for entry in workspace.series.values()
+        ]
+    }
+
+
+@app.get("/api/studies/{study_id}/series/{series_key}/slices/{n}")
+async def get_slice(study_id: str, series_key: str, n: int, request: Request,
+                    format: str = "png", tier: str = "full"):
+    """Encoded slice image (PNG or lossless WebP) with ETag revalidation
+    
+    tier selects the pyramid level: thumbnail (128px), preview (512px) or full.
+    """
+    if format not in SliceStore.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{format}' (use png or webp)")
+    if tier not in SliceStore.TIERS:
+        raise HTTPException(status_code=400, detail=f"Unknown tier '{tier}' (use {', '.join(SliceStore.TIERS)})")
+    
+    workspace = open_study(study_id)
+    if workspace is None:
+        raise HTTPException(status_code=404, detail="Study not found or expired")
+    
+    headers = {"Cache-Control": f"private, max-age={SLICE_CACHE_MAX_AGE}, immutable"}
+    
+    # Known ETag: answer revalidation without touching the file
+    etag = workspace.slice_store.etag(series_key, n, format, tier)
+    if etag and etag_matches(request, etag):
+        return Response(status_code=304, headers={**headers, "ETag": f'"{etag}"'})
+    
+    # Stored slices are a file read; others are rendered from the volume once
+    found = await asyncio.to_thread(workspace.get_slice, series_key, n, format, tier)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Slice not available")
+    data, etag = found
+    headers["ETag"] = f'"{etag}"'
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=data, media_type=SLICE_MEDIA_TYPES[format], headers=headers)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Stage latency histograms and queue/cache gauges in Prometheus text format"""
+    return Response(content=REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+
 @app.get("/api/agent-status")
 async def agent_status():
     """Check which AI agents are available"""
@@ -633,7 +1042,8 @@ async def agent_status():
         "claude": {
             "available": claude_client is not None,
             "model": "claude-3.5-sonnet",
-            "api_key_set": bool(os.getenv("ANTHROPIC_API_KEY"))
+            "api_key_set": bool(os.getenv("ANTHROPIC_API_KEY")),
+            "response_cache": claude_client.cache.stats() if claude_client is not None and claude_client.cache else None
         },
         "openai": {
             "available": bool(os.getenv("OPENAI_API_KEY")),
@@ -679,9 +1089,9 @@ async def analyze_mri_dicom(
         dicom_content = await dicom_file.read()
         print(f"📊 DICOM file size: {len(dicom_content)} bytes")
         
-        # Extract DICOM metadata
-        print("🔍 Extracting DICOM metadata...")
-        metadata = extract_dicom_metadata(dicom_content)
+        # Parse once (in memory, off the event loop) for metadata and preview
+        print("🔍 Parsing DICOM and extracting metadata...")
+        metadata, preview_image = await asyncio.to_thread(parse_and_render_dicom, dicom_content)
         
         if "error" in metadata:
             return JSONResponse(
@@ -695,13 +1105,9 @@ async def analyze_mri_dicom(
         
         print("✅ DICOM metadata extracted successfully")
         
-        # Generate preview image
-        print("🖼️ Generating DICOM preview...")
-        preview_image = generate_dicom_preview(dicom_content)
-        
         # Perform AI analysis
         print("🤖 Starting AI analysis...")
-        ai_analysis = analyze_dicom_with_ai(metadata, symptoms, patient_age, patient_sex)
+        ai_analysis = await analyze_dicom_with_ai(metadata, symptoms, patient_age, patient_sex)
         
         processing_time = time.time() - start_time
         print(f"✅ Analysis completed in {processing_time:.2f} seconds")
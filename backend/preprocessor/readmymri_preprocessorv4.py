@@ -19,14 +19,23 @@ import asyncio
 import tempfile
 import shutil
 from datetime import datetime
-from typing import Dict, List, Optional, Any, Tuple
-from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Any, Tuple, Union, Callable
+from dataclasses import dataclass, asdict, field
 from pathlib import Path
 import zipfile
 import json
 import time
 import base64
 import io
+import mmap
+import struct
+import zlib
+import math
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 # Core dependencies with graceful fallbacks
 try:
@@ -65,6 +74,12 @@ except ImportError:
     PSUTIL_AVAILABLE = False
     logging.warning("psutil not available - memory monitoring disabled")
 
+try:
+    from services.metrics import observe_stage
+    METRICS_AVAILABLE = True
+except ImportError:
+    METRICS_AVAILABLE = False
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -72,6 +87,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def _observe_stage(stage: str, seconds: float):
+    """Record a pipeline stage timing when the metrics registry is importable"""
+    if METRICS_AVAILABLE:
+        observe_stage(stage, seconds)
+
 @dataclass
 class ProcessingResult:
     """Result of DICOM processing"""
@@ -85,7 +105,209 @@ class ProcessingResult:
     metadata: Optional[Dict] = None
     file_path: Optional[str] = None
     image_data: Optional[str] = None  # Base64 encoded image for agents
-    pixel_array: Optional[Any] = None  # Raw pixel data if available
+    pixel_array: Optional[Any] = None  # Raw pixel data (single-pass processing only)
+    pixel_format: Optional[Dict[str, Any]] = None  # Pixel layout and LUT attributes from the header pass
+    slice_ref: Optional[Tuple[str, int]] = None  # (series UID, slice number) in the volume/slice store
+    slice_etags: Optional[Dict[str, str]] = None  # Pyramid tier -> ETag, once stored in the slice store
+    key_slice_score: Optional[float] = None  # Set for slices picked by KeySliceSelector
+    stage_timings: Optional[Dict[str, float]] = None  # Stage -> seconds, observed by the parent process
+
+@dataclass
+class ZipMember:
+    """A DICOM candidate inside a ZIP archive, located via the central directory"""
+    zip_path: str
+    name: str
+    file_size: int
+    compress_size: int
+    compress_type: int
+    data_offset: Optional[int] = None  # Start of raw (possibly compressed) member data
+    
+    @property
+    def basename(self) -> str:
+        return os.path.basename(self.name.rstrip('/'))
+
+# A file on disk (extract mode) or a member read in place (stream mode)
+DicomSource = Union[str, ZipMember]
+
+def source_name(source: DicomSource) -> str:
+    """Display name for a DICOM source"""
+    return source.basename if isinstance(source, ZipMember) else os.path.basename(source)
+
+def read_zip_member(member: ZipMember) -> bytes:
+    """Read one member without an open ZipFile (used by pool workers)
+    
+    Seeks straight to the member data, so a worker process never has to parse
+    the central directory or keep the archive open between tasks.
+    """
+    if member.data_offset is not None and member.compress_type in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+        with open(member.zip_path, 'rb') as f:
+            f.seek(member.data_offset)
+            raw = f.read(member.compress_size)
+        if member.compress_type == zipfile.ZIP_STORED:
+            return raw
+        return zlib.decompress(raw, -zlib.MAX_WBITS)
+    
+    with zipfile.ZipFile(member.zip_path) as zf:
+        return zf.read(member.name)
+
+def open_zip_member(member: ZipMember) -> io.IOBase:
+    """Open one member as a stream without an open ZipFile (used by pool workers)
+    
+    STORED members are mapped, so a header-only parse only touches the header pages.
+    """
+    if member.compress_type == zipfile.ZIP_STORED and member.data_offset is not None and member.file_size:
+        f = open(member.zip_path, 'rb')
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            f.close()
+            return io.BytesIO(read_zip_member(member))
+        
+        def _close():
+            mapped.close()
+            f.close()
+        
+        return MmapSliceReader(mapped, member.data_offset, member.file_size, on_close=_close)
+    return io.BytesIO(read_zip_member(member))
+
+class MmapSliceReader(io.RawIOBase):
+    """Read-only seekable file object over a slice of a memory map (no copies until read)"""
+    
+    def __init__(self, buffer: mmap.mmap, offset: int, length: int,
+                 on_close: Optional[Callable[[], None]] = None):
+        super().__init__()
+        self._view = memoryview(buffer)[offset:offset + length]
+        self._pos = 0
+        self._on_close = on_close
+    
+    def readable(self) -> bool:
+        return True
+    
+    def seekable(self) -> bool:
+        return True
+    
+    def tell(self) -> int:
+        return self._pos
+    
+    def seek(self, pos: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            pos += self._pos
+        elif whence == io.SEEK_END:
+            pos += len(self._view)
+        self._pos = max(0, min(pos, len(self._view)))
+        return self._pos
+    
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._view) if size is None or size < 0 else min(self._pos + size, len(self._view))
+        data = self._view[self._pos:end].tobytes()
+        self._pos = end
+        return data
+    
+    def readinto(self, b) -> int:
+        n = min(len(b), len(self._view) - self._pos)
+        if n <= 0:
+            return 0
+        b[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+    
+    def close(self):
+        if not self.closed:
+            self._view.release()
+            if self._on_close is not None:
+                self._on_close()
+        super().close()
+
+class ZipMemberReader:
+    """Read DICOM candidates straight out of a ZIP without extracting to disk
+    
+    Members are listed from the central directory. STORED members are served as
+    slices of a memory map of the archive; compressed members are streamed
+    through zipfile's decompressor.
+    """
+    
+    def __init__(self, zip_file_path: str, min_size: int = 1024):
+        self.zip_file_path = zip_file_path
+        self.min_size = min_size
+        self._file = open(zip_file_path, 'rb')
+        try:
+            self._zip = zipfile.ZipFile(self._file)
+        except Exception:
+            self._file.close()
+            raise
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            self._mmap = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def list_members(self) -> List[ZipMember]:
+        """List processable members - same acceptance rule as extraction (> min_size bytes)"""
+        members = []
+        for info in self._zip.infolist():
+            if info.is_dir() or info.file_size <= self.min_size:
+                continue
+            if info.flag_bits & 0x1:
+                logger.warning(f"Skipping encrypted ZIP member: {info.filename}")
+                continue
+            
+            data_offset = None
+            if self._mmap is not None:
+                data_offset = self._local_data_offset(info)
+            
+            members.append(ZipMember(
+                zip_path=self.zip_file_path,
+                name=info.filename,
+                file_size=info.file_size,
+                compress_size=info.compress_size,
+                compress_type=info.compress_type,
+                data_offset=data_offset
+            ))
+        return members
+    
+    def _local_data_offset(self, info: zipfile.ZipInfo) -> Optional[int]:
+        """Locate member data behind its local file header (extra field may differ from central dir)"""
+        start = info.header_offset
+        header = self._mmap[start:start + zipfile.sizeFileHeader]
+        if len(header) != zipfile.sizeFileHeader:
+            return None
+        fields = struct.unpack(zipfile.structFileHeader, header)
+        if fields[0] != zipfile.stringFileHeader:
+            return None
+        filename_length, extra_length = fields[10], fields[11]
+        offset = start + zipfile.sizeFileHeader + filename_length + extra_length
+        if offset + info.compress_size > len(self._mmap):
+            return None
+        return offset
+    
+    def open(self, member: ZipMember) -> io.IOBase:
+        """Open a member as a seekable binary stream"""
+        if (member.compress_type == zipfile.ZIP_STORED and member.data_offset is not None
+                and self._mmap is not None):
+            return MmapSliceReader(self._mmap, member.data_offset, member.file_size)
+        return self._zip.open(member.name)
+    
+    def read_bytes(self, member: ZipMember) -> bytes:
+        with self.open(member) as f:
+            return f.read()
+    
+    def close(self):
+        try:
+            self._zip.close()
+        except Exception:
+            pass
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # A dataset still references a slice; the map is released with it
+                pass
+        self._file.close()
 
 class RobustPHIRemover:
     """Robust PHI removal that handles missing/malformed metadata"""
@@ -321,43 +543,198 @@ class ProtocolAgnosticMetadataExtractor:
         else:
             return "Low"
 
+@dataclass(frozen=True)
+class WindowPreset:
+    """Modality LUT (rescale) and VOI LUT (window) parameters, usually one per series"""
+    center: float
+    width: float
+    slope: float = 1.0
+    intercept: float = 0.0
+    invert: bool = False  # MONOCHROME1
+    source: str = "dicom"  # dicom | auto
+    
+    @classmethod
+    def from_pixel_format(cls, pixel_format: Optional[Dict[str, Any]]) -> Optional["WindowPreset"]:
+        """Preset from the WindowCenter/WindowWidth stored in the header, if any"""
+        if not pixel_format or pixel_format.get('window_width') is None:
+            return None
+        return cls(
+            center=pixel_format['window_center'],
+            width=max(pixel_format['window_width'], 1.0),
+            slope=pixel_format.get('rescale_slope', 1.0),
+            intercept=pixel_format.get('rescale_intercept', 0.0),
+            invert=bool(pixel_format.get('invert', False))
+        )
+    
+    def to_summary(self) -> Dict[str, Any]:
+        return {'center': round(self.center, 2), 'width': round(self.width, 2), 'source': self.source}
+
+class WindowLevelRenderer:
+    """Render stored pixel values to 8 bits through precomputed lookup tables
+    
+    For 8/16-bit data the modality and VOI LUTs are folded into one uint8 table
+    indexed by the raw stored value, so a slice costs one gather and no float
+    temporaries. Tables are cached per (dtype, preset).
+    """
+    
+    def __init__(self, max_cached_luts: int = 32):
+        self.max_cached_luts = max_cached_luts
+        self._luts: "OrderedDict[Tuple[str, WindowPreset], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __getstate__(self):
+        # Sent to worker processes without the lock or cached tables
+        return {'max_cached_luts': self.max_cached_luts}
+    
+    def __setstate__(self, state):
+        self.__init__(state['max_cached_luts'])
+    
+    @staticmethod
+    def _apply_window(values: Any, preset: WindowPreset) -> Any:
+        """Linear modality + VOI transform (DICOM PS3.3 C.11.2.1.2) to uint8"""
+        modality = values.astype(np.float32) * np.float32(preset.slope) + np.float32(preset.intercept)
+        low = preset.center - 0.5 - (preset.width - 1) / 2
+        scale = 255.0 / max(preset.width - 1, 1.0)
+        out = np.clip((modality - np.float32(low)) * np.float32(scale), 0, 255)
+        if preset.invert:
+            out = 255 - out
+        return out.astype(np.uint8)
+    
+    def lut(self, dtype: Any, preset: WindowPreset) -> Optional[Any]:
+        """uint8 table indexed by stored value (signed data via its unsigned view)"""
+        dtype = np.dtype(dtype)
+        if dtype.kind not in 'ui' or dtype.itemsize > 2:
+            return None
+        key = (dtype.str, preset)
+        with self._lock:
+            table = self._luts.get(key)
+            if table is not None:
+                self._luts.move_to_end(key)
+                return table
+        
+        unsigned = np.dtype(f"u{dtype.itemsize}")
+        stored_values = np.arange(2 ** (8 * dtype.itemsize), dtype=unsigned).view(dtype)
+        table = self._apply_window(stored_values, preset)
+        with self._lock:
+            self._luts[key] = table
+            while len(self._luts) > self.max_cached_luts:
+                self._luts.popitem(last=False)
+        return table
+    
+    def auto_preset(self, pixels: Any, slope: float = 1.0, intercept: float = 0.0,
+                    invert: bool = False, max_samples: int = 1 << 18) -> WindowPreset:
+        """Window covering the 0.5-99.5 percentile range of (a subsample of) the data"""
+        flat = np.asarray(pixels).reshape(-1)
+        if flat.size > max_samples:
+            flat = flat[::flat.size // max_samples]
+        low, high = np.percentile(flat, [0.5, 99.5]) if flat.size else (0.0, 1.0)
+        # Percentiles of the modality values (a negative slope swaps the ends)
+        low, high = sorted((float(low) * slope + intercept, float(high) * slope + intercept))
+        if high <= low:
+            high = low + 1.0
+        return WindowPreset(center=(low + high) / 2, width=high - low, slope=slope,
+                            intercept=intercept, invert=invert, source="auto")
+    
+    def preset_for(self, pixels: Any, pixel_format: Optional[Dict[str, Any]]) -> Optional[WindowPreset]:
+        """Header window, else an auto window fitted with the header's rescale and MONOCHROME1
+        
+        None for 8-bit data with nothing to apply - it is shown as stored.
+        """
+        preset = WindowPreset.from_pixel_format(pixel_format)
+        if preset is not None:
+            return preset
+        pixel_format = pixel_format or {}
+        slope = pixel_format.get('rescale_slope', 1.0)
+        intercept = pixel_format.get('rescale_intercept', 0.0)
+        invert = bool(pixel_format.get('invert', False))
+        pixels = np.asarray(pixels)
+        if pixels.dtype == np.uint8 and (slope, intercept, invert) == (1.0, 0.0, False):
+            return None
+        return self.auto_preset(pixels, slope=slope, intercept=intercept, invert=invert)
+    
+    def render(self, pixels: Any, preset: Optional[WindowPreset] = None) -> Any:
+        """Stored pixel values -> uint8 display values"""
+        pixels = np.asarray(pixels)
+        if preset is None:
+            # No window in the header: fit one to this image
+            if pixels.dtype == np.uint8:
+                return pixels
+            preset = self.auto_preset(pixels)
+        
+        table = self.lut(pixels.dtype, preset)
+        if table is None:
+            return self._apply_window(pixels, preset)
+        if pixels.dtype.kind == 'i':
+            pixels = pixels.view(f"u{pixels.dtype.itemsize}")
+        return table[pixels]
+    
+    def render_dataset(self, ds: pydicom.Dataset) -> Any:
+        """Render a full dataset with the window stored in its header (or one fitted to it)"""
+        pixels = ds.pixel_array
+        return self.render(pixels, self.preset_for(pixels, _read_pixel_format(ds)))
+
+class PreviewPyramid:
+    """Thumbnail / preview / full resolution tiers of a rendered slice
+    
+    Each tier is an area-filtered downsample of the next larger one, taken from
+    the windowed 8-bit image, so a slice is windowed once and encoded per tier.
+    """
+    
+    TIERS = {"thumbnail": 128, "preview": 512, "full": None}  # Longest edge in pixels
+    
+    def __init__(self, tiers: Optional[Tuple[str, ...]] = None):
+        tiers = tiers or tuple(self.TIERS)
+        unknown = [tier for tier in tiers if tier not in self.TIERS]
+        if unknown:
+            raise ValueError(f"Unknown preview tiers: {unknown}")
+        # Largest first, so each tier is reduced from its predecessor
+        self.tiers = sorted(tiers, key=lambda tier: -(self.TIERS[tier] or math.inf))
+    
+    @staticmethod
+    def downsample(image: Any, max_edge: Optional[int]) -> Any:
+        """Shrink (never enlarge) so the longest edge is at most max_edge"""
+        rows, cols = image.shape[:2]
+        if max_edge is None or max(rows, cols) <= max_edge:
+            return image
+        scale = max_edge / max(rows, cols)
+        size = (max(1, round(cols * scale)), max(1, round(rows * scale)))
+        if OPENCV_AVAILABLE:
+            return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        return np.asarray(Image.fromarray(image).resize(size, Image.Resampling.BOX))
+    
+    def build(self, image: Any) -> Dict[str, Any]:
+        """tier -> uint8 image"""
+        levels = {}
+        for tier in self.tiers:
+            image = self.downsample(image, self.TIERS[tier])
+            levels[tier] = image
+        return levels
+
 class ImageDataExtractor:
     """Extract image data for AI agents regardless of metadata"""
     
-    def extract_image_data(self, ds: pydicom.Dataset, file_path: str) -> Tuple[Optional[str], Optional[Any]]:
-        """Extract image as base64 and pixel array"""
+    def __init__(self):
+        self.renderer = WindowLevelRenderer()
+    
+    def extract_image_data(self, ds: pydicom.Dataset, file_path: str,
+                           raw_reader: Optional[Callable[[], bytes]] = None,
+                           preset: Optional[WindowPreset] = None) -> Tuple[Optional[str], Optional[Any]]:
+        """Extract image as base64 and pixel array
+        
+        raw_reader supplies the original bytes for sources that are not on disk.
+        preset overrides the window stored in the dataset (e.g. a series preset).
+        """
         try:
             # Try to get pixel array
-            pixel_array = None
             if hasattr(ds, 'pixel_array'):
-                pixel_array = ds.pixel_array
-                
-                # Convert to base64 for agents
-                if NUMPY_AVAILABLE and PIL_AVAILABLE:
-                    # Normalize pixel values
-                    if pixel_array.dtype != np.uint8:
-                        # Scale to 0-255
-                        pmin = pixel_array.min()
-                        pmax = pixel_array.max()
-                        if pmax > pmin:
-                            pixel_array = ((pixel_array - pmin) / (pmax - pmin) * 255).astype(np.uint8)
-                        else:
-                            pixel_array = np.zeros_like(pixel_array, dtype=np.uint8)
-                    
-                    # Convert to PIL Image
-                    img = Image.fromarray(pixel_array)
-                    
-                    # Convert to base64
-                    buffer = io.BytesIO()
-                    img.save(buffer, format='PNG')
-                    img_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-                    
-                    return img_base64, pixel_array
-                elif NUMPY_AVAILABLE:
-                    # Fallback: just return pixel array
-                    return None, pixel_array
+                pixels = ds.pixel_array
+                if preset is None:
+                    preset = self.renderer.preset_for(pixels, _read_pixel_format(ds))
+                return self.encode_pixels(pixels, preset)
             
             # If no pixel array, try to read raw file
+            if raw_reader is not None:
+                return base64.b64encode(raw_reader()).decode('utf-8'), None
             if os.path.exists(file_path):
                 with open(file_path, 'rb') as f:
                     file_data = f.read()
@@ -369,17 +746,842 @@ class ImageDataExtractor:
         except Exception as e:
             logger.error(f"Image extraction failed: {str(e)}")
             return None, None
+    
+    def encode_pixels(self, pixel_array: Any,
+                      preset: Optional[WindowPreset] = None) -> Tuple[Optional[str], Optional[Any]]:
+        """Window a decoded slice to 8 bits and encode it as base64 PNG"""
+        if not (NUMPY_AVAILABLE and PIL_AVAILABLE):
+            # Fallback: just return pixel array
+            return None, pixel_array
+        
+        # Apply modality/VOI LUT (auto window when the header has none)
+        pixel_array = self.renderer.render(pixel_array, preset)
+        img_base64 = base64.b64encode(self._encode(pixel_array, 'png')).decode('utf-8')
+        
+        return img_base64, pixel_array
+    
+    def render_image(self, pixel_array: Any, preset: Optional[WindowPreset] = None,
+                     image_format: str = 'png', tier: str = 'full') -> Optional[bytes]:
+        """Window a decoded slice and encode one pyramid tier as PNG/WebP bytes (no base64)"""
+        if not (NUMPY_AVAILABLE and PIL_AVAILABLE):
+            return None
+        image = self.renderer.render(pixel_array, preset)
+        return self._encode(PreviewPyramid.downsample(image, PreviewPyramid.TIERS[tier]), image_format)
+    
+    def render_tiers(self, pixel_array: Any, preset: Optional[WindowPreset] = None,
+                     pyramid: Optional[PreviewPyramid] = None,
+                     image_format: str = 'png') -> Optional[Dict[str, bytes]]:
+        """Window once, then encode every tier of the pyramid"""
+        if not (NUMPY_AVAILABLE and PIL_AVAILABLE):
+            return None
+        levels = (pyramid or PreviewPyramid()).build(self.renderer.render(pixel_array, preset))
+        return {tier: self._encode(image, image_format) for tier, image in levels.items()}
+    
+    @staticmethod
+    def _encode(pixel_array: Any, image_format: str) -> bytes:
+        buffer = io.BytesIO()
+        if image_format == 'webp':
+            # Lossless - these are diagnostic images
+            Image.fromarray(pixel_array).save(buffer, format='WEBP', lossless=True, method=0)
+        else:
+            Image.fromarray(pixel_array).save(buffer, format='PNG')
+        return buffer.getvalue()
+
+def _parse_floats(value: Any) -> Optional[List[float]]:
+    """Parse a metadata value such as "-120.5, 88.0, 12.0" into floats"""
+    if value is None or value == "Unknown":
+        return None
+    try:
+        return [float(v) for v in str(value).replace('\\', ',').split(',') if v.strip()]
+    except ValueError:
+        return None
+
+@dataclass
+class SeriesGeometry:
+    """Instances of one series in spatial order, from the header pass"""
+    series_instance_uid: str
+    indices: List[int]  # Result indices, sorted along the slice normal
+    slice_positions: List[float]  # Position of each instance along the normal (mm)
+    orientation: Optional[List[float]] = None  # ImageOrientationPatient (row, column cosines)
+    origin: Optional[List[float]] = None  # ImagePositionPatient of the first slice
+    pixel_spacing: Tuple[float, float] = (1.0, 1.0)  # (row, column) mm
+    slice_spacing: Optional[float] = None
+    geometric: bool = False  # False when sorted by InstanceNumber for lack of geometry
+
+@dataclass(frozen=True)
+class VolumeHandle:
+    """Reference to a memory-mapped volume file - cheap to pass to pool workers"""
+    path: str
+    shape: Tuple[int, int, int]  # (slices, rows, columns)
+    dtype: str
+    
+    @property
+    def slice_bytes(self) -> int:
+        return self.shape[1] * self.shape[2] * np.dtype(self.dtype).itemsize
+    
+    def open(self, mode: str = 'r') -> Any:
+        """Map the whole volume (read-only by default)"""
+        return np.memmap(self.path, dtype=self.dtype, mode=mode, shape=self.shape)
+    
+    def read_slice(self, z: int) -> Any:
+        """Map a single slice without touching the rest of the file"""
+        return np.memmap(self.path, dtype=self.dtype, mode='r',
+                         offset=z * self.slice_bytes, shape=self.shape[1:])
+    
+    def write_slice(self, z: int, array: Any):
+        """Write one slice in place - pages go to the page cache, not process memory"""
+        target = np.memmap(self.path, dtype=self.dtype, mode='r+',
+                           offset=z * self.slice_bytes, shape=self.shape[1:])
+        target[...] = array
+        del target
+
+class VolumeStore:
+    """np.memmap-backed volume files in the job workspace
+    
+    Pixel data is written once (by whichever worker decoded it) and referenced by
+    VolumeHandle afterwards, so process memory stays flat regardless of study size.
+    """
+    
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+        os.makedirs(root_dir, exist_ok=True)
+        self._handles: Dict[str, VolumeHandle] = {}
+    
+    def allocate(self, key: str, shape: Tuple[int, int, int], dtype: Any) -> VolumeHandle:
+        """Create a zero-filled (sparse) volume file"""
+        name = hashlib.sha256(key.encode()).hexdigest()[:16]
+        path = os.path.join(self.root_dir, f"{name}.vol")
+        np.memmap(path, dtype=dtype, mode='w+', shape=shape).flush()
+        handle = VolumeHandle(path=path, shape=tuple(int(n) for n in shape), dtype=np.dtype(dtype).str)
+        self._handles[key] = handle
+        return handle
+    
+    def get(self, key: str) -> Optional[VolumeHandle]:
+        return self._handles.get(key)
+    
+    def open(self, key: str) -> Optional[Any]:
+        handle = self._handles.get(key)
+        return handle.open('r') if handle else None
+    
+    @property
+    def nbytes(self) -> int:
+        return sum(h.shape[0] * h.slice_bytes for h in self._handles.values())
+    
+    def clear(self):
+        for handle in self._handles.values():
+            try:
+                os.remove(handle.path)
+            except OSError:
+                pass
+        self._handles.clear()
+
+@dataclass
+class SeriesVolume:
+    """A series stored as one contiguous (slices, rows, columns) memory-mapped array"""
+    series_instance_uid: str
+    handle: VolumeHandle
+    spacing: Tuple[float, float, float]  # (slice, row, column) mm
+    indices: List[int]  # Result index of each slice in the volume
+    slice_positions: List[float]
+    orientation: Optional[List[float]] = None
+    origin: Optional[List[float]] = None
+    missing_slices: List[int] = field(default_factory=list)  # Slices that failed to decode (zero-filled)
+    
+    @property
+    def volume(self) -> Any:
+        """Read-only np.memmap over the volume file"""
+        return self.handle.open('r')
+    
+    def to_summary(self) -> Dict[str, Any]:
+        """JSON-safe description (the array itself stays server side)"""
+        return {
+            'series_instance_uid': self.series_instance_uid,
+            'shape': list(self.handle.shape),
+            'dtype': np.dtype(self.handle.dtype).name,
+            'spacing_mm': [round(v, 4) for v in self.spacing],
+            'origin': self.origin,
+            'orientation': self.orientation,
+            'slice_positions': [round(p, 4) for p in self.slice_positions],
+            'missing_slices': self.missing_slices
+        }
+
+def series_key(series_instance_uid: str) -> str:
+    """Short opaque series id for URLs (the UID itself never leaves the server)"""
+    return hashlib.sha256(series_instance_uid.encode()).hexdigest()[:12]
+
+class SliceStore:
+    """Encoded slice images in the job workspace, one file per (series, slice, format)
+    
+    Files are written once and never change, so the content hash doubles as ETag.
+    """
+    
+    FORMATS = ("png", "webp")
+    TIERS = tuple(PreviewPyramid.TIERS)
+    
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+        os.makedirs(root_dir, exist_ok=True)
+        self._etags: Dict[str, str] = {}
+    
+    def path(self, key: str, z: int, image_format: str = 'png', tier: str = 'full') -> str:
+        return os.path.join(self.root_dir, key, f"{z:05d}.{tier}.{image_format}")
+    
+    def put(self, key: str, z: int, data: bytes, image_format: str = 'png', tier: str = 'full') -> str:
+        """Store an encoded slice and return its ETag"""
+        path = self.path(key, z, image_format, tier)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        etag = hashlib.sha256(data).hexdigest()[:32]
+        self._etags[path] = etag
+        return etag
+    
+    def get(self, key: str, z: int, image_format: str = 'png', tier: str = 'full') -> Optional[Tuple[bytes, str]]:
+        """(bytes, ETag) for a stored slice, or None"""
+        path = self.path(key, z, image_format, tier)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        etag = self._etags.get(path)
+        if etag is None:
+            etag = self._etags[path] = hashlib.sha256(data).hexdigest()[:32]
+        return data, etag
+    
+    def etag(self, key: str, z: int, image_format: str = 'png', tier: str = 'full') -> Optional[str]:
+        """ETag without reading the file, when it is already known"""
+        return self._etags.get(self.path(key, z, image_format, tier))
+
+class StudyWorkspace:
+    """Read side of a persisted job workspace (manifest, volumes and encoded slices)
+    
+    Slices already encoded during processing are served from the slice store;
+    other slices of a stored volume are rendered on first request and cached.
+    """
+    
+    MANIFEST = "manifest.json"
+    
+    def __init__(self, workspace_dir: str, image_extractor: Optional["ImageDataExtractor"] = None):
+        self.workspace_dir = workspace_dir
+        with open(os.path.join(workspace_dir, self.MANIFEST)) as f:
+            self.manifest = json.load(f)
+        self.series = {entry['key']: entry for entry in self.manifest.get('series', [])}
+        # Manifests written before slice_numbers was recorded address 0..slice_count-1
+        self._addressable = {key: set(entry.get('slice_numbers') or range(entry['slice_count']))
+                             for key, entry in self.series.items()}
+        self.slice_store = SliceStore(os.path.join(workspace_dir, 'slices'))
+        self.image_extractor = image_extractor or ImageDataExtractor()
+    
+    def get_slice(self, key: str, z: int, image_format: str = 'png',
+                  tier: str = 'full') -> Optional[Tuple[bytes, str]]:
+        """(encoded bytes, ETag) for one tier of slice z of a series, or None if unavailable"""
+        entry = self.series.get(key)
+        if (entry is None or image_format not in SliceStore.FORMATS or tier not in SliceStore.TIERS
+                or z not in self._addressable[key]):
+            return None
+        
+        stored = self.slice_store.get(key, z, image_format, tier)
+        if stored is not None:
+            return stored
+        
+        # Not encoded yet: render from the volume, or derive from a stored PNG tier
+        preset = WindowPreset(**entry['window']) if entry.get('window') else None
+        volume = entry.get('volume')
+        if volume is not None:
+            handle = VolumeHandle(path=os.path.join(self.workspace_dir, volume['path']),
+                                  shape=tuple(volume['shape']), dtype=volume['dtype'])
+            pixels = np.asarray(handle.read_slice(z))
+        else:
+            source = self._stored_source(key, z, tier)
+            if source is None:
+                return None
+            pixels = np.asarray(Image.open(source))
+            preset = None  # Already windowed
+        
+        data = self.image_extractor.render_image(pixels, preset, image_format, tier)
+        if data is None:
+            return None
+        return data, self.slice_store.put(key, z, data, image_format, tier)
+    
+    def _stored_source(self, key: str, z: int, tier: str) -> Optional[str]:
+        """Smallest stored PNG tier at least as large as the one requested"""
+        wanted = PreviewPyramid.TIERS[tier] or math.inf
+        for candidate, edge in sorted(PreviewPyramid.TIERS.items(), key=lambda item: item[1] or math.inf):
+            path = self.slice_store.path(key, z, 'png', candidate)
+            if (edge or math.inf) >= wanted and os.path.exists(path):
+                return path
+        return None
+
+class KeySliceSelector:
+    """Rank the slices of a series by how much anatomy they are likely to show
+    
+    Scores come from cheap vectorized statistics over a strided subsample of each
+    slice: foreground fraction, intensity entropy, variance and position within
+    the volume (central slices preferred). Features are normalized per series, so
+    they compare slices of the same acquisition only.
+    """
+    
+    WEIGHTS = {"foreground": 0.35, "entropy": 0.25, "variance": 0.25, "position": 0.15}
+    HISTOGRAM_BINS = 64
+    
+    def __init__(self, weights: Optional[Dict[str, float]] = None, max_edge: int = 64):
+        self.weights = weights or dict(self.WEIGHTS)
+        self.max_edge = max_edge
+    
+    def subsample(self, pixels: Any) -> Any:
+        """Strided view down to roughly max_edge pixels per side (works on memmaps)"""
+        step = max(1, math.ceil(max(pixels.shape[-2:]) / self.max_edge))
+        return pixels[..., ::step, ::step]
+    
+    def score(self, stack: Any, positions: Any) -> List[Dict[str, float]]:
+        """Features and weighted score per slice
+        
+        stack is (slices, rows, columns) - ideally already subsampled;
+        positions are the slices' relative positions in the series (0..1).
+        """
+        stack = np.asarray(stack, dtype=np.float32)
+        count = stack.shape[0]
+        low, high = float(stack.min()), float(np.percentile(stack, 99.5))
+        span = max(high - low, 1e-6)
+        
+        # Foreground: above 10% of the series intensity range (air/background is dark)
+        foreground = (stack > low + 0.1 * span).mean(axis=(1, 2))
+        
+        # Entropy of per-slice histograms on a shared binning, all slices in one bincount
+        bins = np.clip(((stack - low) / span * self.HISTOGRAM_BINS).astype(np.int32), 0, self.HISTOGRAM_BINS - 1)
+        offsets = (np.arange(count, dtype=np.int32) * self.HISTOGRAM_BINS)[:, None, None]
+        histograms = np.bincount((bins + offsets).ravel(), minlength=count * self.HISTOGRAM_BINS)
+        probabilities = histograms.reshape(count, self.HISTOGRAM_BINS) / bins[0].size
+        with np.errstate(divide='ignore', invalid='ignore'):
+            entropy = -np.nansum(probabilities * np.log2(probabilities), axis=1) / math.log2(self.HISTOGRAM_BINS)
+        
+        variance = stack.reshape(count, -1).var(axis=1)
+        variance = variance / variance.max() if variance.max() > 0 else variance
+        
+        position = 1.0 - np.abs(2.0 * np.asarray(positions, dtype=np.float32) - 1.0)
+        
+        features = {"foreground": foreground, "entropy": entropy, "variance": variance, "position": position}
+        total = sum(self.weights[name] * values for name, values in features.items())
+        return [
+            {"score": round(float(total[i]), 4), **{name: round(float(values[i]), 4) for name, values in features.items()}}
+            for i in range(count)
+        ]
+    
+    def select(self, scores: List[Dict[str, float]], count: int) -> List[int]:
+        """Top-scoring slices, kept apart so neighbours of a pick are not picked too"""
+        if count <= 0 or count >= len(scores):
+            return list(range(len(scores)))
+        min_gap = max(1, round(len(scores) / (2 * count)))
+        picked = []
+        for i in sorted(range(len(scores)), key=lambda i: -scores[i]["score"]):
+            if all(abs(i - j) >= min_gap for j in picked):
+                picked.append(i)
+                if len(picked) == count:
+                    break
+        return sorted(picked)
+
+class SeriesAssembler:
+    """Group instances by SeriesInstanceUID, sort them geometrically and stack volumes"""
+    
+    def group(self, results: List[ProcessingResult]) -> Dict[str, SeriesGeometry]:
+        """Build the per-series index from header metadata"""
+        members: Dict[str, List[int]] = {}
+        for idx, result in enumerate(results):
+            if not result.success or not result.metadata:
+                continue
+            series_uid = result.metadata.get('series_instance_uid', 'Unknown')
+            members.setdefault(series_uid, []).append(idx)
+        
+        return {uid: self._sort_series(uid, indices, results) for uid, indices in members.items()}
+    
+    def _sort_series(self, series_uid: str, indices: List[int],
+                     results: List[ProcessingResult]) -> SeriesGeometry:
+        metadata = {i: results[i].metadata for i in indices}
+        
+        def instance_number(i: int) -> float:
+            try:
+                return float(metadata[i].get('instance_number', 'Unknown'))
+            except (TypeError, ValueError):
+                return float('inf')
+        
+        # Use the most common orientation - localizers may mix planes within a series
+        orientations = [tuple(o) for o in (_parse_floats(metadata[i].get('image_orientation_patient')) for i in indices)
+                        if o and len(o) == 6]
+        orientation = max(set(orientations), key=orientations.count) if orientations else None
+        
+        spacing = _parse_floats(metadata[indices[0]].get('pixel_spacing'))
+        pixel_spacing = (spacing[0], spacing[1]) if spacing and len(spacing) == 2 else (1.0, 1.0)
+        
+        positions = {}
+        if orientation is not None and NUMPY_AVAILABLE:
+            normal = np.cross(orientation[:3], orientation[3:])
+            for i in indices:
+                ipp = _parse_floats(metadata[i].get('image_position_patient'))
+                if ipp and len(ipp) == 3:
+                    positions[i] = float(np.dot(ipp, normal))
+        
+        geometric = len(positions) == len(indices)
+        if geometric:
+            ordered = sorted(indices, key=lambda i: (positions[i], instance_number(i), i))
+            slice_positions = [positions[i] for i in ordered]
+        else:
+            ordered = sorted(indices, key=lambda i: (instance_number(i), i))
+            slice_positions = [float(k) for k in range(len(ordered))]
+        
+        slice_spacing = None
+        if geometric and len(ordered) > 1:
+            gaps = np.diff(np.unique(np.round(slice_positions, 4)))
+            if len(gaps):
+                slice_spacing = float(np.median(gaps))
+        if slice_spacing is None:
+            thickness = _parse_floats(metadata[ordered[0]].get('slice_thickness'))
+            slice_spacing = thickness[0] if thickness else None
+        
+        return SeriesGeometry(
+            series_instance_uid=series_uid,
+            indices=ordered,
+            slice_positions=slice_positions,
+            orientation=list(orientation) if orientation else None,
+            origin=_parse_floats(metadata[ordered[0]].get('image_position_patient')),
+            pixel_spacing=pixel_spacing,
+            slice_spacing=slice_spacing,
+            geometric=geometric
+        )
+    
+    def plan(self, geometry: SeriesGeometry,
+             results: List[ProcessingResult]) -> Optional[Tuple[Tuple[int, int], Any, List[int]]]:
+        """Decide volume layout from header data: ((rows, cols), dtype, result indices)
+        
+        Instances whose layout differs from the dominant one (or that are
+        multi-frame/colour) are left out of the volume.
+        """
+        if not NUMPY_AVAILABLE:
+            return None
+        layouts = {}
+        for idx in geometry.indices:
+            layout = _pixel_layout(results[idx].pixel_format)
+            if layout is not None:
+                layouts[idx] = layout
+        if not layouts:
+            return None
+        
+        values = list(layouts.values())
+        (rows, cols, dtype) = max(set(values), key=values.count)
+        keep = [idx for idx in geometry.indices if layouts.get(idx) == (rows, cols, dtype)]
+        if len(keep) < len(geometry.indices):
+            logger.warning(f"Series {geometry.series_instance_uid}: {len(geometry.indices) - len(keep)} "
+                           f"instances left out of volume (no pixels or layout mismatch)")
+        return (rows, cols), np.dtype(dtype), keep
+
+def _pixel_layout(pixel_format: Optional[Dict[str, int]]) -> Optional[Tuple[int, int, str]]:
+    """(rows, cols, numpy dtype) a single-frame greyscale instance decodes to, else None"""
+    if not pixel_format or not pixel_format.get('has_pixels'):
+        return None
+    if pixel_format.get('samples_per_pixel', 1) != 1 or pixel_format.get('number_of_frames', 1) > 1:
+        return None
+    bits = pixel_format.get('bits_allocated', 16)
+    signed = pixel_format.get('pixel_representation', 0) == 1
+    if bits == 1:
+        bits = 8
+    if bits not in (8, 16, 32):
+        return None
+    return pixel_format['rows'], pixel_format['columns'], f"{'i' if signed else 'u'}{bits // 8}"
+
+def _read_pixel_format(ds: pydicom.Dataset) -> Dict[str, Any]:
+    """Pixel layout and LUT attributes from a (header-only) dataset"""
+    def as_int(name: str, default: int) -> int:
+        try:
+            return int(getattr(ds, name, default) or default)
+        except (TypeError, ValueError):
+            return default
+    
+    def as_float(name: str, default: Optional[float]) -> Optional[float]:
+        value = getattr(ds, name, None)
+        if value is None or value == '':
+            return default
+        if isinstance(value, (list, tuple, pydicom.multival.MultiValue)):
+            value = value[0] if len(value) else None
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return default
+    
+    window_center = as_float('WindowCenter', None)
+    window_width = as_float('WindowWidth', None)
+    has_window = window_center is not None and window_width is not None and window_width > 0
+    
+    return {
+        'rescale_slope': as_float('RescaleSlope', 1.0) or 1.0,
+        'rescale_intercept': as_float('RescaleIntercept', 0.0),
+        'window_center': window_center if has_window else None,
+        'window_width': window_width if has_window else None,
+        'invert': int(str(getattr(ds, 'PhotometricInterpretation', '')).strip() == 'MONOCHROME1'),
+        'rows': as_int('Rows', 0),
+        'columns': as_int('Columns', 0),
+        'bits_allocated': as_int('BitsAllocated', 16),
+        'pixel_representation': as_int('PixelRepresentation', 0),
+        'samples_per_pixel': as_int('SamplesPerPixel', 1),
+        'number_of_frames': as_int('NumberOfFrames', 1),
+        'has_pixels': int(as_int('Rows', 0) > 0 and as_int('Columns', 0) > 0)
+    }
+
+class InstanceProcessor:
+    """Per-instance work unit: read DICOM, extract metadata and image, remove PHI
+    
+    Picklable, so the same unit runs inline, on a thread pool or in worker processes.
+    Work is split in two phases: a header-only pass (metadata + PHI removal, no
+    pixel data read) for every instance, and pixel decode for selected instances.
+    """
+    
+    def __init__(self, phi_remover: RobustPHIRemover,
+                 metadata_extractor: ProtocolAgnosticMetadataExtractor,
+                 image_extractor: ImageDataExtractor,
+                 pyramid: Optional[PreviewPyramid] = None):
+        self.phi_remover = phi_remover
+        self.metadata_extractor = metadata_extractor
+        self.image_extractor = image_extractor
+        self.pyramid = pyramid or PreviewPyramid()
+    
+    def _read_dataset(self, source: DicomSource, stop_before_pixels: bool,
+                      zip_reader: Optional[ZipMemberReader]) -> pydicom.Dataset:
+        """dcmread from a path or straight from a ZIP member"""
+        if isinstance(source, ZipMember):
+            fp = zip_reader.open(source) if zip_reader is not None else open_zip_member(source)
+            with fp:
+                return pydicom.dcmread(fp, force=True, stop_before_pixels=stop_before_pixels)
+        return pydicom.dcmread(source, force=True, stop_before_pixels=stop_before_pixels)
+    
+    def _raw_reader(self, source: DicomSource, zip_reader: Optional[ZipMemberReader]) -> Optional[Callable[[], bytes]]:
+        """Loader for the original bytes of sources that are not plain files"""
+        if not isinstance(source, ZipMember):
+            return None
+        if zip_reader is not None:
+            return lambda: zip_reader.read_bytes(source)
+        return lambda: read_zip_member(source)
+    
+    def __call__(self, file_path: DicomSource, zip_reader: Optional[ZipMemberReader] = None,
+                 decode_pixels: bool = True) -> ProcessingResult:
+        """Process single file with maximum tolerance
+        
+        With decode_pixels=False only the header is parsed (stop_before_pixels),
+        which skips reading, decoding and encoding the pixel data entirely.
+        """
+        start_time = datetime.now()
+        source_path = file_path.name if isinstance(file_path, ZipMember) else file_path
+        stage_timings = {}
+        
+        try:
+            # Try to read as DICOM
+            ds = None
+            error_msg = None
+            parse_start = time.perf_counter()
+            
+            if PYDICOM_AVAILABLE:
+                try:
+                    # Ultra-permissive reading
+                    ds = self._read_dataset(file_path, not decode_pixels, zip_reader)
+                except Exception as e:
+                    error_msg = str(e)
+                    logger.warning(f"Could not read as standard DICOM: {error_msg}")
+                    
+                    # Try without pixel data
+                    if decode_pixels:
+                        try:
+                            ds = self._read_dataset(file_path, True, zip_reader)
+                            logger.info("Successfully read DICOM without pixel data")
+                        except:
+                            ds = None
+            stage_timings['dicom_parse'] = time.perf_counter() - parse_start
+            
+            if ds is None:
+                # Not a valid DICOM, but still try to process
+                logger.warning(f"File is not a valid DICOM: {source_path}")
+                return ProcessingResult(
+                    success=False,
+                    message="Not a valid DICOM file",
+                    error=error_msg or "Invalid DICOM",
+                    file_path=source_path,
+                    stage_timings=stage_timings
+                )
+            
+            if isinstance(file_path, ZipMember):
+                original_size = file_path.file_size
+            else:
+                original_size = os.path.getsize(file_path)
+            
+            # Extract metadata - will handle missing fields
+            metadata = self.metadata_extractor.extract_metadata(ds)
+            
+            # Extract image data for agents
+            image_base64, pixel_array = None, None
+            if decode_pixels:
+                image_base64, pixel_array = self.image_extractor.extract_image_data(
+                    ds, source_path, self._raw_reader(file_path, zip_reader)
+                )
+            
+            # Remove PHI
+            phi_start = time.perf_counter()
+            cleaned_ds, anonymized_id = self.phi_remover.remove_phi(ds)
+            stage_timings['phi_removal'] = time.perf_counter() - phi_start
+            
+            # Update metadata with anonymized ID
+            metadata['anonymized_id'] = anonymized_id
+            
+            # Calculate processing time
+            processing_time = (datetime.now() - start_time).total_seconds() * 1000
+            
+            # Mark as successful even if some data is missing
+            success = True
+            message = "DICOM processed successfully" if decode_pixels else "DICOM header processed successfully"
+            
+            if decode_pixels and not image_base64 and pixel_array is None:
+                message += " (no image data available)"
+                logger.warning(f"No image data extracted from {source_path}")
+            
+            return ProcessingResult(
+                success=success,
+                message=message,
+                anonymized_id=anonymized_id,
+                file_size_original=original_size,
+                file_size_processed=original_size,
+                processing_time_ms=processing_time,
+                metadata=metadata,
+                file_path=source_path,
+                image_data=image_base64,
+                pixel_array=pixel_array,
+                pixel_format=_read_pixel_format(ds),
+                stage_timings=stage_timings
+            )
+            
+        except Exception as e:
+            logger.error(f"❌ Processing failed for {source_path}: {str(e)}")
+            return ProcessingResult(
+                success=False,
+                message=f"Processing failed: {str(e)}",
+                error=str(e),
+                file_path=source_path
+            )
+    
+    def read_header(self, file_path: DicomSource, zip_reader: Optional[ZipMemberReader] = None) -> ProcessingResult:
+        """Phase 1: metadata and PHI removal without touching pixel data"""
+        return self(file_path, zip_reader, decode_pixels=False)
+    
+    def decode_image(self, item: Tuple[DicomSource, Optional[WindowPreset]],
+                     zip_reader: Optional[ZipMemberReader] = None) -> Optional[Dict[str, bytes]]:
+        """Phase 2: full read, pixel decode and PNG pyramid for an instance selected for preview/analysis"""
+        file_path, preset = item
+        source_path = file_path.name if isinstance(file_path, ZipMember) else file_path
+        try:
+            ds = self._read_dataset(file_path, False, zip_reader)
+            pixels = ds.pixel_array
+            if preset is None:
+                preset = self.image_extractor.renderer.preset_for(pixels, _read_pixel_format(ds))
+            return self.image_extractor.render_tiers(pixels, preset, self.pyramid)
+        except Exception as e:
+            logger.warning(f"Pixel decode failed for {source_path}: {str(e)}")
+            return None
+    
+    def sample_pixels(self, item: Tuple[DicomSource, KeySliceSelector],
+                      zip_reader: Optional[ZipMemberReader] = None) -> Optional[Any]:
+        """Decode an instance and return only a small subsample for key-slice scoring"""
+        file_path, selector = item
+        try:
+            pixels = self._read_dataset(file_path, False, zip_reader).pixel_array
+            if pixels.ndim != 2:
+                return None
+            return np.ascontiguousarray(selector.subsample(pixels))
+        except Exception as e:
+            source_path = file_path.name if isinstance(file_path, ZipMember) else file_path
+            logger.warning(f"Pixel sample failed for {source_path}: {str(e)}")
+            return None
+    
+    def decode_into(self, item: Tuple[DicomSource, VolumeHandle, int],
+                    zip_reader: Optional[ZipMemberReader] = None) -> bool:
+        """Decode an instance straight into its slot in a memory-mapped volume
+        
+        Runs in the worker, so decoded pixels never travel back through the pool.
+        """
+        file_path, handle, z = item
+        source_path = file_path.name if isinstance(file_path, ZipMember) else file_path
+        try:
+            handle.write_slice(z, self._read_dataset(file_path, False, zip_reader).pixel_array)
+            return True
+        except Exception as e:
+            logger.warning(f"Pixel decode failed for {source_path}: {str(e)}")
+            return False
+    
+    def encode_slice(self, ref: Tuple[VolumeHandle, int, Optional[WindowPreset]]) -> Optional[Dict[str, bytes]]:
+        """Encode a PNG pyramid from a stored volume slice"""
+        handle, z, preset = ref
+        return self.image_extractor.render_tiers(np.asarray(handle.read_slice(z)), preset, self.pyramid)
+
+def _run_batch(fn: Callable, batch: List[Any], args: Tuple) -> List[Any]:
+    """Run fn over a batch inside a pool worker (batches amortize IPC overhead)"""
+    return [fn(item, *args) for item in batch]
+
+EXECUTION_BENCHMARK_MODES = ("sequential", "thread", "process")
+
+class DicomExecutionEngine:
+    """Fans per-instance DICOM work out over a worker pool
+    
+    - process: ProcessPoolExecutor, one decode per core (default); workers are
+      started with forkserver (spawn where unavailable), never forked from the
+      multithreaded server process
+    - thread: ThreadPoolExecutor, cheaper startup, shares the open ZIP reader
+    - sequential: inline on the event loop thread (legacy behaviour, for comparison)
+    
+    Pool work runs off the event loop and results are returned in input order.
+    """
+    
+    EXECUTORS = ("process", "thread", "sequential")
+    START_METHODS = ("forkserver", "spawn")
+    _shared: Dict[Tuple[str, int], "DicomExecutionEngine"] = {}
+    
+    def __init__(self, executor: Optional[str] = None, max_workers: Optional[int] = None):
+        self.executor = (executor or os.getenv("READMYMRI_EXECUTOR", "process")).lower()
+        if self.executor not in self.EXECUTORS:
+            logger.warning(f"Unknown executor '{self.executor}' - using process")
+            self.executor = "process"
+        self.max_workers = max_workers or int(os.getenv("READMYMRI_WORKERS", "0")) or os.cpu_count() or 1
+        self.start_method = self._start_method(os.getenv("READMYMRI_START_METHOD", "forkserver").lower())
+        self._pool = None
+    
+    @classmethod
+    def _start_method(cls, requested: str) -> str:
+        """Worker start method - fork is not offered, it copies other threads' held locks"""
+        if requested not in cls.START_METHODS:
+            logger.warning(f"Unknown start method '{requested}' - using forkserver")
+            requested = "forkserver"
+        if requested not in multiprocessing.get_all_start_methods():
+            return "spawn"
+        return requested
+    
+    @classmethod
+    def shared(cls, executor: Optional[str] = None, max_workers: Optional[int] = None) -> "DicomExecutionEngine":
+        """Process-wide engine so pools are reused across requests"""
+        engine = cls(executor, max_workers)
+        return cls._shared.setdefault((engine.executor, engine.max_workers), engine)
+    
+    @property
+    def shares_memory(self) -> bool:
+        """Whether work items can reference objects living in this process (e.g. open readers)"""
+        return self.executor != "process"
+    
+    def _get_pool(self):
+        if self._pool is None:
+            if self.executor == "process":
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context(self.start_method))
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix="readmymri-decode")
+            logger.info(f"⚙️ Started {self.executor} pool with {self.max_workers} workers")
+        return self._pool
+    
+    async def map(self, fn: Callable, items: List[Any], *args) -> List[Any]:
+        """Apply fn(item, *args) to every item, preserving order"""
+        if not items:
+            return []
+        if self.executor == "sequential":
+            return [fn(item, *args) for item in items]
+        
+        # A few batches per worker keeps cores busy without per-item IPC cost
+        batch_size = max(1, math.ceil(len(items) / (self.max_workers * 4)))
+        batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+        
+        for attempt in range(2):
+            pool = self._get_pool()
+            try:
+                results = await asyncio.gather(*[
+                    asyncio.get_running_loop().run_in_executor(pool, _run_batch, fn, batch, args)
+                    for batch in batches
+                ])
+                return [result for batch_results in results for result in batch_results]
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed): start a fresh pool and retry the study once
+                logger.error(f"❌ Worker pool crashed (attempt {attempt + 1}/2)")
+                pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+        
+        # Still crashing: process this study on a worker thread, off the event loop
+        logger.error("❌ Worker pool keeps crashing - processing this study on a thread")
+        return await asyncio.to_thread(_run_batch, fn, items, args)
+    
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
 
 class ReadMyMRIPreprocessor:
     """Enhanced DICOM preprocessor - Protocol Mismatch Resistant"""
     
-    def __init__(self):
+    ZIP_MODES = ("stream", "extract")
+    
+    def __init__(self, zip_mode: Optional[str] = None,
+                 execution_engine: Optional[DicomExecutionEngine] = None,
+                 assemble_volumes: Optional[bool] = None,
+                 volume_store: Optional[VolumeStore] = None,
+                 workspace_dir: Optional[str] = None,
+                 inline_images: bool = True):
         self.phi_remover = RobustPHIRemover()
         self.metadata_extractor = ProtocolAgnosticMetadataExtractor()
         self.image_extractor = ImageDataExtractor()
         self.temp_dir = tempfile.mkdtemp(prefix='readmymri_')
+        
+        # Pyramid tiers encoded per decoded slice; agents get agent_image_tier inline
+        tiers = os.getenv("READMYMRI_PREVIEW_TIERS", "thumbnail,preview,full")
+        self.pyramid = PreviewPyramid(tuple(t.strip() for t in tiers.split(',') if t.strip()))
+        self.agent_image_tier = os.getenv("READMYMRI_AGENT_IMAGE_TIER", "full")
+        if self.agent_image_tier not in self.pyramid.tiers:
+            logger.warning(f"Agent image tier '{self.agent_image_tier}' is not generated - using the largest tier")
+            self.agent_image_tier = self.pyramid.tiers[0]
+        
+        self.instance_processor = InstanceProcessor(
+            self.phi_remover, self.metadata_extractor, self.image_extractor, self.pyramid
+        )
+        self.series_assembler = SeriesAssembler()
+        self.execution_engine = execution_engine or DicomExecutionEngine.shared()
+        
+        # Instances per series whose pixels are decoded (0 = decode every instance)
+        self.preview_slices_per_series = int(os.getenv("READMYMRI_PREVIEW_SLICES", "3"))
+        
+        # "key" ranks slices by content (KeySliceSelector), "even" spaces them evenly.
+        # Without volumes, key selection samples candidates_factor x as many candidates.
+        self.slice_selection = os.getenv("READMYMRI_SLICE_SELECTION", "key").lower()
+        self.key_slice_candidates_factor = int(os.getenv("READMYMRI_KEY_SLICE_CANDIDATES", "4"))
+        self.key_slice_selector = KeySliceSelector()
+        self.key_slices: Dict[str, List[Dict[str, Any]]] = {}
+        self.pixel_samples: Dict[int, Any] = {}  # Result index -> subsampled pixels (header-first mode)
+        
+        # Decode every instance and stack each series into one volume (off = header-first fast path)
+        if assemble_volumes is None:
+            assemble_volumes = os.getenv("READMYMRI_ASSEMBLE_VOLUMES", "false").lower() == "true"
+        self.assemble_volumes = assemble_volumes
+        
+        # A workspace outlives the preprocessor: volumes, encoded slices and a manifest
+        # are kept there for StudyWorkspace to serve. Without one they go to temp_dir.
+        self.workspace_dir = workspace_dir
+        store_root = workspace_dir or self.temp_dir
+        self.volume_store = volume_store or VolumeStore(os.path.join(store_root, 'volumes'))
+        self.slice_store = SliceStore(os.path.join(workspace_dir, 'slices')) if workspace_dir else None
+        
+        # Base64 images in image_data (for in-process agents); off = references only
+        self.inline_images = inline_images
+        self.volumes: Dict[str, SeriesVolume] = {}
+        self.window_presets: Dict[str, Optional[WindowPreset]] = {}
+        
+        # "stream" reads members in place from the ZIP, "extract" unpacks to temp_dir first
+        self.zip_mode = (zip_mode or os.getenv("READMYMRI_ZIP_MODE", "stream")).lower()
+        if self.zip_mode not in self.ZIP_MODES:
+            logger.warning(f"Unknown ZIP mode '{self.zip_mode}' - using stream")
+            self.zip_mode = "stream"
+        self._zip_reader: Optional[ZipMemberReader] = None
+        
         logger.info(f"🔥 ReadMyMRI Preprocessor v3 initialized - Protocol Mismatch Resistant")
-        logger.info(f"📁 Temp directory: {self.temp_dir}")
+        logger.info(f"📁 Temp directory: {self.temp_dir} (ZIP mode: {self.zip_mode})")
         
     def __del__(self):
         """Cleanup temp directory"""
@@ -396,8 +1598,13 @@ class ReadMyMRIPreprocessor:
         try:
             logger.info(f"🚀 Starting DICOM ZIP processing: {zip_file_path}")
             
-            # Extract ZIP file
-            extracted_files = await self._extract_zip(zip_file_path)
+            # Locate files - read in place from the central directory or extract to disk
+            stage_start = time.perf_counter()
+            if self.zip_mode == "stream":
+                extracted_files = await self._list_zip_members(zip_file_path)
+            else:
+                extracted_files = await self._extract_zip(zip_file_path)
+            _observe_stage('zip_extraction', time.perf_counter() - stage_start)
             
             if not extracted_files:
                 return {
@@ -406,27 +1613,98 @@ class ReadMyMRIPreprocessor:
                     'data': None
                 }
             
-            logger.info(f"📦 Found {len(extracted_files)} files to process")
+            logger.info(f"📦 Found {len(extracted_files)} files to process "
+                        f"({self.execution_engine.executor} executor, {self.execution_engine.max_workers} workers)")
+            
+            # Phase 1: header-only pass over every instance - results keep file order
+            zip_reader = self._zip_reader if self.execution_engine.shares_memory else None
+            processed_results = await self.execution_engine.map(
+                self.instance_processor.read_header, extracted_files, zip_reader
+            )
+            for result in processed_results:
+                for stage, seconds in (result.stage_timings or {}).items():
+                    _observe_stage(stage, seconds)
+            series_geometry = self.series_assembler.group(processed_results)
+            series_index = {uid: geometry.indices for uid, geometry in series_geometry.items()}
+            
+            stage_start = time.perf_counter()
+            if self.assemble_volumes:
+                # Phase 2a: decode every instance and stack each series into a volume,
+                # then encode the selected previews from the volume slices
+                self.volumes = await self._assemble_volumes(series_geometry, processed_results,
+                                                            extracted_files, zip_reader)
+                self.window_presets = self._series_presets(series_geometry, processed_results)
+                if self.slice_selection == "key":
+                    selected = self._select_key_slices_from_volumes(processed_results)
+                else:
+                    selected = self._select_for_decode(series_index)
+                slice_lookup = {idx: (volume.handle, z, self.window_presets.get(uid))
+                                for uid, volume in self.volumes.items()
+                                for z, idx in enumerate(volume.indices)}
+                selected = [idx for idx in selected if idx in slice_lookup]
+                decoded = await self.execution_engine.map(
+                    self.instance_processor.encode_slice, [slice_lookup[idx] for idx in selected]
+                )
+            else:
+                # Phase 2: decode pixels only for the instances selected for preview/analysis
+                if self.slice_selection == "key":
+                    selected = await self._select_key_slices(series_index, extracted_files,
+                                                             processed_results, zip_reader)
+                else:
+                    selected = self._select_for_decode(series_index)
+                samples = await self._window_samples(series_geometry, processed_results, extracted_files, zip_reader)
+                self.window_presets = self._series_presets(series_geometry, processed_results, samples)
+                series_of = {idx: uid for uid, geometry in series_geometry.items() for idx in geometry.indices}
+                decoded = await self.execution_engine.map(
+                    self.instance_processor.decode_image,
+                    [(extracted_files[i], self.window_presets.get(series_of[i])) for i in selected],
+                    zip_reader
+                )
+            # Only the encoded previews are kept - pixels live in the volume store
+            slice_numbers = {idx: (uid, z) for uid, geometry in series_geometry.items()
+                             for z, idx in enumerate(geometry.indices)}
+            for idx, tiers in zip(selected, decoded):
+                if not tiers:
+                    continue
+                result = processed_results[idx]
+                if result.slice_ref is None:
+                    result.slice_ref = slice_numbers[idx]
+                if self.slice_store is not None:
+                    uid, z = result.slice_ref
+                    result.slice_etags = {tier: self.slice_store.put(series_key(uid), z, data, 'png', tier)
+                                          for tier, data in tiers.items()}
+                if self.inline_images:
+                    result.image_data = base64.b64encode(tiers[self.agent_image_tier]).decode('utf-8')
+            _observe_stage('pixel_render', time.perf_counter() - stage_start)
+            logger.info(f"🖼️ Decoded pixels for {len(selected)}/{len(extracted_files)} instances "
+                        f"across {len(series_index)} series")
             
-            # Process each file
-            processed_results = []
             all_metadata = []
             image_data_list = []
             
-            for idx, file_path in enumerate(extracted_files):
-                logger.info(f"Processing file {idx + 1}/{len(extracted_files)}: {os.path.basename(file_path)}")
-                result = await self._process_single_dicom(file_path, user_context)
-                processed_results.append(result)
-                
+            for result in processed_results:
                 if result.success:
                     if result.metadata:
                         all_metadata.append(result.metadata)
-                    if result.image_data:
-                        image_data_list.append({
+                    if result.image_data or result.slice_etags:
+                        entry = {
                             'anonymized_id': result.anonymized_id,
-                            'image_data': result.image_data,
                             'metadata': result.metadata
-                        })
+                        }
+                        if result.image_data:
+                            entry['image_data'] = result.image_data
+                        if result.slice_etags:
+                            entry.update({
+                                'series_key': series_key(result.slice_ref[0]),
+                                'slice_number': result.slice_ref[1],
+                                'etags': result.slice_etags
+                            })
+                        if result.key_slice_score is not None:
+                            entry['key_slice_score'] = result.key_slice_score
+                        image_data_list.append(entry)
+            
+            # Highest-ranked key slices first - agents that take one image take the best one
+            image_data_list.sort(key=lambda entry: -(entry.get('key_slice_score') or 0.0))
             
             # Get successful files
             successful_results = [r for r in processed_results if r.success]
@@ -458,7 +1736,7 @@ class ReadMyMRIPreprocessor:
                     'dicom_processing': {
                         'files_processed': len(successful_results),
                         'files_with_images': len(image_data_list),
-                        'primary_file': os.path.basename(extracted_files[0]) if extracted_files else 'unknown',
+                        'primary_file': source_name(extracted_files[0]) if extracted_files else 'unknown',
                         'series_id': primary_metadata.get('series_number', 'Unknown'),
                         'modality': primary_metadata.get('modality', 'MR'),
                         'body_part': primary_metadata.get('body_part_examined', 'Unknown'),
@@ -469,6 +1747,10 @@ class ReadMyMRIPreprocessor:
                     'metadata': primary_metadata,
                     'all_metadata': all_metadata,
                     
+                    # Study/series index from the header pass
+                    'series': self._summarize_series(series_geometry, processed_results),
+                    'volumes': [volume.to_summary() for volume in self.volumes.values()],
+                    
                     # Image data for agents - CRITICAL!
                     'image_data': image_data_list,
                     
@@ -493,6 +1775,9 @@ class ReadMyMRIPreprocessor:
                 }
             }
             
+            if self.workspace_dir:
+                self._write_manifest(study_id, series_geometry, processed_results)
+            
             logger.info(f"✅ Processing complete: {len(successful_results)} files, {len(image_data_list)} with images")
             logger.info(f"🧠 Metadata reliability: {primary_metadata.get('metadata_reliability', 'Unknown')}")
             logger.info(f"🖼️ Images ready for AI agents: {len(image_data_list)}")
@@ -510,6 +1795,23 @@ class ReadMyMRIPreprocessor:
                 'data': None,
                 'error': str(e)
             }
+        
+        finally:
+            if self._zip_reader is not None:
+                self._zip_reader.close()
+                self._zip_reader = None
+    
+    async def _list_zip_members(self, zip_file_path: str) -> List[ZipMember]:
+        """List ZIP members for in-place reading - nothing is written to disk"""
+        try:
+            self._zip_reader = ZipMemberReader(zip_file_path)
+            members = self._zip_reader.list_members()
+            stored = sum(1 for m in members if m.compress_type == zipfile.ZIP_STORED and m.data_offset is not None)
+            logger.info(f"📦 Found {len(members)} files in ZIP central directory ({stored} memory-mapped)")
+            return members
+        except Exception as e:
+            logger.error(f"❌ ZIP listing failed: {str(e)}")
+            return []
     
     async def _extract_zip(self, zip_file_path: str) -> List[str]:
         """Extract files from ZIP - ultra permissive"""
@@ -539,86 +1841,249 @@ class ReadMyMRIPreprocessor:
             logger.error(f"❌ ZIP extraction failed: {str(e)}")
             return []
     
-    async def _process_single_dicom(self, file_path: str, user_context: Dict[str, Any]) -> ProcessingResult:
-        """Process single file with maximum tolerance"""
-        start_time = datetime.now()
+    async def _process_single_dicom(self, file_path: DicomSource, user_context: Dict[str, Any]) -> ProcessingResult:
+        """Process single file with maximum tolerance (inline, on the calling thread)"""
+        return self.instance_processor(file_path, self._zip_reader)
+    
+    async def _assemble_volumes(self, series_geometry: Dict[str, SeriesGeometry],
+                                results: List[ProcessingResult],
+                                sources: List[DicomSource],
+                                zip_reader: Optional[ZipMemberReader]) -> Dict[str, SeriesVolume]:
+        """Allocate a memmap volume per series and decode every instance into it"""
+        plans = {}
+        items = []
+        for uid, geometry in series_geometry.items():
+            plan = self.series_assembler.plan(geometry, results)
+            if plan is None:
+                continue
+            (rows, cols), dtype, keep = plan
+            handle = self.volume_store.allocate(uid, (len(keep), rows, cols), dtype)
+            plans[uid] = (geometry, handle, keep)
+            items.extend((sources[idx], handle, z) for z, idx in enumerate(keep))
         
-        try:
-            # Try to read as DICOM
-            ds = None
-            error_msg = None
-            
-            if PYDICOM_AVAILABLE:
-                try:
-                    # Ultra-permissive reading
-                    ds = pydicom.dcmread(file_path, force=True, stop_before_pixels=False)
-                except Exception as e:
-                    error_msg = str(e)
-                    logger.warning(f"Could not read as standard DICOM: {error_msg}")
-                    
-                    # Try without pixel data
-                    try:
-                        ds = pydicom.dcmread(file_path, force=True, stop_before_pixels=True)
-                        logger.info("Successfully read DICOM without pixel data")
-                    except:
-                        ds = None
-            
-            if ds is None:
-                # Not a valid DICOM, but still try to process
-                logger.warning(f"File is not a valid DICOM: {file_path}")
-                return ProcessingResult(
-                    success=False,
-                    message="Not a valid DICOM file",
-                    error=error_msg or "Invalid DICOM",
-                    file_path=file_path
-                )
-            
-            original_size = os.path.getsize(file_path)
-            
-            # Extract metadata - will handle missing fields
-            metadata = self.metadata_extractor.extract_metadata(ds)
-            
-            # Extract image data for agents
-            image_base64, pixel_array = self.image_extractor.extract_image_data(ds, file_path)
-            
-            # Remove PHI
-            cleaned_ds, anonymized_id = self.phi_remover.remove_phi(ds)
-            
-            # Update metadata with anonymized ID
-            metadata['anonymized_id'] = anonymized_id
-            
-            # Calculate processing time
-            processing_time = (datetime.now() - start_time).total_seconds() * 1000
-            
-            # Mark as successful even if some data is missing
-            success = True
-            message = "DICOM processed successfully"
-            
-            if not image_base64 and not pixel_array:
-                message += " (no image data available)"
-                logger.warning(f"No image data extracted from {file_path}")
-            
-            return ProcessingResult(
-                success=success,
-                message=message,
-                anonymized_id=anonymized_id,
-                file_size_original=original_size,
-                file_size_processed=original_size,
-                processing_time_ms=processing_time,
-                metadata=metadata,
-                file_path=file_path,
-                image_data=image_base64,
-                pixel_array=pixel_array
+        # Workers write straight into the volume files
+        written = await self.execution_engine.map(self.instance_processor.decode_into, items, zip_reader)
+        status = {(item[1].path, item[2]): ok for item, ok in zip(items, written)}
+        
+        volumes = {}
+        for uid, (geometry, handle, keep) in plans.items():
+            positions = dict(zip(geometry.indices, geometry.slice_positions))
+            volume = SeriesVolume(
+                series_instance_uid=uid,
+                handle=handle,
+                spacing=(geometry.slice_spacing or 1.0,) + tuple(geometry.pixel_spacing),
+                indices=keep,
+                slice_positions=[positions[idx] for idx in keep],
+                orientation=geometry.orientation,
+                origin=geometry.origin,
+                missing_slices=[z for z in range(len(keep)) if not status[(handle.path, z)]]
             )
-            
-        except Exception as e:
-            logger.error(f"❌ Processing failed for {file_path}: {str(e)}")
-            return ProcessingResult(
-                success=False,
-                message=f"Processing failed: {str(e)}",
-                error=str(e),
-                file_path=file_path
+            for z, idx in enumerate(keep):
+                results[idx].slice_ref = (uid, z)
+            volumes[uid] = volume
+            logger.info(f"🧊 Stored volume {handle.shape} for series {uid} "
+                        f"(spacing {volume.spacing}, geometric sort: {geometry.geometric})")
+        logger.info(f"💾 Volume store: {self.volume_store.nbytes / (1024 * 1024):.1f} MB on disk")
+        return volumes
+    
+    def _series_presets(self, series_geometry: Dict[str, SeriesGeometry],
+                        results: List[ProcessingResult],
+                        samples: Optional[Dict[str, Any]] = None) -> Dict[str, Optional[WindowPreset]]:
+        """One window preset per series, computed once
+        
+        Uses the header window when present; otherwise fits one to the stored
+        volume, or (header-first) to the series' pixel samples. Without any of
+        those, slices are windowed individually (None).
+        """
+        presets = {}
+        samples = samples or {}
+        for uid, geometry in series_geometry.items():
+            pixel_format = results[geometry.indices[0]].pixel_format
+            preset = WindowPreset.from_pixel_format(pixel_format)
+            volume = self.volumes.get(uid)
+            if preset is None and volume is not None:
+                preset = self.image_extractor.renderer.preset_for(volume.volume, pixel_format)
+            elif preset is None and uid in samples:
+                preset = self.image_extractor.renderer.preset_for(samples[uid], pixel_format)
+            presets[uid] = preset
+        return presets
+    
+    async def _window_samples(self, series_geometry: Dict[str, SeriesGeometry],
+                              results: List[ProcessingResult],
+                              sources: List[DicomSource],
+                              zip_reader: Optional[ZipMemberReader]) -> Dict[str, Any]:
+        """Flattened pixel samples per series without a header window (header-first mode)
+        
+        Reuses the samples taken for key-slice scoring; other series get a few
+        evenly spaced instances sampled.
+        """
+        samples: Dict[str, List[Any]] = {}
+        unsampled = {}
+        for uid, geometry in series_geometry.items():
+            if WindowPreset.from_pixel_format(results[geometry.indices[0]].pixel_format) is not None:
+                continue
+            taken = [self.pixel_samples[idx] for idx in geometry.indices if idx in self.pixel_samples]
+            if taken:
+                samples[uid] = taken
+            else:
+                unsampled[uid] = geometry.indices
+        self.pixel_samples = {}
+        
+        if unsampled:
+            picks = self._select_for_decode(unsampled, max(self.preview_slices_per_series, 1))
+            series_of = {idx: uid for uid, indices in unsampled.items() for idx in indices}
+            taken = await self.execution_engine.map(
+                self.instance_processor.sample_pixels,
+                [(sources[idx], self.key_slice_selector) for idx in picks],
+                zip_reader
             )
+            for idx, sample in zip(picks, taken):
+                if sample is not None:
+                    samples.setdefault(series_of[idx], []).append(sample)
+        return {uid: np.concatenate([sample.reshape(-1) for sample in taken]) for uid, taken in samples.items()}
+    
+    async def _select_key_slices(self, series_index: Dict[str, List[int]],
+                                 sources: List[DicomSource],
+                                 results: List[ProcessingResult],
+                                 zip_reader: Optional[ZipMemberReader]) -> List[int]:
+        """Score evenly spaced candidates from small pixel samples and keep the top N per series"""
+        count = self.preview_slices_per_series
+        if count <= 0:
+            return self._select_for_decode(series_index)
+        candidates = self._select_for_decode(series_index, count * max(self.key_slice_candidates_factor, 1))
+        samples = await self.execution_engine.map(
+            self.instance_processor.sample_pixels,
+            [(sources[idx], self.key_slice_selector) for idx in candidates],
+            zip_reader
+        )
+        sampled = dict(zip(candidates, samples))
+        self.pixel_samples.update((idx, sample) for idx, sample in sampled.items() if sample is not None)
+        
+        selected = []
+        for uid, indices in series_index.items():
+            series_candidates = [idx for idx in indices if sampled.get(idx) is not None]
+            shapes = [sampled[idx].shape for idx in series_candidates]
+            if shapes:
+                # Stack slices of the common shape (mixed matrices within a series are rare)
+                shape = max(set(shapes), key=shapes.count)
+                series_candidates = [idx for idx in series_candidates if sampled[idx].shape == shape]
+            if len(series_candidates) <= count:
+                selected.extend(series_candidates or self._select_for_decode({uid: indices}))
+                continue
+            slice_number = {idx: z for z, idx in enumerate(indices)}
+            stack = np.stack([sampled[idx] for idx in series_candidates])
+            selected.extend(self._apply_key_slices(uid, series_candidates, stack,
+                                                   [slice_number[idx] for idx in series_candidates],
+                                                   len(indices), results))
+        return sorted(selected)
+    
+    def _select_key_slices_from_volumes(self, results: List[ProcessingResult]) -> List[int]:
+        """Score every slice of each stored volume and keep the top N per series"""
+        selected = []
+        for uid, volume in self.volumes.items():
+            count = len(volume.indices)
+            if self.preview_slices_per_series <= 0 or count <= self.preview_slices_per_series:
+                selected.extend(volume.indices)
+                continue
+            stack = self.key_slice_selector.subsample(volume.volume)
+            selected.extend(self._apply_key_slices(uid, volume.indices, stack, list(range(count)), count, results))
+        return sorted(selected)
+    
+    def _apply_key_slices(self, uid: str, indices: List[int], stack: Any, slice_numbers: List[int],
+                          slice_count: int, results: List[ProcessingResult]) -> List[int]:
+        """Rank one series, record the picks and return their result indices"""
+        positions = [z / max(slice_count - 1, 1) for z in slice_numbers]
+        scores = self.key_slice_selector.score(stack, positions)
+        picks = self.key_slice_selector.select(scores, self.preview_slices_per_series)
+        self.key_slices[uid] = []
+        for pick in picks:
+            results[indices[pick]].key_slice_score = scores[pick]['score']
+            self.key_slices[uid].append({'slice_number': slice_numbers[pick], **scores[pick]})
+        return [indices[pick] for pick in picks]
+    
+    def _select_for_decode(self, series_index: Dict[str, List[int]], count: Optional[int] = None) -> List[int]:
+        """Pick evenly spaced instances per series (centred, so one slice means the middle one)"""
+        if count is None:
+            count = self.preview_slices_per_series
+        selected = []
+        for indices in series_index.values():
+            if count <= 0 or count >= len(indices):
+                selected.extend(indices)
+                continue
+            stride = len(indices) / count
+            selected.extend(indices[int((k + 0.5) * stride)] for k in range(count))
+        return sorted(selected)
+    
+    def _summarize_series(self, series_geometry: Dict[str, SeriesGeometry],
+                          results: List[ProcessingResult]) -> List[Dict[str, Any]]:
+        """Per-series summary for the response"""
+        summary = []
+        for series_uid, geometry in series_geometry.items():
+            indices = geometry.indices
+            first = results[indices[0]].metadata
+            summary.append({
+                'series_instance_uid': series_uid,
+                'series_number': first.get('series_number', 'Unknown'),
+                'series_description': first.get('series_description', 'Unknown'),
+                'modality': first.get('modality', 'MR'),
+                'instance_count': len(indices),
+                'geometric_sort': geometry.geometric,
+                'slice_spacing_mm': geometry.slice_spacing,
+                'pixel_spacing_mm': list(geometry.pixel_spacing),
+                'series_key': series_key(series_uid),
+                'slice_count': len(self._slice_numbers(series_uid, geometry, results)),
+                'slice_numbers': self._slice_numbers(series_uid, geometry, results),
+                'window': self.window_presets[series_uid].to_summary() if self.window_presets.get(series_uid) else None,
+                'key_slices': self.key_slices.get(series_uid, []),
+                'images_decoded': sum(1 for i in indices if results[i].image_data or results[i].slice_etags
+                                      or results[i].pixel_array is not None)
+            })
+        return summary
+    
+    def _slice_numbers(self, series_uid: str, geometry: SeriesGeometry,
+                       results: List[ProcessingResult]) -> List[int]:
+        """Slice numbers that can be fetched from the workspace
+        
+        Every volume slice when a volume was stored; otherwise only the slices
+        encoded during processing (the key slices in header-first mode).
+        """
+        volume = self.volumes.get(series_uid)
+        if volume:
+            return list(range(volume.handle.shape[0]))
+        return sorted(results[i].slice_ref[1] for i in geometry.indices if results[i].slice_etags)
+    
+    def _write_manifest(self, study_id: str, series_geometry: Dict[str, SeriesGeometry],
+                        results: List[ProcessingResult]):
+        """Describe the workspace contents for StudyWorkspace (written last, atomically)"""
+        series = []
+        for uid, geometry in series_geometry.items():
+            first = results[geometry.indices[0]].metadata
+            volume = self.volumes.get(uid)
+            preset = self.window_presets.get(uid)
+            series.append({
+                'key': series_key(uid),
+                'series_number': first.get('series_number', 'Unknown'),
+                'series_description': first.get('series_description', 'Unknown'),
+                'modality': first.get('modality', 'MR'),
+                'slice_count': len(self._slice_numbers(uid, geometry, results)),
+                'slice_numbers': self._slice_numbers(uid, geometry, results),
+                'window': asdict(preset) if preset else None,
+                'volume': {
+                    'path': os.path.relpath(volume.handle.path, self.workspace_dir),
+                    'shape': list(volume.handle.shape),
+                    'dtype': volume.handle.dtype
+                } if volume else None,
+                'slices': sorted(
+                    ({'number': results[i].slice_ref[1], 'etags': results[i].slice_etags}
+                     for i in geometry.indices if results[i].slice_etags),
+                    key=lambda entry: entry['number']
+                )
+            })
+        
+        manifest_path = os.path.join(self.workspace_dir, StudyWorkspace.MANIFEST)
+        with open(f"{manifest_path}.tmp", 'w') as f:
+            json.dump({'study_id': study_id, 'created_at': time.time(), 'series': series}, f)
+        os.replace(f"{manifest_path}.tmp", manifest_path)
     
     def _create_empty_metadata(self) -> Dict[str, Any]:
         """Create empty metadata structure"""
@@ -680,8 +2145,59 @@ class ReadMyMRIPreprocessor:
         
         return info
 
+async def benchmark_execution(zip_file_path: str, executors: Tuple[str, ...] = EXECUTION_BENCHMARK_MODES) -> Dict[str, Dict[str, float]]:
+    """Time process_dicom_zip on each executor and measure event loop stalls
+    
+    A heartbeat coroutine ticks every 10ms while the study is processed; the worst
+    gap between ticks is how long the loop was blocked (i.e. how long health checks
+    and other requests would have waited).
+    """
+    results = {}
+    for executor in executors:
+        engine = DicomExecutionEngine(executor)
+        processor = ReadMyMRIPreprocessor(execution_engine=engine)
+        
+        max_lag = 0.0
+        running = True
+        
+        async def heartbeat():
+            nonlocal max_lag
+            last = time.perf_counter()
+            while running:
+                await asyncio.sleep(0.01)
+                now = time.perf_counter()
+                max_lag = max(max_lag, now - last - 0.01)
+                last = now
+        
+        ticker = asyncio.create_task(heartbeat())
+        await asyncio.sleep(0)  # Let the heartbeat start before any inline work
+        start = time.perf_counter()
+        result = await processor.process_dicom_zip(zip_file_path, {})
+        elapsed = time.perf_counter() - start
+        running = False
+        await ticker
+        engine.shutdown()
+        
+        files = (result.get('data') or {}).get('dicom_processing', {}).get('files_processed', 0)
+        results[executor] = {
+            'seconds': round(elapsed, 3),
+            'files': files,
+            'files_per_second': round(files / elapsed, 1) if elapsed > 0 else 0.0,
+            'max_event_loop_stall_ms': round(max_lag * 1000, 1),
+            'workers': engine.max_workers
+        }
+    return results
+
 # For testing
 if __name__ == "__main__":
+    import sys
+    
+    if len(sys.argv) == 3 and sys.argv[1] == "--benchmark":
+        # python readmymri_preprocessorv4.py --benchmark study.zip
+        for executor, stats in asyncio.run(benchmark_execution(sys.argv[2])).items():
+            print(f"{executor:>10}: {stats}")
+        sys.exit(0)
+    
     async def test_preprocessor():
         processor = ReadMyMRIPreprocessor()
         
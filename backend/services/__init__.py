@@ -0,0 +1 @@
+"""Shared runtime services for the ReadMyMRI backend (LLM access, caching, jobs)"""
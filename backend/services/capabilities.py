@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Capability registry for optional backend components
+
+Components such as the integration layer and the agent orchestrator pull in
+heavy optional dependencies, so whether they are usable is probed once - in a
+background thread at startup, or on first explicit probe() - and the outcome
+is cached. Health endpoints read the cache via status() and never import
+anything themselves; until a probe has finished its capability reports
+"pending".
+"""
+
+import time
+import asyncio
+import logging
+import importlib
+import threading
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class Capability:
+    """Cached outcome of one probe"""
+    name: str
+    available: bool
+    detail: str
+    checked_at: float
+    probe_seconds: float
+
+def import_probe(module: str, attribute: Optional[str] = None) -> Callable[[], str]:
+    """Probe that imports a module (and checks one attribute) without instantiating anything"""
+    def probe() -> str:
+        loaded = importlib.import_module(module)
+        if attribute is not None and not hasattr(loaded, attribute):
+            raise ImportError(f"{module} has no attribute {attribute!r}")
+        return f"{module}.{attribute}" if attribute else module
+    return probe
+
+class CapabilityRegistry:
+    """Named probes whose results are computed once and served from memory"""
+    
+    def __init__(self):
+        self._probes: Dict[str, Callable[[], str]] = {}
+        self._results: Dict[str, Capability] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._startup_task: Optional[asyncio.Task] = None
+    
+    def register(self, name: str, probe: Callable[[], str]):
+        """Add a probe - it returns a detail string, or raises when the component is unusable"""
+        self._probes[name] = probe
+        self._locks[name] = threading.Lock()
+    
+    @property
+    def names(self) -> List[str]:
+        return list(self._probes)
+    
+    def probe(self, name: str, refresh: bool = False) -> Capability:
+        """Run (or reuse) the probe for name; concurrent callers share one run"""
+        with self._locks[name]:
+            cached = self._results.get(name)
+            if cached is not None and not refresh:
+                return cached
+            start = time.perf_counter()
+            try:
+                detail = self._probes[name]() or "ok"
+                available = True
+            except Exception as e:
+                detail = f"{type(e).__name__}: {e}"
+                available = False
+            capability = Capability(
+                name=name,
+                available=available,
+                detail=detail,
+                checked_at=time.time(),
+                probe_seconds=round(time.perf_counter() - start, 3)
+            )
+            self._results[name] = capability
+        log = logger.info if available else logger.warning
+        log(f"Capability {name}: {'available' if available else 'unavailable'} ({detail}, {capability.probe_seconds}s)")
+        return capability
+    
+    def probe_all(self, refresh: bool = False) -> Dict[str, Capability]:
+        return {name: self.probe(name, refresh) for name in self._probes}
+    
+    def start_background_probe(self) -> asyncio.Task:
+        """Probe everything off the event loop (idempotent) - call from a startup hook"""
+        if self._startup_task is None:
+            self._startup_task = asyncio.create_task(asyncio.to_thread(self.probe_all))
+        return self._startup_task
+    
+    def get(self, name: str) -> Optional[Capability]:
+        """Cached result, or None while the probe has not finished"""
+        return self._results.get(name)
+    
+    def is_available(self, name: str) -> bool:
+        capability = self._results.get(name)
+        return capability is not None and capability.available
+    
+    def status(self) -> Dict[str, Dict]:
+        """JSON-safe snapshot for health endpoints (never probes)"""
+        snapshot = {}
+        for name in self._probes:
+            capability = self._results.get(name)
+            snapshot[name] = asdict(capability) if capability is not None else {"name": name, "available": None, "detail": "pending"}
+        return snapshot
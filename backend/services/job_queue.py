@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Bounded asynchronous job queue for upload processing
+
+Uploads are handed to a fixed number of worker tasks through a queue with a
+hard depth limit. When the queue is full, submit() raises QueueFullError with a
+Retry-After estimate instead of accepting more work than the process can hold.
+Finished jobs are kept for result_ttl_seconds so clients can poll for them.
+"""
+
+import os
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+JOB_STATES = ("queued", "running", "succeeded", "failed")
+
+class JobFailedError(Exception):
+    """Raised by a handler to fail its job while still attaching a result payload"""
+    
+    def __init__(self, message: str, result: Any = None):
+        super().__init__(message)
+        self.result = result
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at capacity"""
+    
+    def __init__(self, retry_after: int):
+        super().__init__(f"Job queue is full - retry in {retry_after}s")
+        self.retry_after = retry_after
+
+@dataclass
+class Job:
+    """One unit of queued work and its outcome"""
+    job_id: str
+    handler: Callable[..., Awaitable[Any]]
+    args: tuple = ()
+    meta: Dict[str, Any] = field(default_factory=dict)
+    state: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+    
+    def to_status(self, queue_position: Optional[int] = None) -> Dict[str, Any]:
+        """JSON-safe state (the result itself is served separately)"""
+        status = {
+            "job_id": self.job_id,
+            "state": self.state,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "wait_seconds": round((self.started_at or time.time()) - self.created_at, 3),
+            "run_seconds": round((self.finished_at or time.time()) - self.started_at, 3) if self.started_at else None,
+            "error": self.error,
+            **self.meta
+        }
+        if queue_position is not None:
+            status["queue_position"] = queue_position
+        return status
+
+class JobQueue:
+    """Fixed worker pool draining a depth-limited asyncio.Queue"""
+    
+    def __init__(self, max_workers: int = 2, max_queue_depth: int = 16,
+                 result_ttl_seconds: float = 3600):
+        self.max_workers = max(1, max_workers)
+        self.max_queue_depth = max(1, max_queue_depth)
+        self.result_ttl_seconds = result_ttl_seconds
+        self.jobs: Dict[str, Job] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._queued: "OrderedDict[str, Job]" = OrderedDict()  # Jobs not yet picked up, in queue order
+        self._workers = []
+        self._in_flight = 0
+        self._recent_run_seconds = []  # Rolling window for Retry-After estimates
+    
+    @classmethod
+    def from_env(cls) -> "JobQueue":
+        return cls(
+            max_workers=int(os.getenv("JOB_WORKERS", "2")),
+            max_queue_depth=int(os.getenv("JOB_QUEUE_DEPTH", "16")),
+            result_ttl_seconds=float(os.getenv("JOB_RESULT_TTL_SECONDS", "3600"))
+        )
+    
+    def start(self):
+        """Start the workers on the running loop (idempotent)"""
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_depth)
+        self._workers = [asyncio.create_task(self._worker(n)) for n in range(self.max_workers)]
+        logger.info(f"Job queue started: {self.max_workers} workers, depth {self.max_queue_depth}")
+    
+    async def stop(self):
+        """Cancel the workers and fail every job they had not finished, so no waiter hangs"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for job in self._queued.values():
+            self._finish(job, "failed", error="Job queue stopped before the job ran")
+        self._queued.clear()
+        self._queue = None
+    
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+    
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+    
+    @property
+    def is_full(self) -> bool:
+        return self.depth >= self.max_queue_depth
+    
+    def retry_after(self) -> int:
+        """Seconds until a queue slot is likely to free up"""
+        if self._recent_run_seconds:
+            typical = sorted(self._recent_run_seconds)[len(self._recent_run_seconds) // 2]
+        else:
+            typical = 10.0
+        return max(1, round(typical * (self.depth + 1) / self.max_workers))
+    
+    def submit(self, handler: Callable[..., Awaitable[Any]], *args, **meta) -> Job:
+        """Enqueue handler(*args) - raises QueueFullError when at capacity"""
+        self.start()
+        self._prune()
+        job = Job(job_id=uuid.uuid4().hex, handler=handler, args=args, meta=meta)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError(self.retry_after())
+        self._queued[job.job_id] = job
+        self.jobs[job.job_id] = job
+        return job
+    
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+    
+    def position(self, job: Job) -> Optional[int]:
+        """1-based position among queued jobs (None once running)"""
+        if job.state != "queued" or job.job_id not in self._queued:
+            return None
+        return list(self._queued).index(job.job_id) + 1
+    
+    async def _worker(self, n: int):
+        while True:
+            job = await self._queue.get()
+            self._queued.pop(job.job_id, None)
+            job.state = "running"
+            job.started_at = time.time()
+            self._in_flight += 1
+            try:
+                self._finish(job, "succeeded", result=await job.handler(*job.args))
+            except JobFailedError as e:
+                self._finish(job, "failed", result=e.result, error=str(e))
+            except asyncio.CancelledError:
+                self._finish(job, "failed", error="Job queue stopped while the job was running")
+                raise
+            except Exception as e:
+                logger.error(f"Job {job.job_id} failed: {e}")
+                self._finish(job, "failed", error=str(e))
+            finally:
+                self._in_flight -= 1
+                self._recent_run_seconds = (self._recent_run_seconds + [job.finished_at - job.started_at])[-50:]
+                self._queue.task_done()
+    
+    @staticmethod
+    def _finish(job: Job, state: str, result: Any = None, error: Optional[str] = None):
+        """Record the outcome and wake everyone waiting on the job"""
+        job.state = state
+        job.result = result
+        job.error = error
+        job.finished_at = time.time()
+        job.done.set()
+    
+    def _prune(self):
+        """Forget finished jobs older than the result TTL"""
+        cutoff = time.time() - self.result_ttl_seconds
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job.finished_at is not None and job.finished_at < cutoff]
+        for job_id in expired:
+            del self.jobs[job_id]
+    
+    def stats(self) -> Dict[str, int]:
+        states = {state: 0 for state in JOB_STATES}
+        for job in self.jobs.values():
+            states[job.state] += 1
+        return {
+            "queue_depth": self.depth,
+            "max_queue_depth": self.max_queue_depth,
+            "in_flight": self.in_flight,
+            "workers": self.max_workers,
+            **states
+        }
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache for LLM responses
+
+Responses are keyed by a hash of (model, normalized prompt, image digests), so a
+re-submitted study maps to the same entry no matter how the prompt was
+re-indented. An in-process LRU serves repeats within one worker; the optional
+disk tier is shared by workers and survives restarts, with a TTL and a total
+size cap (oldest entries are evicted first).
+
+Async callers use aget/aput, which run the disk tier in a worker thread; disk
+eviction always runs in a background thread, off the request path.
+"""
+
+import os
+import asyncio
+import json
+import math
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so formatting-only differences share a cache entry"""
+    return " ".join(prompt.split())
+
+def image_digest(data: bytes) -> str:
+    """Digest of an image payload for use in cache keys"""
+    return hashlib.sha256(data).hexdigest()
+
+class LLMResponseCache:
+    """Two-tier (memory LRU + optional disk) response cache with hit/miss counters"""
+    
+    def __init__(self, max_entries: int = 256,
+                 disk_dir: Optional[str] = None,
+                 ttl_seconds: float = 86400,
+                 max_disk_bytes: int = 256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_bytes = max_disk_bytes
+        
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes: Optional[int] = None  # Computed on first write
+        self._evicting = False
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+    
+    @classmethod
+    def from_env(cls) -> "LLMResponseCache":
+        return cls(
+            max_entries=int(os.getenv("LLM_CACHE_ENTRIES", "256")),
+            disk_dir=os.getenv("LLM_CACHE_DIR") or None,
+            ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400")),
+            max_disk_bytes=int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+        )
+    
+    @staticmethod
+    def key(model: str, prompt: str, image_digests: Iterable[str] = ()) -> str:
+        """sha256 over the model, the normalized prompt and the image digests"""
+        h = hashlib.sha256()
+        h.update(model.encode())
+        h.update(b"\0")
+        h.update(normalize_prompt(prompt).encode())
+        for digest in image_digests:
+            h.update(b"\0")
+            h.update(digest.encode())
+        return h.hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        value = self._get_memory(key, now)
+        if value is not None:
+            return value
+        return self._disk_lookup(key, self._read_disk(key, now))
+    
+    async def aget(self, key: str) -> Optional[str]:
+        """get() for the event loop: a memory miss reads the disk tier in a worker thread"""
+        now = time.time()
+        value = self._get_memory(key, now)
+        if value is not None:
+            return value
+        entry = await asyncio.to_thread(self._read_disk, key, now) if self.disk_dir else None
+        return self._disk_lookup(key, entry)
+    
+    def put(self, key: str, value: str):
+        entry = self._put_memory(key, value)
+        if self.disk_dir:
+            self._write_disk(key, entry)
+    
+    async def aput(self, key: str, value: str):
+        """put() for the event loop: the disk write runs in a worker thread"""
+        entry = self._put_memory(key, value)
+        if self.disk_dir:
+            await asyncio.to_thread(self._write_disk, key, entry)
+    
+    def _get_memory(self, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, value = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+        return None
+    
+    def _disk_lookup(self, key: str, entry: Optional[Tuple[float, str]]) -> Optional[str]:
+        """Count a disk-tier lookup and promote a hit to memory"""
+        with self._lock:
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            self.counters["disk_hits"] += 1
+            self._remember(key, entry)
+        return entry[1]
+    
+    def _put_memory(self, key: str, value: str) -> Tuple[float, str]:
+        entry = (time.time(), value)
+        with self._lock:
+            self._remember(key, entry)
+            self.counters["stores"] += 1
+        return entry
+    
+    def _remember(self, key: str, entry: Tuple[float, str]):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.counters["evictions"] += 1
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+    
+    def _read_disk(self, key: str, now: float) -> Optional[Tuple[float, str]]:
+        if not self.disk_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if now - record.get("created_at", 0) > self.ttl_seconds:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return record["created_at"], record["value"]
+    
+    def _write_disk(self, key: str, entry: Tuple[float, str]):
+        path = self._path(key)
+        data = json.dumps({"created_at": entry[0], "value": entry[1]}).encode()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"LLM cache write failed: {e}")
+            return
+        
+        with self._lock:
+            if self._disk_bytes is None:
+                # First write: size the tier along with the eviction pass
+                self._disk_bytes = len(data)
+                scan = True
+            else:
+                self._disk_bytes += len(data)
+                scan = self._disk_bytes > self.max_disk_bytes
+            if scan and not self._evicting:
+                self._evicting = True
+                threading.Thread(target=self._evict_disk, name="llm-cache-evict", daemon=True).start()
+    
+    def _disk_entries(self):
+        """(mtime, size, path) for every entry file"""
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+    
+    def _evict_disk(self):
+        """Drop expired entries, then oldest first until under 90% of the size cap
+        
+        Runs in a background thread (one at a time) started by _write_disk.
+        """
+        total, evicted = 0, 0
+        try:
+            entries = sorted(self._disk_entries())
+            total = sum(size for _, size, _ in entries)
+            target = self.max_disk_bytes * 0.9 if total > self.max_disk_bytes else math.inf
+            cutoff = time.time() - self.ttl_seconds
+            for mtime, size, path in entries:
+                if total <= target and mtime >= cutoff:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    evicted += 1
+                except OSError:
+                    pass
+        finally:
+            with self._lock:
+                self._disk_bytes = total
+                self.counters["evictions"] += evicted
+                self._evicting = False
+    
+    @property
+    def hit_ratio(self) -> float:
+        hits = self.counters["memory_hits"] + self.counters["disk_hits"]
+        lookups = hits + self.counters["misses"]
+        return hits / lookups if lookups else 0.0
+    
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                **self.counters,
+                "hit_ratio": round(self.hit_ratio, 4),
+                "memory_entries": len(self._memory),
+                "disk_enabled": bool(self.disk_dir),
+                "disk_bytes": self._disk_bytes or 0
+            }
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Async LLM client for the API process
+
+One AsyncAnthropic client per process, on a pooled httpx transport, so analysis
+calls reuse connections and never block the event loop. A semaphore caps the
+number of in-flight model calls and every call carries its own timeout.
+Replies are served from an LLMResponseCache when the same prompt was already
+answered, and concurrent identical calls share a single request.
+"""
+
+import os
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, Optional
+
+import httpx
+
+try:
+    import anthropic
+    ANTHROPIC_AVAILABLE = True
+except ImportError:
+    ANTHROPIC_AVAILABLE = False
+    logging.warning("anthropic SDK not available - AI analysis disabled")
+
+from services.llm_cache import LLMResponseCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ANALYSIS_MODEL = "claude-3-5-sonnet-20241022"
+
+class LLMUnavailableError(Exception):
+    """Raised when no API key or SDK is configured"""
+    pass
+
+class LLMTimeoutError(Exception):
+    """Raised when a model call exceeds its timeout"""
+    pass
+
+class AsyncLLMClient:
+    """Pooled, concurrency-limited async access to the Claude Messages API"""
+    
+    def __init__(self, api_key: Optional[str] = None,
+                 model: str = DEFAULT_ANALYSIS_MODEL,
+                 max_concurrency: int = 8,
+                 timeout_seconds: float = 60.0,
+                 max_connections: int = 20,
+                 max_retries: int = 2,
+                 cache: Optional[LLMResponseCache] = None):
+        self.model = model
+        self.cache = cache
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.timeout_seconds = timeout_seconds
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._in_flight = 0
+        self._client = None
+        
+        if not ANTHROPIC_AVAILABLE or not api_key:
+            return
+        
+        # Keep-alive pool shared by every request in this process
+        http_client = anthropic.DefaultAsyncHttpxClient(
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(timeout_seconds, connect=10.0)
+        )
+        self._client = anthropic.AsyncAnthropic(
+            api_key=api_key,
+            http_client=http_client,
+            max_retries=max_retries
+        )
+    
+    @classmethod
+    def from_env(cls) -> "AsyncLLMClient":
+        return cls(
+            api_key=os.getenv("ANTHROPIC_API_KEY"),
+            model=os.getenv("ANALYSIS_MODEL", DEFAULT_ANALYSIS_MODEL),
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+            timeout_seconds=float(os.getenv("LLM_TIMEOUT_SECONDS", "60")),
+            max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "20")),
+            cache=LLMResponseCache.from_env() if os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true" else None
+        )
+    
+    @property
+    def available(self) -> bool:
+        return self._client is not None
+    
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+    
+    async def complete(self, prompt: str, max_tokens: int = 3000,
+                       timeout: Optional[float] = None,
+                       image_digests: Iterable[str] = ()) -> str:
+        """Send a single-turn prompt and return the text of the reply
+        
+        Waiting for a concurrency slot counts against the timeout, so a saturated
+        client fails fast instead of queueing requests indefinitely. image_digests
+        identify any images sent with the prompt, for the cache key.
+        """
+        if self._client is None:
+            raise LLMUnavailableError("Claude client is not configured")
+        if self.cache is None:
+            return await self._call(prompt, max_tokens, timeout)
+        
+        key = self.cache.key(f"{self.model}:{max_tokens}", prompt, image_digests)
+        cached = await self.cache.aget(key)
+        if cached is not None:
+            return cached
+        
+        # Identical call already in flight: wait for its reply instead of paying twice
+        pending = self._pending.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            text = await self._call(prompt, max_tokens, timeout)
+            future.set_result(text)
+            await self.cache.aput(key, text)
+            return text
+        except asyncio.CancelledError:
+            # Waiters were not cancelled themselves - fail them like any other unavailable call
+            if not future.done():
+                future.set_exception(LLMUnavailableError("Shared model call was cancelled by its caller"))
+                future.exception()
+            raise
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+                future.exception()  # Mark retrieved when nobody else was waiting
+            raise
+        finally:
+            del self._pending[key]
+    
+    async def _call(self, prompt: str, max_tokens: int, timeout: Optional[float]) -> str:
+        timeout = timeout or self.timeout_seconds
+        start = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(self._create(prompt, max_tokens, timeout), timeout)
+        except asyncio.TimeoutError:
+            raise LLMTimeoutError(f"Model call exceeded {timeout:g}s")
+        
+        logger.info(f"LLM call completed in {time.perf_counter() - start:.2f}s")
+        return response.content[0].text
+    
+    async def _create(self, prompt: str, max_tokens: int, timeout: float):
+        async with self._semaphore:
+            self._in_flight += 1
+            try:
+                return await self._client.messages.create(
+                    model=self.model,
+                    max_tokens=max_tokens,
+                    messages=[{"role": "user", "content": prompt}],
+                    timeout=timeout
+                )
+            finally:
+                self._in_flight -= 1
+    
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.close()
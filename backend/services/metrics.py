@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+In-process latency histograms and gauges in Prometheus text format
+
+A deliberately small registry (no prometheus_client dependency): histograms
+with fixed buckets and label sets, and gauges whose values are either set
+directly or read from a callback at scrape time. render() produces the text
+exposition format served on /metrics.
+
+Stage timings are recorded in the process that serves /metrics. Work that runs
+in pool worker processes reports its timings back on its result and the parent
+observes them (see ProcessingResult.stage_timings in the preprocessor).
+"""
+
+import time
+import math
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds - from a single header parse up to a full multi-agent run
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value))
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Sequence[str],
+                   extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{_escape(extra[1])}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class _Metric:
+    """Shared name/help/label handling"""
+    kind = "untyped"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+    
+    def _label_values(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+    
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+    
+    def collect(self) -> List[str]:
+        raise NotImplementedError
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram keyed by label values"""
+    kind = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts..., +Inf count], sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+    
+    def observe(self, value: float, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            counts, total = self._series.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            total[0] += value
+    
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe the wall time of the with-block (also when it raises)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+    
+    def count(self, **labels) -> int:
+        with self._lock:
+            series = self._series.get(self._label_values(labels))
+            return sum(series[0]) if series else 0
+    
+    def collect(self) -> List[str]:
+        lines = self.header()
+        with self._lock:
+            series = sorted((key, list(counts), total[0]) for key, (counts, total) in self._series.items())
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class Gauge(_Metric):
+    """Point-in-time value, set directly or sampled from a callback at scrape time"""
+    kind = "gauge"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._functions: Dict[Tuple[str, ...], Callable[[], float]] = {}
+    
+    def set(self, value: float, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = float(value)
+    
+    def set_function(self, fn: Callable[[], float], **labels):
+        """Sample fn() on every scrape (replaces any earlier callback for these labels)"""
+        key = self._label_values(labels)
+        with self._lock:
+            self._functions[key] = fn
+    
+    def collect(self) -> List[str]:
+        lines = self.header()
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, fn in functions.items():
+            try:
+                values[key] = float(fn())
+            except Exception as e:
+                logger.warning(f"Gauge {self.name}{_format_labels(self.labelnames, key)} callback failed: {e}")
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+class MetricsRegistry:
+    """Named collection of metrics rendered together"""
+    
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+    
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric {metric.name} already registered with a different shape")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+    
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+    
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+    
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+# Pipeline stages: upload_receive, zip_extraction, dicom_parse, phi_removal,
+# pixel_render, lesion_tracking, consensus, report
+STAGE_SECONDS = REGISTRY.histogram(
+    "readmymri_stage_duration_seconds",
+    "Wall time of one pipeline stage",
+    ("stage",)
+)
+
+AGENT_CALL_SECONDS = REGISTRY.histogram(
+    "readmymri_agent_call_duration_seconds",
+    "Wall time of one analysis agent / LLM call",
+    ("agent", "outcome")
+)
+
+def time_stage(stage: str):
+    """Context manager observing a pipeline stage into STAGE_SECONDS"""
+    return STAGE_SECONDS.time(stage=stage)
+
+def observe_stage(stage: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+
+@contextmanager
+def time_agent_call(agent: str) -> Iterator[None]:
+    """Observe an agent call into AGENT_CALL_SECONDS, labelled ok/error by outcome"""
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        AGENT_CALL_SECONDS.observe(time.perf_counter() - start, agent=agent, outcome=outcome)
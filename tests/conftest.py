@@ -0,0 +1,14 @@
+"""Shared test setup: the backend modules are imported the way their entry points import them"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(ROOT, "backend")
+AGENTS_DIR = os.path.join(BACKEND_DIR, "agents")
+
+for path in (BACKEND_DIR, AGENTS_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+os.environ.setdefault("DEMO_MODE", "true")
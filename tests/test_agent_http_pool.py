@@ -0,0 +1,62 @@
+"""AgentHTTPPool client lifetime across event loops"""
+
+import asyncio
+import threading
+
+import pytest
+
+from agent_orchestrator import AgentHTTPPool
+
+pytestmark = pytest.mark.unit
+
+async def get_client(pool: AgentHTTPPool):
+    return pool.client()
+
+def test_clients_on_another_running_loop_are_left_alone():
+    """A second loop gets its own client and never closes one in use elsewhere"""
+    pool = AgentHTTPPool(http2=False)
+    background = asyncio.new_event_loop()
+    thread = threading.Thread(target=background.run_forever, daemon=True)
+    thread.start()
+    try:
+        theirs = asyncio.run_coroutine_threadsafe(get_client(pool), background).result(5)
+        
+        async def use_and_close():
+            ours = pool.client()
+            await asyncio.sleep(0.1)  # Give the background loop a chance to run anything scheduled on it
+            await pool.aclose()
+            return ours
+        
+        ours = asyncio.run(use_and_close())
+        assert ours is not theirs
+        assert ours.is_closed
+        assert not theirs.is_closed
+        assert asyncio.run_coroutine_threadsafe(get_client(pool), background).result(5) is theirs
+        
+        asyncio.run_coroutine_threadsafe(pool.aclose(), background).result(5)
+        assert theirs.is_closed
+    finally:
+        background.call_soon_threadsafe(background.stop)
+        thread.join(5)
+        background.close()
+
+def test_aclose_closes_the_current_loops_clients():
+    pool = AgentHTTPPool(http2=False)
+    
+    async def use_and_close():
+        client = pool.client()
+        assert pool.client() is client
+        await pool.aclose()
+        return client
+    
+    assert asyncio.run(use_and_close()).is_closed
+
+def test_clients_of_a_closed_loop_are_dropped():
+    pool = AgentHTTPPool(http2=False)
+    asyncio.run(get_client(pool))
+    
+    async def reuse():
+        pool.client()
+        return len(pool._clients)
+    
+    assert asyncio.run(reuse()) == 1
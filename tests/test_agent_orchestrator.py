@@ -0,0 +1,125 @@
+"""Orchestrator fan-out and consensus with stub agents (no SDKs, no network)"""
+
+import asyncio
+from datetime import datetime
+
+import pytest
+
+import agent_orchestrator as orchestration
+from agent_orchestrator import (AgentRegistry, AgentSpec, BaseAgent, Finding,
+                                MRIAgentOrchestrator, MRIAnalysisRequest)
+
+pytestmark = pytest.mark.unit
+
+class StubAgent(BaseAgent):
+    """Reports one lesion at a fixed spot after a delay, or raises"""
+    
+    def __init__(self, agent_id: str, delay: float = 0.0, fail: bool = False, finding_type: str = "lesion",
+                 reports_as: str = None):
+        super().__init__(agent_id, agent_id)
+        self.reports_as = reports_as or agent_id  # agent_id stamped on findings (ClaudeAgent uses "claude3")
+        self.delay = delay
+        self.fail = fail
+        self.finding_type = finding_type
+        self.cancelled = False
+    
+    async def analyze(self, image_data, metadata):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.fail:
+            raise RuntimeError(f"{self.agent_id} provider error")
+        return [Finding(
+            finding_id=f"{self.agent_id}-{metadata.get('slice_index')}",
+            agent_id=self.reports_as,
+            finding_type=self.finding_type,
+            location={"x": 0.5, "y": 0.5, "z": 0.5},
+            description=f"{self.finding_type} seen by {self.agent_id}",
+            confidence=0.8,
+            severity="mild",
+            evidence=[self.agent_id],
+            timestamp=datetime.now()
+        )]
+
+def make_orchestrator(agents, monkeypatch, **env) -> MRIAgentOrchestrator:
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    registry = AgentRegistry()
+    for agent in agents:
+        registry.register(AgentSpec(agent.agent_id, (lambda agent=agent: agent), provider=agent.agent_id))
+    orchestrator = MRIAgentOrchestrator(registry=registry, slices_per_agent=0)
+    orchestrator.redis_client = None
+    return orchestrator
+
+def analyze(orchestrator: MRIAgentOrchestrator, study_id: str = "study", slices: int = 2):
+    request = MRIAnalysisRequest(study_id=study_id, image_data=["img"] * slices, metadata={}, user_context={})
+    return asyncio.run(orchestrator.analyze_mri(request))
+
+def test_failed_agents_do_not_count_towards_quorum(monkeypatch):
+    """Two agents failing fast must not settle consensus and cancel the healthy straggler"""
+    healthy = StubAgent("healthy", delay=0.2)
+    agents = [StubAgent("dead1", fail=True), StubAgent("dead2", fail=True), healthy]
+    orchestrator = make_orchestrator(agents, monkeypatch, ORCHESTRATOR_QUORUM="2",
+                                     ORCHESTRATOR_CONSENSUS_MODE="incremental")
+    
+    all_findings, fanout, agent_health = asyncio.run(orchestrator._run_agents_parallel(
+        orchestrator._select_slices(["img", "img"]), {}, ["dead1", "dead2", "healthy"]))
+    
+    assert not healthy.cancelled
+    assert fanout["agents_cancelled"] == []
+    assert set(all_findings) == {"healthy"}
+    assert [f.finding_type for f in all_findings["healthy"]] == ["lesion"]
+    assert agent_health["dead1"]["failed"] == 2
+
+def test_quorum_still_cancels_stragglers_once_decided(monkeypatch):
+    slow = StubAgent("slow", delay=5)
+    agents = [StubAgent("a", delay=0.01), StubAgent("b", delay=0.02), StubAgent("c", delay=0.03), slow]
+    orchestrator = make_orchestrator(agents, monkeypatch, ORCHESTRATOR_QUORUM="2",
+                                     ORCHESTRATOR_CONSENSUS_MODE="incremental",
+                                     ORCHESTRATOR_CONSENSUS_THRESHOLD="0.6")
+    
+    all_findings, fanout, _ = asyncio.run(orchestrator._run_agents_parallel(
+        orchestrator._select_slices(["img"]), {}, ["a", "b", "c", "slow"]))
+    
+    assert slow.cancelled
+    assert fanout["agents_cancelled"] == ["slow"]
+    assert set(all_findings) == {"a", "b", "c"}
+
+def test_open_breaker_does_not_block_agreeing_agents(monkeypatch):
+    """A provider behind an open circuit is reported, not counted against the other agents"""
+    agents = [StubAgent("a"), StubAgent("b"), StubAgent("down")]
+    orchestrator = make_orchestrator(agents, monkeypatch, ORCHESTRATOR_CONSENSUS_THRESHOLD="0.7")
+    breaker = orchestrator._breaker("down")
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    assert breaker.state == "open"
+    
+    result = analyze(orchestrator, "open-breaker")
+    
+    assert [f["finding_type"] for f in result.consensus_findings] == ["lesion"]
+    assert sorted(result.consensus_findings[0]["supporting_agents"]) == ["a", "b"]
+    assert result.consensus_findings[0]["agreement_score"] == 1.0
+    assert result.fanout["agents_failed"] == ["down"]
+    assert result.agent_health["down"]["short_circuited"] == 2
+    assert result.agent_health["down"]["in_consensus"] is False
+    assert result.agent_health["a"]["in_consensus"] is True
+
+def test_findings_count_for_the_registry_name_not_their_agent_id(monkeypatch):
+    """An agent stamping another agent_id on its findings is still one voter under its registry name"""
+    slow = StubAgent("slow", delay=0.2)
+    agents = [StubAgent("a"), StubAgent("claude", reports_as="claude3"), slow]
+    orchestrator = make_orchestrator(agents, monkeypatch, ORCHESTRATOR_QUORUM="2",
+                                     ORCHESTRATOR_CONSENSUS_MODE="incremental",
+                                     ORCHESTRATOR_CONSENSUS_THRESHOLD="0.7")
+    
+    result = analyze(orchestrator, "renamed-agent")
+    
+    assert not slow.cancelled
+    assert result.fanout["agents_cancelled"] == []
+    assert sorted(result.consensus_findings[0]["supporting_agents"]) == ["a", "claude", "slow"]
+    # Pair order follows completion order; no pair may involve the stamped "claude3"
+    pairs = {frozenset(key.split("_vs_")) for key in result.agent_agreements}
+    assert pairs == {frozenset(("a", "claude")), frozenset(("a", "slow")), frozenset(("claude", "slow"))}
+    assert set(result.agent_agreements.values()) == {1.0}
@@ -0,0 +1,28 @@
+"""The agents API server exposes the orchestrator's metrics"""
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+pytestmark = pytest.mark.integration
+
+def test_metrics_scrape_after_one_analysis():
+    import api_server
+    from agent_orchestrator import MRIAnalysisRequest
+    
+    orchestrator = api_server.agent_orchestrator
+    orchestrator.redis_client = None
+    request = MRIAnalysisRequest(study_id="metrics-scrape", image_data=["img", "img"],
+                                 metadata={"modality": "MR"}, user_context={}, agents=["medvision"])
+    result = asyncio.run(orchestrator.analyze_mri(request))
+    assert result.agents_used == ["medvision"]
+    
+    response = TestClient(api_server.app).get("/metrics")
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    for stage in ("lesion_tracking", "consensus", "report"):
+        assert f'readmymri_stage_duration_seconds_count{{stage="{stage}"}}' in body
+    assert 'readmymri_agent_call_duration_seconds_count{agent="medvision",outcome="ok"} 2' in body
@@ -0,0 +1,43 @@
+"""ConsensusEngine over FindingTable"""
+
+from datetime import datetime
+
+import pytest
+
+from agent_orchestrator import ConsensusEngine, Finding, FindingTable
+
+pytestmark = pytest.mark.unit
+
+def finding(finding_id: str, agent_id: str, x: float, finding_type: str = "lesion") -> Finding:
+    return Finding(finding_id, agent_id, finding_type, {"x": x, "y": 0.5, "z": 0.5}, "d", 0.8, "mild",
+                   [finding_id], datetime.now())
+
+def test_agent_agreements_skip_pairs_without_findings():
+    engine = ConsensusEngine()
+    table = FindingTable.from_agent_findings({
+        "a": [finding("a1", "a", 0.1), finding("a2", "a", 0.9)],
+        "b": [finding("b1", "b", 0.1)],
+        "empty1": [],
+        "empty2": []
+    })
+    
+    agreements = engine.agent_agreements(table)
+    
+    assert agreements["a_vs_b"] == 0.5
+    assert agreements["a_vs_empty1"] == 0.0
+    assert "empty1_vs_empty2" not in agreements
+
+def test_agent_agreements_for_agents_with_no_findings_at_all():
+    table = FindingTable.from_agent_findings({"a": [], "b": []})
+    assert ConsensusEngine().agent_agreements(table) == {}
+
+def test_consensus_keeps_one_finding_per_agent_per_group():
+    engine = ConsensusEngine(distance_threshold=0.15)
+    consensus = engine.calculate_consensus({
+        "a": [finding("a1", "a", 0.10), finding("a2", "a", 0.12)],
+        "b": [finding("b1", "b", 0.11)]
+    }, threshold=0.7)
+    
+    assert len(consensus) == 1
+    assert consensus[0]["agreement_score"] == 1.0
+    assert sorted(consensus[0]["supporting_agents"]) == ["a", "b"]
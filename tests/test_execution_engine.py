@@ -0,0 +1,51 @@
+"""DicomExecutionEngine process pool"""
+import asyncio
+import os
+import threading
+
+import pytest
+
+from preprocessor.readmymri_preprocessorv4 import DicomExecutionEngine, source_name
+
+pytestmark = pytest.mark.unit
+
+def test_process_pool_workers_are_not_forked(monkeypatch):
+    monkeypatch.setenv("READMYMRI_START_METHOD", "fork")
+    engine = DicomExecutionEngine("process", max_workers=2)
+    assert engine.start_method == "forkserver"
+    try:
+        names = asyncio.run(engine.map(source_name, ["/a/one.dcm", "/b/two.dcm", "/c/three.dcm"]))
+        assert engine._pool._mp_context.get_start_method() == "forkserver"
+    finally:
+        engine.shutdown()
+    assert names == ["one.dcm", "two.dcm", "three.dcm"]
+
+def crash_once(item, marker: str, parent_pid: int):
+    """Kill the pool worker the first time any item runs (marker file records it)"""
+    if os.getpid() != parent_pid and not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return item * 2
+
+def crash_in_workers(item, parent_pid: int):
+    """Kill every pool worker; run normally outside the pool"""
+    if os.getpid() != parent_pid:
+        os._exit(1)
+    return threading.current_thread() is threading.main_thread()
+
+def test_crashed_pool_is_restarted_and_the_study_retried(tmp_path):
+    engine = DicomExecutionEngine("process", max_workers=1)
+    try:
+        results = asyncio.run(engine.map(crash_once, [1, 2, 3], str(tmp_path / "crashed"), os.getpid()))
+    finally:
+        engine.shutdown()
+    assert results == [2, 4, 6]
+    assert (tmp_path / "crashed").exists()
+
+def test_pool_that_keeps_crashing_falls_back_to_a_thread():
+    engine = DicomExecutionEngine("process", max_workers=1)
+    try:
+        on_main_thread = asyncio.run(engine.map(crash_in_workers, [1, 2], os.getpid()))
+    finally:
+        engine.shutdown()
+    assert on_main_thread == [False, False]
@@ -0,0 +1,19 @@
+"""Import-time budget for the agent orchestrator (see backend/agents/check_import_time.py)"""
+import os
+
+import pytest
+
+from check_import_time import measure
+
+pytestmark = pytest.mark.unit
+
+BUDGET_SECONDS = float(os.getenv("IMPORT_BUDGET_SECONDS", "1.0"))
+
+def test_orchestrator_import_stays_within_budget_and_lazy():
+    # Best of a few fresh interpreters, so one slow start on a busy runner does not fail the build
+    runs = [measure("agent_orchestrator")]
+    while runs[-1]["seconds"] > BUDGET_SECONDS and len(runs) < 3:
+        runs.append(measure("agent_orchestrator"))
+    
+    assert min(run["seconds"] for run in runs) <= BUDGET_SECONDS
+    assert runs[-1]["loaded"] == [], f"heavy modules imported eagerly: {runs[-1]['loaded']}"
@@ -0,0 +1,47 @@
+"""JobQueue positions and shutdown"""
+import asyncio
+
+import pytest
+
+from services.job_queue import JobQueue
+
+pytestmark = pytest.mark.unit
+
+async def hold(event: asyncio.Event):
+    await event.wait()
+    return "done"
+
+def test_positions_follow_the_queue():
+    async def scenario():
+        queue = JobQueue(max_workers=1, max_queue_depth=4)
+        release = asyncio.Event()
+        running = queue.submit(hold, release)
+        await asyncio.sleep(0)  # Let the worker pick up the first job
+        queued = [queue.submit(hold, release) for _ in range(3)]
+        positions = [queue.position(job) for job in [running] + queued]
+        release.set()
+        await asyncio.wait_for(queued[-1].done.wait(), 5)
+        await queue.stop()
+        return positions, [job.state for job in queued], queue.position(queued[0])
+    
+    positions, states, after = asyncio.run(scenario())
+    assert positions == [None, 1, 2, 3]
+    assert states == ["succeeded"] * 3
+    assert after is None
+
+def test_stop_fails_running_and_queued_jobs_so_waiters_return():
+    async def scenario():
+        queue = JobQueue(max_workers=1, max_queue_depth=4)
+        never = asyncio.Event()
+        running = queue.submit(hold, never)
+        await asyncio.sleep(0)
+        queued = queue.submit(hold, never)
+        waiter = asyncio.create_task(queued.done.wait())
+        await queue.stop()
+        await asyncio.wait_for(waiter, 1)
+        return running, queued
+    
+    running, queued = asyncio.run(scenario())
+    assert running.done.is_set() and queued.done.is_set()
+    assert (running.state, queued.state) == ("failed", "failed")
+    assert "stopped" in queued.error and queued.finished_at is not None
@@ -0,0 +1,46 @@
+"""LLMResponseCache disk tier from the event loop"""
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from services.llm_cache import LLMResponseCache
+
+pytestmark = pytest.mark.unit
+
+def wait_for_eviction(cache: LLMResponseCache, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while cache._evicting and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not cache._evicting
+
+def test_async_disk_tier_round_trip_runs_off_the_loop(tmp_path, monkeypatch):
+    cache = LLMResponseCache(disk_dir=str(tmp_path))
+    loop_thread = threading.get_ident()
+    disk_threads = []
+    read_disk, write_disk = cache._read_disk, cache._write_disk
+    monkeypatch.setattr(cache, "_read_disk", lambda *a: disk_threads.append(threading.get_ident()) or read_disk(*a))
+    monkeypatch.setattr(cache, "_write_disk", lambda *a: disk_threads.append(threading.get_ident()) or write_disk(*a))
+    
+    async def scenario():
+        key = cache.key("model", "prompt")
+        await cache.aput(key, "reply")
+        cache._memory.clear()  # Force the next lookup to the disk tier
+        return await cache.aget(key), await cache.aget(cache.key("model", "other"))
+    
+    assert asyncio.run(scenario()) == ("reply", None)
+    assert len(disk_threads) == 3 and loop_thread not in disk_threads
+    assert cache.counters["disk_hits"] == 1 and cache.counters["misses"] == 1
+
+def test_disk_eviction_runs_in_the_background(tmp_path):
+    cache = LLMResponseCache(disk_dir=str(tmp_path), max_disk_bytes=2000)
+    for i in range(30):
+        cache.put(cache.key("model", f"prompt {i}"), "x" * 100)
+        wait_for_eviction(cache)
+    
+    sizes = [os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(tmp_path) for name in files]
+    assert sum(sizes) <= 2000
+    assert cache.stats()["disk_bytes"] == sum(sizes)
+    assert cache.counters["evictions"] > 0
@@ -0,0 +1,36 @@
+"""AsyncLLMClient request coalescing"""
+import asyncio
+
+import pytest
+
+from services.llm_cache import LLMResponseCache
+from services.llm_client import AsyncLLMClient, LLMUnavailableError
+
+pytestmark = pytest.mark.unit
+
+def test_cancelled_leader_fails_coalesced_waiters_without_cancelling_them(monkeypatch):
+    client = AsyncLLMClient(api_key="test-key", cache=LLMResponseCache())
+    calls = []
+    
+    async def slow_call(prompt, max_tokens, timeout):
+        calls.append(prompt)
+        await asyncio.sleep(10)
+        return "reply"
+    
+    monkeypatch.setattr(client, "_call", slow_call)
+    
+    async def scenario():
+        leader = asyncio.create_task(client.complete("same prompt"))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(client.complete("same prompt"))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        results = await asyncio.gather(leader, waiter, return_exceptions=True)
+        await client.aclose()
+        return results
+    
+    leader_result, waiter_result = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert isinstance(leader_result, asyncio.CancelledError)
+    assert isinstance(waiter_result, LLMUnavailableError)
+    assert not client._pending
@@ -0,0 +1,97 @@
+"""Slices advertised for a processed study can be fetched from the study endpoints"""
+import asyncio
+import io
+import uuid
+import zipfile
+
+import numpy as np
+import pydicom
+import pytest
+from fastapi.testclient import TestClient
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, MRImageStorage, generate_uid
+
+import main
+from preprocessor.readmymri_preprocessorv4 import ReadMyMRIPreprocessor
+
+pytestmark = pytest.mark.integration
+
+PYDICOM_MAJOR = int(pydicom.__version__.split(".")[0])
+
+def dicom_slice(study_uid: str, series_uid: str, index: int, count: int, size: int = 64) -> bytes:
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = MRImageStorage
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds = Dataset()
+    ds.file_meta = meta
+    ds.SOPClassUID = MRImageStorage
+    ds.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+    ds.StudyInstanceUID = study_uid
+    ds.SeriesInstanceUID = series_uid
+    ds.Modality = "MR"
+    ds.SeriesDescription = "T2 AX"
+    ds.SeriesNumber = 1
+    ds.InstanceNumber = index + 1
+    ds.ImagePositionPatient = [0.0, 0.0, float(index) * 3.0]
+    ds.ImageOrientationPatient = [1, 0, 0, 0, 1, 0]
+    ds.PixelSpacing = [1.0, 1.0]
+    ds.Rows = ds.Columns = size
+    ds.BitsAllocated = 16
+    ds.BitsStored = 12
+    ds.HighBit = 11
+    ds.PixelRepresentation = 0
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = "MONOCHROME2"
+    yy, xx = np.mgrid[0:size, 0:size]
+    radius = size * 0.4 * np.sin(np.pi * (index + 1) / (count + 1))
+    ds.PixelData = np.where(np.hypot(yy - size / 2, xx - size / 2) < radius, 800, 20).astype(np.uint16).tobytes()
+    buffer = io.BytesIO()
+    if PYDICOM_MAJOR >= 3:
+        pydicom.dcmwrite(buffer, ds, enforce_file_format=True)
+    else:
+        # pydicom 2.x (the pinned version) takes the encoding from the dataset
+        ds.is_little_endian, ds.is_implicit_VR = True, False
+        ds.save_as(buffer, write_like_original=False)
+    return buffer.getvalue()
+
+@pytest.fixture
+def study(tmp_path, monkeypatch):
+    """A 12-slice series processed header-first (no volume), 3 key slices"""
+    monkeypatch.setattr(main, "STUDY_DIR", str(tmp_path / "studies"))
+    monkeypatch.setenv("READMYMRI_ASSEMBLE_VOLUMES", "false")
+    monkeypatch.setenv("READMYMRI_PREVIEW_SLICES", "3")
+    main.open_studies.clear()
+    
+    zip_path = tmp_path / "study.zip"
+    study_uid, series_uid = generate_uid(), generate_uid()
+    with zipfile.ZipFile(zip_path, "w") as archive:
+        for index in range(12):
+            archive.writestr(f"DICOM/IM{index:04d}.dcm", dicom_slice(study_uid, series_uid, index, 12))
+    
+    study_id = uuid.uuid4().hex
+    processor = ReadMyMRIPreprocessor(workspace_dir=main.study_dir(study_id), inline_images=False)
+    result = asyncio.run(processor.process_dicom_zip(str(zip_path), {}))
+    assert result["success"], result["message"]
+    yield study_id, result["data"]
+    main.open_studies.clear()
+
+def test_header_first_study_advertises_only_rendered_slices(study):
+    study_id, data = study
+    client = TestClient(main.app)
+    
+    series = client.get(f"/api/studies/{study_id}").json()["series"][0]
+    rendered = sorted(preview["slice_number"] for preview in series["previews"])
+    assert 0 < len(rendered) < 12
+    assert series["slice_numbers"] == rendered
+    assert series["slice_count"] == len(rendered)
+    assert main.study_references(study_id, data)["series"][0]["slice_numbers"] == rendered
+    
+    for n in series["slice_numbers"]:
+        response = client.get(series["slice_url_template"].format(n=n))
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "image/png"
+    
+    # A slice that was never rendered is not advertised and stays unavailable
+    missing = next(n for n in range(12) if n not in rendered)
+    assert client.get(series["slice_url_template"].format(n=missing)).status_code == 404
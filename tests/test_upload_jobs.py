@@ -0,0 +1,45 @@
+"""process_upload_job fallback when the full preprocessor fails"""
+import asyncio
+import os
+import threading
+import zipfile
+
+import pytest
+from pydicom.uid import generate_uid
+
+import main
+from test_study_slices import dicom_slice
+
+pytestmark = pytest.mark.integration
+
+def test_fallback_unpacks_and_cleans_up_off_the_event_loop(tmp_path, monkeypatch):
+    async def broken(self, zip_path, context):
+        raise RuntimeError("preprocessor down")
+    
+    monkeypatch.setattr(main.ReadMyMRIPreprocessor, "process_dicom_zip", broken)
+    monkeypatch.setattr(main, "STUDY_DIR", str(tmp_path / "studies"))
+    loop_threads = set()
+    extract = main.extract_dicom_files
+    
+    def recording_extract(*args):
+        loop_threads.add(threading.get_ident())
+        return extract(*args)
+    
+    monkeypatch.setattr(main, "extract_dicom_files", recording_extract)
+    
+    temp_dir = tmp_path / "upload"
+    temp_dir.mkdir()
+    zip_path = temp_dir / "upload.zip"
+    study_uid, series_uid = generate_uid(), generate_uid()
+    with zipfile.ZipFile(zip_path, "w") as archive:
+        for index in range(2):
+            archive.writestr(f"DICOM/IM{index}.dcm", dicom_slice(study_uid, series_uid, index, 2))
+    upload_info = {"filename": "study.zip", "file_bytes": os.path.getsize(zip_path)}
+    
+    result = asyncio.run(main.process_upload_job(str(temp_dir), str(zip_path), upload_info, {}, 0.0))
+    
+    assert result["status"] == "partial_success"
+    assert result["files_processed"] == 2
+    assert result["metadata"]["modality"] == "MR"
+    assert threading.get_ident() not in loop_threads and loop_threads
+    assert not temp_dir.exists()
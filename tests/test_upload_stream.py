@@ -0,0 +1,53 @@
+"""Streamed ZIP uploads that are cut short"""
+import asyncio
+import os
+
+import pytest
+from starlette.requests import Request
+
+import main
+
+pytestmark = pytest.mark.unit
+
+BOUNDARY = "readmymri-test-boundary"
+
+def chunked_request(chunks):
+    """Multipart request whose body arrives in the given chunks, without a Content-Length"""
+    messages = [{"type": "http.request", "body": chunk, "more_body": True} for chunk in chunks]
+    messages.append({"type": "http.request", "body": b"", "more_body": False})
+    
+    async def receive():
+        return messages.pop(0)
+    
+    scope = {"type": "http", "method": "POST", "path": "/api/upload-zip",
+             "headers": [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())]}
+    return Request(scope, receive)
+
+def open_files_under(directory: str):
+    """Paths below directory that this process holds open"""
+    paths = []
+    for fd in os.listdir("/proc/self/fd"):
+        try:
+            target = os.readlink(f"/proc/self/fd/{fd}")
+        except OSError:
+            continue
+        if target.startswith(directory):
+            paths.append(target)
+    return paths
+
+@pytest.mark.skipif(not main.STREAMING_FORM_DATA_AVAILABLE, reason="streaming-form-data not installed")
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs /proc to list open files")
+def test_oversized_upload_leaves_no_open_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "MAX_UPLOAD_BYTES", 4096)
+    monkeypatch.setattr(main, "MULTIPART_OVERHEAD_BYTES", 0)
+    header = (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"study.zip\"\r\n"
+              "Content-Type: application/zip\r\n\r\n").encode()
+    request = chunked_request([header] + [b"\0" * 1024] * 16)
+    dest_path = str(tmp_path / "upload.zip")
+    
+    with pytest.raises(main.UploadTooLargeError):
+        asyncio.run(main.stream_upload_to_disk(request, dest_path))
+    
+    # The file part was being written when the limit was hit
+    assert os.path.exists(dest_path)
+    assert open_files_under(str(tmp_path)) == []
@@ -0,0 +1,72 @@
+"""WindowLevelRenderer auto window for headers without WindowCenter/Width"""
+import asyncio
+import zipfile
+
+import numpy as np
+import pytest
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+
+from preprocessor.readmymri_preprocessorv4 import ReadMyMRIPreprocessor, WindowLevelRenderer
+from test_study_slices import dicom_slice
+
+pytestmark = pytest.mark.unit
+
+def dataset(pixels: np.ndarray, photometric: str = "MONOCHROME2", slope: float = 1.0,
+            intercept: float = 0.0) -> Dataset:
+    ds = Dataset()
+    ds.file_meta = FileMetaDataset()
+    ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds.Rows, ds.Columns = pixels.shape
+    ds.BitsAllocated = ds.BitsStored = 16
+    ds.HighBit = 15
+    ds.PixelRepresentation = 0
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = photometric
+    ds.RescaleSlope = slope
+    ds.RescaleIntercept = intercept
+    ds.PixelData = pixels.astype(np.uint16).tobytes()
+    return ds
+
+def ramp() -> np.ndarray:
+    return np.tile(np.linspace(100, 1000, 64), (64, 1))
+
+def test_auto_window_is_fitted_to_rescaled_values():
+    renderer = WindowLevelRenderer()
+    preset = renderer.preset_for(ramp(), {"rescale_slope": 2.0, "rescale_intercept": -1024.0})
+    assert preset.source == "auto"
+    assert preset.center == pytest.approx((100 + 1000) / 2 * 2.0 - 1024.0, rel=0.01)
+    assert preset.width == pytest.approx(900 * 2.0, rel=0.02)
+    
+    # A negative slope still gives a positive window over the modality values
+    preset = renderer.preset_for(ramp(), {"rescale_slope": -1.0, "rescale_intercept": 0.0})
+    assert preset.width > 0 and preset.center == pytest.approx(-550, rel=0.01)
+    
+    image = renderer.render_dataset(dataset(ramp(), slope=2.0, intercept=-1024.0))
+    assert image[0, 0] == 0 and image[0, -1] == 255
+
+def test_auto_window_inverts_monochrome1():
+    renderer = WindowLevelRenderer()
+    plain = renderer.render_dataset(dataset(ramp()))
+    inverted = renderer.render_dataset(dataset(ramp(), photometric="MONOCHROME1"))
+    assert plain[0, 0] == 0 and inverted[0, 0] == 255
+    assert np.abs(inverted.astype(int) - (255 - plain.astype(int))).max() <= 1
+
+@pytest.mark.parametrize("selection", ["key", "even"])
+def test_header_first_series_without_window_gets_one_auto_preset(tmp_path, monkeypatch, selection):
+    monkeypatch.setenv("READMYMRI_SLICE_SELECTION", selection)
+    zip_path = tmp_path / "study.zip"
+    study_uid, series_uid = generate_uid(), generate_uid()
+    with zipfile.ZipFile(zip_path, "w") as archive:
+        for index in range(8):
+            archive.writestr(f"DICOM/IM{index}.dcm", dicom_slice(study_uid, series_uid, index, 8))
+    
+    processor = ReadMyMRIPreprocessor(assemble_volumes=False, workspace_dir=str(tmp_path / "workspace"),
+                                      inline_images=False)
+    result = asyncio.run(processor.process_dicom_zip(str(zip_path), {}))
+    
+    assert result["success"], result["message"]
+    preset = processor.window_presets[series_uid]
+    assert preset is not None and preset.source == "auto"
+    assert 20 <= preset.center - preset.width / 2 and preset.center + preset.width / 2 <= 800
+    assert result["data"]["series"][0]["window"]["source"] == "auto"